@@ -1,7 +1,6 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response
-from flask_mail import Mail, Message
 import pandas as pd
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 from pymongo import MongoClient
 from bson import ObjectId
@@ -16,19 +15,32 @@ load_dotenv(os.path.join(APP_DIR, '.env'))
 import time
 import random
 import uuid
+import threading
 import cv2
 import numpy as np
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
 import io
+from email.message import EmailMessage
+
+from registry_manager import RegistryManager
+from outbox import Outbox, SmtpSettings
+from scan_jobs import ScanJobManager, QueueFull
+from cameras import CameraManager, CAMERA_SOURCES, parse_sources
+from dashboard_stats import DashboardStats, RECENT_FIELDS, format_recent
+from challan_pdf import ChallanPdfRenderer
+from challans import insert_challan
+from bulk_export import export_zip, challan_filter, find_challans, EXPORT_WORKERS
+from listing import find_sorted, page, page_args, ndjson, wants_ndjson, NDJSON_MIMETYPE
+from schema import apply_schema, warn_unindexed, SCHEMA_CHECK_PLANS
+from warmup import Startup
+from inference_pool import start_pool, get_pool, pool_ready
+import metrics
+from detection import detect_plate_from_image, scan_video
 
 app = Flask(__name__)
-CORS(app) 
+CORS(app, expose_headers=['X-Next-Cursor'])
 app.secret_key = os.getenv('SECRET_KEY', 'super_secret_key_for_anpr_system')
 
 # Gmail SMTP Configuration
@@ -40,146 +52,54 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 
-mail = Mail(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+smtp_settings = SmtpSettings.from_flask_config(app.config)
 
 # Paths
 UPLOAD_FOLDER = os.path.join(APP_DIR, 'static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+SCAN_JOB_FOLDER = os.path.join(APP_DIR, 'scan_jobs')
+os.makedirs(SCAN_JOB_FOLDER, exist_ok=True)
+
+# Per-phase startup timings; /api/health reports not-ready until the warm start (WARM_START) finishes
+startup = Startup()
 
 # --- MongoDB Setup ---
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 DB_NAME = os.getenv('DATABASE_NAME', 'echallan_system')
-mongo_client = MongoClient(MONGO_URI)
+# Every command's latency goes to /metrics (METRICS_ENABLED)
+mongo_client = MongoClient(MONGO_URI, event_listeners=metrics.mongo_listeners())
 db = mongo_client[DB_NAME]
 
 # Collections
 officials_col = db['officials']
 captures_col = db['captures']
 challans_col = db['challans']
+challan_stats = DashboardStats(challans_col)
+challan_pdfs = ChallanPdfRenderer(APP_DIR)
 
 # --- Module Integration ---
 sys.path.append(os.path.abspath(os.path.join(APP_DIR, '..')))
-_model = None
-_reader = None
-
-def get_yolo_model():
-    global _model
-    if _model is None:
-        from ultralytics import YOLO
-        MODEL_PATH = os.path.join(APP_DIR, '..', 'module1_plate_detection', 'models', 'plate_yolo.pt')
-        _model = YOLO(MODEL_PATH)
-    return _model
-
-def get_ocr_reader():
-    global _reader
-    if _reader is None:
-        import easyocr
-        _reader = easyocr.Reader(['en'], gpu=False)
-    return _reader
-
-def detect_plate_from_image(image, draw_boxes=True):
-    model = get_yolo_model()
-    reader = get_ocr_reader()
-    if isinstance(image, str): frame = cv2.imread(image)
-    else: frame = image.copy()
-    if frame is None: return None, 0.0, None, None, None
-
-    results = model(frame, verbose=False)
-    best_text, best_conf, best_crop, best_box = None, 0.0, None, None
-
-    for result in results:
-        for box in result.boxes.cpu().numpy():
-            x1, y1, x2, y2 = box.xyxy[0].astype(int)
-            conf = float(box.conf[0])
-            if conf > 0.3:
-                h, w = frame.shape[:2]
-                plate_crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
-                if plate_crop.size > 0:
-                    gray = cv2.cvtColor(plate_crop, cv2.COLOR_BGR2GRAY)
-                    ocr = reader.readtext(gray, detail=0)
-                    if ocr:
-                        text = ''.join(c for c in "".join(ocr).upper() if c.isalnum())
-                        if len(text) >= 4 and conf > best_conf:
-                            best_text, best_conf, best_crop, best_box = text, conf, plate_crop, (x1, y1, x2, y2)
-                if draw_boxes: cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 3)
-
-    if best_text and draw_boxes and best_box:
-        x1, y1, x2, y2 = best_box
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 165, 255), 2)
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 0), -1)
-        frame = cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
-        ts = datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-        cv2.putText(frame, f"VEHICLE: {best_text}", (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
-        cv2.putText(frame, f"DATE: {ts}", (20, 60), cv2.FONT_HERSHEY_DUPLEX, 0.6, (200, 200, 200), 1)
-        cv2.putText(frame, "ECR TRAFFIC SYSTEM | DELHI ZONE 04", (frame.shape[1]-400, 45), cv2.FONT_HERSHEY_DUPLEX, 0.6, (0, 165, 255), 1)
-
-    return best_text, best_conf, frame, best_crop, best_box
 
 # --- CSV Dataset ---
 CSV_PATH = os.path.join(APP_DIR, 'indian_vehicle_dataset.csv')
-try:
-    vehicle_df = pd.read_csv(CSV_PATH)
-    vehicle_df.columns = [c.strip() for c in vehicle_df.columns]
-    if 'Registration_Number' in vehicle_df.columns:
-        vehicle_df['_plate_normalized'] = vehicle_df['Registration_Number'].astype(str).str.replace(" ", "").str.upper()
-except Exception as e:
-    vehicle_df = pd.DataFrame()
+# Memory-mapped conversion of the CSV (python registry_store.py indian_vehicle_dataset.csv); used when current
+REGISTRY_PATH = os.getenv('REGISTRY_PATH', os.path.join(APP_DIR, 'indian_vehicle_dataset.registry'))
+# Watched for new snapshots and delta files (REGISTRY_DELTA_DIR); reloads swap in a fully built registry
+registry_manager = RegistryManager(CSV_PATH, REGISTRY_PATH)
+# Inference and export workers (forkserver/spawn) re-import this script as __mp_main__; they never look plates up
+if __name__ != '__mp_main__':
+    try:
+        with startup.phase('registry'):
+            registry_manager.load()
+    except Exception as e:
+        print(f"Registry load failed: {e}")
 
 def validate_vehicle_in_csv(plate_text):
-    if vehicle_df.empty: return None
-    plate_clean = plate_text.replace(" ", "").upper()
-    match = vehicle_df[vehicle_df['_plate_normalized'] == plate_clean]
-    if not match.empty:
-        row = match.iloc[0].to_dict()
-        today = datetime.datetime.now().date()
-        total_fine = 0
-        violations = []
-        def check_expiry(date_str, name, fine):
-            nonlocal total_fine
-            if not date_str or str(date_str).lower() == 'nan':
-                total_fine += fine
-                violations.append(f"Expired/Missing {name}")
-                return "Expired"
-            try:
-                exp = datetime.datetime.strptime(str(date_str).strip(), '%Y-%m-%d').date()
-                if exp < today:
-                    total_fine += fine
-                    violations.append(f"Expired {name}")
-                    return "Expired"
-                return "Valid"
-            except: return "Unknown"
-
-        rc_status = check_expiry(row.get('Fitness_Expiry'), 'RC', 5000)
-        ins_status = check_expiry(row.get('Insurance_Expiry'), 'Insurance', 2000)
-        puc_status = check_expiry(row.get('PUC_Expiry'), 'PUC', 10000)
-        v_class = str(row.get('Vehicle_Class', '')).lower()
-        is_comm = any(x in v_class for x in ['commercial', 'transport', 'goods', 'truck', 'taxi'])
-        fit_status = check_expiry(row.get('Fitness_Expiry'), 'Fitness', 5000) if is_comm else "N/A"
-        per_status = check_expiry(row.get('Permit_Expiry'), 'Permit', 5000) if is_comm else "N/A"
-        tax_status = check_expiry(row.get('Road_Tax_Expiry'), 'Tax', 2000)
-
-        def clean(val): return "N/A" if pd.isna(val) or str(val).lower() == 'nan' else str(val)
-
-        return {
-            'plate_number': clean(row.get('Registration_Number')),
-            'owner_name': clean(row.get('Owner_Name')),
-            'owner_email': clean(row.get('Owner_Email')),
-            'vehicle_type': clean(row.get('Vehicle_Class')),
-            'make_model': f"{clean(row.get('Make'))} {clean(row.get('Model'))}",
-            'fuel_type': clean(row.get('Fuel_Type')),
-            'rc_status': rc_status,
-            'insurance_status': ins_status,
-            'puc_status': puc_status,
-            'fitness_status': fit_status,
-            'permit_status': per_status,
-            'tax_status': tax_status,
-            'violations': violations,
-            'total_fine': total_fine,
-            'raw_data': {k: clean(v) for k, v in row.items()}
-        }
-    return None
+    # Read once, so a reload swapping the registry mid-call is not seen
+    registry = registry_manager.current
+    if registry.empty: return None
+    with metrics.timer('lookup'): return registry.verdict(plate_text)
 
 # --- Auth Mock ---
 class current_user:
@@ -192,6 +112,15 @@ class current_user:
 def inject_now(): return {'datetime': datetime, 'current_user': current_user}
 
 def init_db():
+    try:
+        with startup.phase('schema'):
+            apply_schema(db)
+    except Exception as e:
+        # e.g. duplicate challan_ids blocking the unique index; the app still runs without it
+        print(f"Schema migration failed: {e}")
+    if SCHEMA_CHECK_PLANS:
+        with startup.phase('query_plans'):
+            warn_unindexed(db)
     if officials_col.count_documents({}) == 0:
         officials_col.insert_many([
             {"_id": "1", "username": "officer1", "password_hash": generate_password_hash("pass123"), "name": "Rajesh Kumar", "official_id": "OFF001", "role": "officer"},
@@ -205,60 +134,74 @@ app.jinja_env.filters['currency'] = format_currency
 # --- Routes ---
 @app.route('/api/health')
 def health_check():
-    return jsonify({'status': 'ok', 'timestamp': datetime.datetime.now().isoformat()})
+    # Ready once warm-up (WARM_START) is done and every inference worker (INFERENCE_WORKERS) has its models
+    workers_ready = pool_ready()
+    ready = startup.ready and workers_ready
+    status = 'ok' if ready else startup.state if not startup.ready else 'starting_workers'
+    body = {'status': status, 'ready': ready, 'inference_workers_ready': workers_ready,
+            'timestamp': datetime.datetime.now().isoformat(), 'startup': startup.report(),
+            'registry': registry_manager.status()}
+    return jsonify(body), 200 if ready else 503
 
 @app.route('/')
 def index_redirect(): return redirect(url_for('dashboard'))
 
 @app.route('/dashboard')
 def dashboard():
-    stats = {
-        'total': challans_col.count_documents({}),
-        'pending': challans_col.count_documents({"status": {"$in": ["Pending", "Unpaid"]}}),
-        'paid': challans_col.count_documents({"status": "Paid"}),
-        'revenue': list(challans_col.aggregate([{"$match": {"status": "Paid"}}, {"$group": {"_id": None, "t": {"$sum": "$fine_amount"}}}]))
-    }
-    stats['revenue'] = stats['revenue'][0]['t'] if stats['revenue'] else 0
-    recent = list(challans_col.find().sort("issue_timestamp", -1).limit(10))
-    return render_template('dashboard.html', stats=stats, recent_challans=recent)
+    summary = challan_stats.summary()
+    stats = {k: summary[k] for k in ('total', 'pending', 'paid', 'revenue', 'today')}
+    return render_template('dashboard.html', stats=stats, recent_challans=challan_stats.latest(10))
 
 @app.route('/dashboard_stats')
 def dashboard_stats():
-    rev_res = list(challans_col.aggregate([{"$match": {"status": "Paid"}}, {"$group": {"_id": None, "t": {"$sum": "$fine_amount"}}}]))
-    unp_res = list(challans_col.aggregate([{"$match": {"status": {"$in": ["Pending", "Unpaid"]}}}, {"$group": {"_id": None, "t": {"$sum": "$fine_amount"}}}]))
-    v_types = list(challans_col.aggregate([{"$group": {"_id": "$violation_type", "c": {"$sum": 1}}}]))
-    
-    counts = {'Expired Insurance': 0, 'Expired PUC': 0, 'Expired RC': 0, 'Expired Fitness': 0, 'No Permit': 0, 'Unpaid Tax': 0}
-    for r in v_types:
-        vt = str(r['_id'])
-        if 'Insurance' in vt: counts['Expired Insurance'] += r['c']
-        if 'PUC' in vt: counts['Expired PUC'] += r['c']
-        if 'RC' in vt: counts['Expired RC'] += r['c']
-        if 'Fitness' in vt: counts['Expired Fitness'] += r['c']
-        if 'Permit' in vt: counts['No Permit'] += r['c']
-        if 'Tax' in vt: counts['Unpaid Tax'] += r['c']
-
-    thirty_days_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-    recent = list(challans_col.find({"issue_timestamp": {"$gte": thirty_days_ago}}).sort("issue_timestamp", -1))
-    recent_list = []
-    for d in recent:
-        recent_list.append({
-            'id': d.get('challan_id'),
-            'plate': d.get('plate_number'),
-            'type': d.get('violation_type'),
-            'amount': d.get('fine_amount'),
-            'status': d.get('status'),
-            'date': d.get('issue_timestamp').strftime('%d %b %Y | %I:%M %p'),
-            'image_path': d.get('proof_image_path', '')
-        })
-
+    # ?format=ndjson streams the 30-day challan list instead; ?cursor= pages through it
+    try: cursor, limit = page_args(request.args)
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    if wants_ndjson(request):
+        rows = ndjson(challans_col, challan_stats.recent_filter(), "issue_timestamp", format_recent, RECENT_FIELDS, cursor)
+        return Response(rows, mimetype=NDJSON_MIMETYPE)
+    summary = challan_stats.summary()
+    recent, next_cursor = challan_stats.recent_page(cursor, limit)
     return jsonify({
-        'totalRevenue': rev_res[0]['t'] if rev_res else 0,
-        'totalUnpaid': unp_res[0]['t'] if unp_res else 0,
-        'violationCounts': counts,
-        'recentChallans': recent_list
+        'totalRevenue': summary['revenue'],
+        'totalUnpaid': summary['unpaid'],
+        'violationCounts': summary['violation_counts'],
+        'recentCount': summary['recent'],
+        'recentChallans': recent,
+        'recentNextCursor': next_cursor
     })
 
+def _listing(col, filter, field, fields, fmt, paged=True):
+    """JSON array of one keyset page (next page cursor in X-Next-Cursor), or with
+    ?format=ndjson every matching row streamed from the cursor. With paged=False
+    the array holds every matching row unless the caller asks for a page (limit
+    or cursor)."""
+    try: cursor, limit = page_args(request.args)
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    if wants_ndjson(request):
+        rows = ndjson(col, filter, field, fmt, fields, cursor, limit if 'limit' in request.args else 0)
+        return Response(rows, mimetype=NDJSON_MIMETYPE)
+    if not paged and 'limit' not in request.args and not cursor:
+        return jsonify([fmt(d) for d in find_sorted(col, filter, field, fields)])
+    docs, next_cursor = page(col, filter, field, fields, cursor, limit)
+    resp = jsonify([fmt(d) for d in docs])
+    if next_cursor: resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
+
+CHALLAN_LIST_FIELDS = {"challan_id": 1, "plate_number": 1, "owner_name": 1, "violation_type": 1, "fine_amount": 1,
+                       "status": 1, "issue_timestamp": 1, "location": 1, "proof_image_path": 1, "email_status": 1}
+CAPTURE_FIELDS = {"timestamp": 1, "plate_number": 1, "confidence": 1, "image_path": 1, "track_id": 1, "camera_id": 1}
+
+def _format_challan(c):
+    c['_id'] = str(c['_id'])
+    c['issue_timestamp'] = c['issue_timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    return c
+
+def _format_capture(r):
+    r['_id'] = str(r['_id'])
+    r['timestamp'] = r['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    return r
+
 @app.route('/api/challan/<string:id>')
 def get_challan_api(id):
     d = challans_col.find_one({"challan_id": id})
@@ -270,33 +213,26 @@ def get_challan_api(id):
 
 @app.route('/api/challans/search_vehicle/<string:plate>')
 def search_challans_by_vehicle(plate):
-    plate = plate.upper()
-    # Find all pending challans for this plate
-    challans = list(challans_col.find({"plate_number": plate, "status": "Pending"}).sort("issue_timestamp", -1))
-    for c in challans:
-        c['_id'] = str(c['_id'])
-        c['issue_timestamp'] = c['issue_timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-    return jsonify(challans)
+    # Pending challans for this plate, newest first; all of them, since the payment page shows a plate's dues
+    return _listing(challans_col, {"plate_number": plate.upper(), "status": "Pending"}, "issue_timestamp",
+                    CHALLAN_LIST_FIELDS, _format_challan, paged=False)
 
 @app.route('/api/pay_challan/<string:id>', methods=['POST'])
 def pay_challan_api(id):
     challans_col.update_one({"challan_id": id}, {"$set": {"status": "Paid"}})
+    challan_stats.invalidate()
+    challan_pdfs.invalidate(id)
     return jsonify({'success': True})
 
 @app.route('/api/recent_captures')
 def recent_captures():
-    rows = list(captures_col.find().sort("timestamp", -1).limit(50))
-    for r in rows:
-        r['_id'] = str(r['_id'])
-        r['timestamp'] = r['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-    return jsonify(rows)
+    return _listing(captures_col, {}, "timestamp", CAPTURE_FIELDS, _format_capture)
 
 @app.route('/generate_challan', methods=['POST'])
 def generate_manual_challan():
     data = request.form
     plate = data.get('plate_number', '').upper()
-    cid = f"ECH-{uuid.uuid4().hex[:8].upper()}"
-    
+
     # Try to fetch owner info for emailing
     veh = validate_vehicle_in_csv(plate)
     owner_name = data.get('owner_name') or (veh['owner_name'] if veh else 'Unknown')
@@ -306,8 +242,7 @@ def generate_manual_challan():
     off_id = data.get('official_id', 'SYSTEM')
     off_name = data.get('official_name', 'Manual Entry')
 
-    challans_col.insert_one({
-        "challan_id": cid,
+    cid = insert_challan(challans_col, {
         "plate_number": plate,
         "owner_name": owner_name,
         "issue_timestamp": datetime.datetime.now(),
@@ -316,7 +251,7 @@ def generate_manual_challan():
         "status": "Pending",
         "official_id": off_id,
         "official_name": off_name
-    })
+    }, challan_stats.invalidate)
 
     # Notify via email if owner email exists in dataset
     if veh and veh.get('owner_email') and veh['owner_email'] != 'N/A':
@@ -325,24 +260,12 @@ def generate_manual_challan():
     return jsonify({'success': True, 'challan_id': cid})
 
 def send_echallan_email(recipient_email, challan_id, plate, violation, amount):
-    print(f"Preparing official email for {recipient_email}...")
-    
-    # 1. Fetch data for PDF
-    d = challans_col.find_one({"challan_id": challan_id})
-    if not d:
-         d = {
-            'challan_id': challan_id, 'plate_number': plate, 'owner_name': 'Vehicle Owner',
-            'violation_type': violation, 'fine_amount': amount, 'issue_timestamp': datetime.datetime.now(),
-            'location': 'DELHI ZONE 04', 'status': 'Pending'
-         }
-    
-    # 2. Generate PDF using helper
-    pdf_buffer = create_challan_pdf(d)
-    
-    # 3. Create Email
-    msg = Message(subject=f"OFFICIAL E-CHALLAN: {plate} - Action Required", recipients=[recipient_email])
-    
-    msg.html = f"""
+    # Rendering and SMTP happen on the outbox dispatcher, not the caller's thread
+    print(f"Queueing official email for {recipient_email}...")
+    return email_outbox.enqueue(recipient_email, challan_id, plate=plate, violation=violation, amount=amount)
+
+def _echallan_email_html(challan_id, plate, violation, amount):
+    return f"""
     <div style="font-family: Arial, sans-serif; color: #333; max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
         <div style="background-color: #1a202c; padding: 20px; text-align: center;">
             <h2 style="color: #fff; margin: 0;">OFFICIAL TRAFFIC VIOLATION NOTICE</h2>
@@ -377,19 +300,42 @@ def send_echallan_email(recipient_email, challan_id, plate, violation, amount):
         </div>
     </div>
     """
+
+def _build_echallan_message(job):
+    challan_id, p = job['challan_id'], job.get('payload', {})
+    plate, violation, amount = p.get('plate'), p.get('violation'), p.get('amount')
+
+    # 1. Fetch data for PDF
+    d = challans_col.find_one({"challan_id": challan_id})
+    if not d:
+         d = {
+            'challan_id': challan_id, 'plate_number': plate, 'owner_name': 'Vehicle Owner',
+            'violation_type': violation, 'fine_amount': amount, 'issue_timestamp': datetime.datetime.now(),
+            'location': 'DELHI ZONE 04', 'status': 'Pending'
+         }
     
-    # 4. Attach PDF
-    msg.attach(f"Challan_{challan_id}.pdf", "application/pdf", pdf_buffer.getvalue())
+    # 2. Generate PDF using helper
+    pdf_buffer = create_challan_pdf(d)
+    
+    # 3. Create Email
+    msg = EmailMessage()
+    msg['Subject'] = f"OFFICIAL E-CHALLAN: {plate} - Action Required"
+    msg['From'] = app.config['MAIL_DEFAULT_SENDER'] or app.config['MAIL_USERNAME']
+    msg['To'] = job['recipient']
+    msg.set_content(f"E-Challan {challan_id} for vehicle {plate}: {violation}. Fine: Rs. {amount}")
+    msg.add_alternative(_echallan_email_html(challan_id, plate, violation, amount), subtype='html')
     
-    mail.send(msg)
-    print("Official email with PDF sent successfully.")
+    # 4. Attach PDF
+    msg.add_attachment(pdf_buffer.getvalue(), maintype='application', subtype='pdf', filename=f"Challan_{challan_id}.pdf")
+    return msg
+
+email_outbox = Outbox(db['email_outbox'], challans_col, _build_echallan_message, smtp_settings)
 
 def _auto_generate_live_challan(plate, proof_path):
     veh = validate_vehicle_in_csv(plate)
     if not veh or not veh.get('violations'): return
     v_str = ", ".join(veh['violations'])
-    cid = f"ECH-{uuid.uuid4().hex[:6].upper()}"
-    
+
     # New Naming Convention: PLATE_TIMESTAMP.jpg
     ts_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     new_filename = f"{plate}_{ts_str}_proof.jpg"
@@ -401,39 +347,71 @@ def _auto_generate_live_challan(plate, proof_path):
         os.rename(old_full_path, new_path)
         proof_path = f"/static/uploads/{new_filename}"
 
-    challans_col.insert_one({
-        "challan_id": cid, "plate_number": plate, "owner_name": veh['owner_name'],
+    cid = insert_challan(challans_col, {
+        "plate_number": plate, "owner_name": veh['owner_name'],
         "issue_timestamp": datetime.datetime.now(), "violation_type": v_str,
         "fine_amount": float(veh['total_fine']), "status": "Pending",
         "official_id": "SYSTEM", "official_name": "AI Camera", "proof_image_path": proof_path,
         "location": "DELHI ZONE 04 - TECH PARK" # Mock Geotag
-    })
+    }, challan_stats.invalidate)
     if veh.get('owner_email') and veh['owner_email'] != 'N/A':
         send_echallan_email(veh['owner_email'], cid, plate, v_str, veh['total_fine'])
 
+# Detection cycles a live track may go unseen before it is closed
+LIVE_TRACK_MAX_AGE = 3
+# A plate re-acquired as a new track (left and re-entered the view) within this
+# many seconds is not captured again
+LIVE_REPEAT_COOLDOWN = float(os.getenv('LIVE_REPEAT_COOLDOWN', 120))
+_live_plates_seen = {}
+_live_plates_lock = threading.Lock()
+
+def _claim_live_plate(text, source_id=None):
+    now = time.time()
+    key = (source_id, text)
+    with _live_plates_lock:
+        if now - _live_plates_seen.get(key, 0) < LIVE_REPEAT_COOLDOWN: return False
+        _live_plates_seen[key] = now
+        for k in [k for k, v in _live_plates_seen.items() if now - v >= LIVE_REPEAT_COOLDOWN]:
+            del _live_plates_seen[k]
+        return True
+
+def _handle_live_plate(text, conf, track_id, proc, source_id=None):
+    # Post-processing stage of the live pipeline: evidence, capture record, challan
+    u_code = uuid.uuid4().hex[:6].upper()
+    proof_p = os.path.join(UPLOAD_FOLDER, f"{u_code}_proof.jpg")
+    cv2.imwrite(proof_p, proc)
+    captures_col.insert_one({"timestamp": datetime.datetime.now(), "plate_number": text, "confidence": float(conf), "image_path": f"/static/uploads/{u_code}_proof.jpg", "track_id": track_id, "camera_id": source_id})
+    socketio.emit('plate_detected', {'plate': text, 'confidence': round(conf*100,1), 'camera': source_id})
+    _auto_generate_live_challan(text, f"/static/uploads/{u_code}_proof.jpg")
+
+# One always-on pipeline per CAMERA_SOURCES entry, sharing a single detection thread
+cameras = CameraManager(parse_sources(CAMERA_SOURCES), _handle_live_plate, claim=_claim_live_plate,
+                        track_max_age=LIVE_TRACK_MAX_AGE)
+
 @app.route('/video_feed')
-def video_feed():
-    def gen():
-        camera = cv2.VideoCapture(0)
-        last_d = 0
-        latest_text = ""
-        while True:
-            success, frame = camera.read()
-            if not success: break
-            if time.time() - last_d > 1.5:
-                last_d = time.time()
-                text, conf, proc, crop, box = detect_plate_from_image(frame)
-                if text and text != latest_text:
-                    latest_text = text
-                    u_code = uuid.uuid4().hex[:6].upper()
-                    proof_p = os.path.join(UPLOAD_FOLDER, f"{u_code}_proof.jpg")
-                    cv2.imwrite(proof_p, proc if proc is not None else frame)
-                    captures_col.insert_one({"timestamp": datetime.datetime.now(), "plate_number": text, "confidence": float(conf), "image_path": f"/static/uploads/{u_code}_proof.jpg"})
-                    socketio.emit('plate_detected', {'plate': text, 'confidence': round(conf*100,1)})
-                    _auto_generate_live_challan(text, f"/static/uploads/{u_code}_proof.jpg")
-            ret, buffer = cv2.imencode('.jpg', frame)
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<source_id>')
+def video_feed(source_id=None):
+    # Viewers subscribe to a running camera; they never open the device themselves
+    if not cameras.pipelines: return jsonify({'error': 'No cameras configured (set CAMERA_SOURCES)'}), 404
+    pipeline = cameras.get(source_id)
+    if pipeline is None: return jsonify({'error': 'Unknown camera'}), 404
+    if not pipeline.running: return jsonify({'error': 'Camera is not running', 'camera': pipeline.name}), 503
+    return Response(pipeline.mjpeg(manage=False), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/api/inference/stats')
+def inference_stats():
+    pool = get_pool()
+    return jsonify(pool.snapshot() if pool else {'running': False, 'workers': []})
+
+@app.route('/api/cameras')
+def list_cameras():
+    return jsonify(cameras.snapshot())
+
+@app.route('/api/live/stats')
+def live_stats():
+    pipeline = cameras.get(request.args.get('camera'))
+    if pipeline is None: return jsonify({'error': 'Unknown camera'}), 404
+    return jsonify(pipeline.snapshot())
 
 @app.route('/api/vehicle/<plate>')
 def get_vehicle_details(plate):
@@ -445,278 +423,168 @@ def upload_scan():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
     f = request.files['file']
     ftype = request.form.get('type', 'image')
+    off_id = request.form.get('official_id', 'SYSTEM')
+    off_name = request.form.get('official_name', 'AI Camera')
     
     u_code = uuid.uuid4().hex[:6].upper()
+
+    # Videos run as background jobs unless the caller asks to wait (async=false)
+    if ftype == 'video' and request.form.get('async', 'true') != 'false':
+        job_p = os.path.join(SCAN_JOB_FOLDER, f"{u_code}_{secure_filename(f.filename)}")
+        f.save(job_p)
+        try:
+            job_id = scan_jobs.submit(job_p, file_type=ftype, official_id=off_id, official_name=off_name)
+        except QueueFull:
+            os.remove(job_p)
+            return jsonify({'success': False, 'message': 'Scan queue is full, try again shortly'}), 503
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued',
+                        'status_url': url_for('scan_job_status', job_id=job_id)}), 202
+
     temp_p = os.path.join(UPLOAD_FOLDER, f"temp_{u_code}_{f.filename}")
     f.save(temp_p)
-
     try:
-        best_text, best_conf, frame, best_crop, _ = None, 0, None, None, None
-        all_detections = []
-
-        if ftype == 'video':
-            cap = cv2.VideoCapture(temp_p)
-            count = 0
-            unique_plates = {} # plate -> {conf, frame, crop}
-            
-            while cap.isOpened():
-                ret, fr = cap.read()
-                if not ret or count > 450: break # Scan longer (approx 15s)
-                if count % 5 == 0:
-                    text, conf, proc, crop, box = detect_plate_from_image(fr, draw_boxes=True)
-                    if text and conf > 0.4:
-                        if text not in unique_plates or conf > unique_plates[text]['conf']:
-                             unique_plates[text] = {'conf': conf, 'frame': proc, 'crop': crop}
-                count += 1
-            cap.release()
-            
-            # Process findings
-            for plt, data in unique_plates.items():
-                veh = validate_vehicle_in_csv(plt)
-                res_obj = {
-                    'plate': plt,
-                    'confidence': round(data['conf']*100, 1),
-                    'status': 'Unknown',
-                    'reason': 'Not in Database'
-                }
-                
-                if veh:
-                    if veh.get('violations'):
-                        res_obj['status'] = 'Challan Issued'
-                        res_obj['reason'] = ", ".join(veh['violations'])
-                        # Prioritize showing partial violations
-                        if data['conf'] >= best_conf: # Update best if this is valid (or better conf)
-                             best_text, best_conf, frame, best_crop = plt, data['conf'], data['frame'], data['crop']
-                    else:
-                        res_obj['status'] = 'Clean'
-                        res_obj['reason'] = 'No Violations'
-                
-                all_detections.append(res_obj)
-            
-            # If no challan-able plate found, pick highest confidence one to show
-            if not best_text and unique_plates:
-                top = max(unique_plates.values(), key=lambda x: x['conf'])
-                # Find key
-                for k,v in unique_plates.items():
-                    if v == top:
-                        best_text, best_conf, frame, best_crop = k, v['conf'], v['frame'], v['crop']
-                        break
-
-        else:
-            best_text, best_conf, frame, best_crop, _ = detect_plate_from_image(temp_p)
-        
-        # SAVE AND RETURN
-        if best_text:
-            ts_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            final_filename = f"{best_text}_{ts_str}_proof.jpg"
-            final_path = os.path.join(UPLOAD_FOLDER, final_filename)
-            cv2.imwrite(final_path, frame if frame is not None else cv2.imread(temp_p))
-            
-            # Result logic
-            veh = validate_vehicle_in_csv(best_text)
-            cid = None
-            
-            off_id = request.form.get('official_id', 'SYSTEM')
-            off_name = request.form.get('official_name', 'AI Camera')
-
-            if veh and veh.get('violations'):
-                cid = f"ECH-{uuid.uuid4().hex[:8].upper()}"
-                v_str = ", ".join(veh['violations'])
-                challans_col.insert_one({
-                    "challan_id": cid, "plate_number": best_text, "owner_name": veh['owner_name'],
-                    "issue_timestamp": datetime.datetime.now(), "violation_type": v_str,
-                    "fine_amount": float(veh['total_fine']), "status": "Pending",
-                    "official_id": off_id, "official_name": off_name,
-                    "proof_image_path": f"/static/uploads/{final_filename}",
-                    "location": "DELHI ZONE 04 - MANUAL SCAN"
-                })
-            
-            response_data = {
-                'success': True,
-                'plate': best_text,
-                'confidence': round(best_conf*100, 1),
-                'challan_id': cid,
-                'violations': veh['violations'] if veh else [],
-                'total_fine': veh['total_fine'] if veh else 0,
-                'image_url': f"/static/uploads/{final_filename}",
-                'all_detections': all_detections # NEW FIELD
-            }
-            if veh:
-                response_data.update({
-                    'rc_status': veh.get('rc_status'),
-                    'insurance_status': veh.get('insurance_status'),
-                    'puc_status': veh.get('puc_status'),
-                    'fitness_status': veh.get('fitness_status'),
-                    'tax_status': veh.get('tax_status'),
-                    'owner_name': veh.get('owner_name')
-                })
-            return jsonify(response_data)
-
-        # If we found plates but none were clear enough to be "primary", return list anyway
-        if all_detections:
-             return jsonify({
-                 'success': False, 
-                 'message': 'Multiple plates detected but no clear violation.',
-                 'all_detections': all_detections
-             })
-
-        return jsonify({'success': False, 'message': 'Plate not detected clearly'})
+        return jsonify(_scan_file(temp_p, ftype, off_id, off_name))
     finally:
         if os.path.exists(temp_p):
             os.remove(temp_p)
-    return jsonify({'success': False, 'message': 'Plate not detected clearly'})
 
-def create_challan_pdf(d):
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # --- Fine Mapping Helper ---
-    def get_fine(v_name):
-        v_lower = v_name.lower()
-        if 'puc' in v_lower: return 10000
-        if 'rc' in v_lower or 'fitness' in v_lower or 'permit' in v_lower: return 5000
-        if 'insurance' in v_lower or 'tax' in v_lower: return 2000
-        return 500 # Default/Other
-
-    # --- Config ---
-    left_m = 50
-    right_m = width - 50
-    y = height - 50
-    
-    # --- Header ---
-    # Logo (Stylized Text "ECR" to mimic logo if image unavailable)
-    p.setFillColorRGB(0.1, 0.1, 0.2)
-    p.setFont("Helvetica-Bold", 28)
-    p.drawString(left_m, y - 10, "ECR")
-    p.setFillColorRGB(0.96, 0.51, 0.12) # Orange accent for dot
-    p.circle(left_m + 65, y - 8, 4, fill=1, stroke=0)
-    
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica", 7)
-    p.drawString(left_m, y - 22, "ENFORCEMENT NETWORK")
-
-    # Official Title
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica-Bold", 12)
-    p.drawRightString(right_m, y - 5, "E-CHALLAN NOTICE")
-    p.setFont("Helvetica", 8)
-    p.drawRightString(right_m, y - 18, "MINISTRY OF ROAD TRANSPORT & HIGHWAYS")
-    
-    ts = d.get('issue_timestamp')
-    if hasattr(ts, 'strftime'): ts_str = ts.strftime('%d/%m/%Y %H:%M')
-    else: ts_str = str(ts)
-    p.drawRightString(right_m, y - 30, f"Date: {ts_str}")
-
-    y -= 45
-    p.setStrokeColor(colors.black)
-    p.setLineWidth(0.5)
-    p.line(left_m, y, right_m, y)
-    y -= 25
-
-    # --- Vehicle & Owner Info (Grid) ---
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(left_m, y, "VEHICLE DETAILS")
-    y -= 15
-    
-    p.setFont("Helvetica", 9)
-    # Row 1
-    p.drawString(left_m, y, "Registration No:")
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(left_m + 80, y, str(d.get('plate_number', 'N/A')))
-    
-    p.setFont("Helvetica", 9)
-    p.drawString(left_m + 250, y, "Challan ID:")
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(left_m + 310, y, str(d.get('challan_id', 'N/A')))
-    y -= 15
-    
-    # Row 2
-    p.setFont("Helvetica", 9)
-    p.drawString(left_m, y, "Owner Name:")
-    p.drawString(left_m + 80, y, str(d.get('owner_name', 'Unknown')))
-    
-    p.drawString(left_m + 250, y, "Location:")
-    p.drawString(left_m + 310, y, str(d.get('location', 'DELHI ZONE 04')))
-    y -= 25
+def _scan_file(temp_p, ftype, off_id, off_name, progress=None):
+    """Detect, validate and (if needed) issue a challan for an uploaded image or video.
 
-    p.line(left_m, y, right_m, y)
-    y -= 25
+    Returns the upload_scan response payload. `progress(fraction, detection=None)`
+    is called while a video is scanned, with each newly seen plate.
+    """
+    best_text, best_conf, frame, best_crop, _ = None, 0, None, None, None
+    all_detections = []
 
-    # --- Violation Table ---
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(left_m, y, "VIOLATION BREAKDOWN")
-    y -= 15
-    
-    # Table Header
-    p.setFillColorRGB(0.95, 0.95, 0.95)
-    p.rect(left_m, y - 5, width - 100, 18, fill=1, stroke=0)
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica-Bold", 8)
-    p.drawString(left_m + 10, y, "DESCRIPTION")
-    p.drawString(right_m - 80, y, "AMOUNT (INR)")
-    y -= 20
-
-    # Items
-    v_str = str(d.get('violation_type', ''))
-    violations = [v.strip() for v in v_str.split(',') if v.strip()]
-    
-    if not violations: violations = ["Traffic Violation"]
-    
-    total_calc = 0
-    p.setFont("Helvetica", 9)
-    
-    for v in violations:
-        charge = get_fine(v)
-        total_calc += charge
-        p.drawString(left_m + 10, y, v)
-        p.drawRightString(right_m - 60, y, f"{charge:.2f}")
-        y -= 15
-    
-    # Divider
-    y -= 5
-    p.line(left_m + 250, y, right_m - 50, y)
-    y -= 15
-    
-    # Total
-    override_total = float(d.get('fine_amount', 0))
-    # Use override if available and > 0, else calculated
-    final_total = override_total if override_total > 0 else total_calc
+    if ftype == 'video':
+        unique_plates = scan_video(temp_p, progress) # plate -> {conf, frame, crop}
+        
+        # Process findings
+        for plt, data in unique_plates.items():
+            veh = validate_vehicle_in_csv(plt)
+            res_obj = {
+                'plate': plt,
+                'confidence': round(data['conf']*100, 1),
+                'status': 'Unknown',
+                'reason': 'Not in Database'
+            }
+            
+            if veh:
+                if veh.get('violations'):
+                    res_obj['status'] = 'Challan Issued'
+                    res_obj['reason'] = ", ".join(veh['violations'])
+                    # Prioritize showing partial violations
+                    if data['conf'] >= best_conf: # Update best if this is valid (or better conf)
+                         best_text, best_conf, frame, best_crop = plt, data['conf'], data['frame'], data['crop']
+                else:
+                    res_obj['status'] = 'Clean'
+                    res_obj['reason'] = 'No Violations'
+            
+            all_detections.append(res_obj)
+        
+        # If no challan-able plate found, pick highest confidence one to show
+        if not best_text and unique_plates:
+            top = max(unique_plates.values(), key=lambda x: x['conf'])
+            # Find key
+            for k,v in unique_plates.items():
+                if v == top:
+                    best_text, best_conf, frame, best_crop = k, v['conf'], v['frame'], v['crop']
+                    break
+
+    else:
+        best_text, best_conf, frame, best_crop, _ = detect_plate_from_image(temp_p)
     
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(left_m + 250, y, "TOTAL PAYABLE AMOUNT")
-    p.drawRightString(right_m - 60, y, f"Rs. {final_total:.2f}")
-    y -= 40
-
-    # --- Evidence Image (Color) ---
-    img_path_rel = d.get('proof_image_path', '')
-    if img_path_rel:
-        img_full = os.path.join(APP_DIR, img_path_rel.lstrip('/'))
-        if os.path.exists(img_full):
-            try:
-                p.setFont("Helvetica-Bold", 9)
-                p.drawString(left_m, y, "EVIDENCE / CAPTURE")
-                y -= 10
-                img = ImageReader(img_full)
-                img_w, img_h = 300, 180
-                # Preserve aspect ratio roughly
-                p.drawImage(img, left_m, y - img_h, width=img_w, height=img_h, preserveAspectRatio=True)
-                # Border
-                p.setStrokeColor(colors.black)
-                p.rect(left_m, y - img_h, img_w, img_h, fill=0)
-                y -= (img_h + 20)
-            except: pass
-
-    # --- Footer ---
-    p.setFont("Helvetica", 7)
-    p.setFillColor(colors.darkgrey)
-    p.drawCentredString(width/2, 40, "This is a computer-generated document. No signature is required.")
-    p.drawCentredString(width/2, 30, "PROCESSED BY ECR ENFORCEMENT SYSTEM v2.0")
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-    return buffer
+    # SAVE AND RETURN
+    if best_text:
+        ts_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        final_filename = f"{best_text}_{ts_str}_proof.jpg"
+        final_path = os.path.join(UPLOAD_FOLDER, final_filename)
+        cv2.imwrite(final_path, frame if frame is not None else cv2.imread(temp_p))
+        
+        # Result logic
+        veh = validate_vehicle_in_csv(best_text)
+        cid = None
+        
+        if veh and veh.get('violations'):
+            v_str = ", ".join(veh['violations'])
+            cid = insert_challan(challans_col, {
+                "plate_number": best_text, "owner_name": veh['owner_name'],
+                "issue_timestamp": datetime.datetime.now(), "violation_type": v_str,
+                "fine_amount": float(veh['total_fine']), "status": "Pending",
+                "official_id": off_id, "official_name": off_name,
+                "proof_image_path": f"/static/uploads/{final_filename}",
+                "location": "DELHI ZONE 04 - MANUAL SCAN"
+            }, challan_stats.invalidate)
+        
+        response_data = {
+            'success': True,
+            'plate': best_text,
+            'confidence': round(best_conf*100, 1),
+            'challan_id': cid,
+            'violations': veh['violations'] if veh else [],
+            'total_fine': veh['total_fine'] if veh else 0,
+            'image_url': f"/static/uploads/{final_filename}",
+            'all_detections': all_detections # NEW FIELD
+        }
+        if veh:
+            response_data.update({
+                'rc_status': veh.get('rc_status'),
+                'insurance_status': veh.get('insurance_status'),
+                'puc_status': veh.get('puc_status'),
+                'fitness_status': veh.get('fitness_status'),
+                'tax_status': veh.get('tax_status'),
+                'owner_name': veh.get('owner_name')
+            })
+        return response_data
+
+    # If we found plates but none were clear enough to be "primary", return list anyway
+    if all_detections:
+         return {
+             'success': False, 
+             'message': 'Multiple plates detected but no clear violation.',
+             'all_detections': all_detections
+         }
+
+    return {'success': False, 'message': 'Plate not detected clearly'}
+
+def _run_scan_job(job, progress):
+    return _scan_file(job['file_path'], job.get('file_type', 'video'), job.get('official_id', 'SYSTEM'),
+                      job.get('official_name', 'AI Camera'), progress)
+
+scan_jobs = ScanJobManager(db['scan_jobs'], socketio, _run_scan_job)
+metrics.register(metrics.ServiceCollector(cameras, get_pool, scan_jobs, email_outbox, challan_pdfs))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if not metrics.METRICS_ENABLED: return "Metrics are disabled", 404
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+@app.route('/api/scan_jobs/<job_id>')
+def scan_job_status(job_id):
+    job = scan_jobs.get(job_id)
+    if not job: return jsonify({'error': 'Not found'}), 404
+    if job['status'] == 'done':
+        return jsonify(dict(job['result'], job_id=job_id, status='done'))
+    return jsonify({
+        'success': False,
+        'job_id': job_id,
+        'status': job['status'],
+        'progress': job.get('progress', 0.0),
+        'detections': job.get('detections', []),
+        'message': job.get('error', '')
+    })
+
+@socketio.on('watch_scan_job')
+def watch_scan_job(data):
+    # Progress events for a job go to the room named after its id
+    job_id = (data or {}).get('job_id')
+    if job_id: join_room(job_id)
+
+
+def create_challan_pdf(d):
+    return io.BytesIO(challan_pdfs.get(d))
 
 @app.route('/api/download_challan/<cid>')
 def download_challan(cid):
@@ -725,6 +593,17 @@ def download_challan(cid):
     buffer = create_challan_pdf(d)
     return Response(buffer, mimetype='application/pdf', headers={'Content-Disposition': f'attachment; filename=Challan_{cid}.pdf'})
 
+@app.route('/api/export_challans')
+def export_challans():
+    # e.g. ?status=Pending&zone=ZONE 04&from=2026-01-01&to=2026-01-31 -> ZIP of PDFs streamed as they render
+    # Render processes come from EXPORT_WORKERS only; a caller cannot ask for more
+    a = request.args
+    try: f = challan_filter(a.get('status'), a.get('zone'), a.get('plate'), a.get('from'), a.get('to'))
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    name = f"Challans_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(export_zip(find_challans(challans_col, f), EXPORT_WORKERS), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={name}'})
+
 @app.route('/api/send_manual_email', methods=['POST'])
 def send_manual_email_api():
     try:
@@ -743,13 +622,37 @@ def send_manual_email_api():
         
         if not email or not cid: return jsonify({'success': False, 'error': 'Missing email or challan ID'}), 400
         
-        send_echallan_email(email, cid, plate, violation, amount)
-        return jsonify({'success': True, 'message': 'Email sent successfully'})
+        msg_id = send_echallan_email(email, cid, plate, violation, amount)
+        return jsonify({'success': True, 'message': 'Email queued for delivery', 'outbox_id': msg_id})
     except Exception as e:
         print(f"SMTP Error: {e}")
         # Return generic error or specific depending on production needs
         return jsonify({'success': False, 'error': str(e)}), 500
 
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_services():
+    """Start the inference pool and background workers once in this process (resumes unfinished scan jobs)."""
+    global _services_started
+    with _services_lock:
+        if _services_started: return
+        _services_started = True
+        start_pool()
+        scan_jobs.start()
+        email_outbox.start()
+        cameras.start()
+        startup.start_warmup()
+        registry_manager.start()
+
+@app.before_request
+def _start_services_on_first_request():
+    # WSGI servers never run the main block; the first request (usually a health probe) starts the services
+    if not _services_started: start_services()
+
 if __name__ == '__main__':
     init_db()
+    # The reloader's parent only watches files and never serves; its serving child starts right away
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()
     socketio.run(app, debug=True, port=5000)
@@ -0,0 +1,192 @@
+"""Bulk challan PDF export: render in process or on a process pool, stream a ZIP as PDFs finish.
+
+The challan query is iterated lazily. By default (EXPORT_WORKERS=0) PDFs are
+rendered one at a time in the calling thread: rendering is mostly ReportLab and
+JPEG encoding under the GIL, and on a 2-core host benchmarks/bench_pdf_export.py
+measured 47 PDFs/s in process against 34/s on 2 workers, the pool's startup and
+IPC eating the parallelism. With workers > 0 at most
+`workers * INFLIGHT_PER_WORKER` renders are outstanding, so a slow download
+applies back-pressure to the pool instead of buffering PDFs.
+
+Pool workers are started with forkserver (spawn where that is unavailable), not
+fork: the web process runs camera, outbox, scan-job and pymongo threads, and a
+child forked from it can inherit a lock one of them held and hang. Each finished PDF is written to the archive and
+handed to the caller right away; the archive is never held in memory whole.
+PDFs are already compressed, so entries are stored, not deflated.
+
+    python bulk_export.py --status Pending --zone "ZONE 04" --from 2026-01-01 --out pending.zip
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import datetime
+import io
+import multiprocessing
+import os
+import re
+import sys
+import zipfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# 0 renders in the exporting thread; > 0 is a process pool of that size
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 0))
+# Never fork: the pool is created per export, from a process that is already running threads
+EXPORT_START_METHOD = os.getenv('EXPORT_START_METHOD',
+                                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+INFLIGHT_PER_WORKER = 4
+EXPORT_FIELDS = {"_id": 0, "challan_id": 1, "plate_number": 1, "owner_name": 1, "location": 1, "violation_type": 1,
+                 "fine_amount": 1, "issue_timestamp": 1, "proof_image_path": 1, "status": 1}
+
+
+def challan_filter(status=None, zone=None, plate=None, date_from=None, date_to=None):
+    """Mongo filter for an export; dates are inclusive 'YYYY-MM-DD' strings or datetimes."""
+    f = {}
+    if status: f["status"] = {"$in": ["Pending", "Unpaid"]} if status == "Pending" else status
+    if zone: f["location"] = {"$regex": re.escape(zone), "$options": "i"}
+    if plate: f["plate_number"] = plate.replace(" ", "").upper()
+    ts = {}
+    if date_from: ts["$gte"] = _as_datetime(date_from)
+    if date_to: ts["$lt"] = _as_datetime(date_to) + datetime.timedelta(days=1)
+    if ts: f["issue_timestamp"] = ts
+    return f
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime.datetime): return value
+    return datetime.datetime.strptime(value, '%Y-%m-%d')
+
+
+# --- Worker side ---
+_renderer = None
+
+
+def _init_worker(app_dir):
+    global _renderer
+    import cv2
+    # OpenCV's thread pool does not survive fork; render single-threaded per process
+    cv2.setNumThreads(0)
+    from challan_pdf import ChallanPdfRenderer
+    _renderer = ChallanPdfRenderer(app_dir, cache_mb=0)
+
+
+def _render(doc):
+    try:
+        return doc, _renderer.render(doc), None
+    except Exception as e:
+        return doc, None, str(e)
+
+
+# --- Parent side ---
+def render_pdfs(docs, workers=EXPORT_WORKERS, app_dir=APP_DIR):
+    """Yields (doc, pdf bytes or None, error) in input order, rendering on `workers` processes (0: in process)."""
+    if workers <= 0:
+        yield from _render_local(docs, app_dir)
+        return
+    ctx = multiprocessing.get_context(EXPORT_START_METHOD)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                                initializer=_init_worker, initargs=(app_dir,)) as pool:
+        pending = collections.deque()
+        docs = iter(docs)
+        for doc in docs:
+            pending.append(pool.submit(_render, doc))
+            if len(pending) >= workers * INFLIGHT_PER_WORKER: break
+        while pending:
+            yield pending.popleft().result()
+            doc = next(docs, None)
+            if doc is not None: pending.append(pool.submit(_render, doc))
+
+
+def _render_local(docs, app_dir):
+    from challan_pdf import ChallanPdfRenderer
+    renderer = ChallanPdfRenderer(app_dir, cache_mb=0)
+    for doc in docs:
+        try:
+            yield doc, renderer.render(doc), None
+        except Exception as e:
+            yield doc, None, str(e)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream the ZIP is written into; `take()` drains what was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        out = b''.join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def export_zip(docs, workers=EXPORT_WORKERS, app_dir=APP_DIR, stats=None):
+    """Generator of ZIP archive chunks: one Challan_<id>.pdf per doc plus manifest.csv."""
+    stats = stats if stats is not None else {}
+    stats.update(pdfs=0, failed=0, bytes=0)
+    sink = _Sink()
+    manifest = io.StringIO()
+    rows = csv.writer(manifest)
+    rows.writerow(['challan_id', 'plate_number', 'status', 'fine_amount', 'file', 'error'])
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for doc, pdf, error in render_pdfs(docs, workers, app_dir):
+            cid = doc.get('challan_id') or 'unknown'
+            name = f"Challan_{cid}.pdf" if pdf else ''
+            if pdf:
+                zf.writestr(name, pdf)
+                stats['pdfs'] += 1
+            else:
+                stats['failed'] += 1
+            rows.writerow([cid, doc.get('plate_number', ''), doc.get('status', ''), doc.get('fine_amount', ''),
+                           name, error or ''])
+            chunk = sink.take()
+            stats['bytes'] += len(chunk)
+            if chunk: yield chunk
+        zf.writestr('manifest.csv', manifest.getvalue())
+    chunk = sink.take()
+    stats['bytes'] += len(chunk)
+    yield chunk
+
+
+def find_challans(col, filter):
+    return col.find(filter, EXPORT_FIELDS).sort([("issue_timestamp", 1), ("_id", 1)]).batch_size(200)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(os.path.join(APP_DIR, '.env'))
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--status', help="e.g. Pending (includes Unpaid) or Paid")
+    ap.add_argument('--zone', help="case-insensitive match on the challan location")
+    ap.add_argument('--plate')
+    ap.add_argument('--from', dest='date_from', help="YYYY-MM-DD, inclusive")
+    ap.add_argument('--to', dest='date_to', help="YYYY-MM-DD, inclusive")
+    ap.add_argument('--workers', type=int, default=EXPORT_WORKERS, help="render processes (0: in process)")
+    ap.add_argument('--out', default='challans.zip')
+    ap.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    ap.add_argument('--db', default=os.getenv('DATABASE_NAME', 'echallan_system'))
+    args = ap.parse_args(argv)
+
+    col = MongoClient(args.uri)[args.db]['challans']
+    f = challan_filter(args.status, args.zone, args.plate, args.date_from, args.date_to)
+    stats = {}
+    started = datetime.datetime.now()
+    with open(args.out, 'wb') as out:
+        for chunk in export_zip(find_challans(col, f), args.workers, stats=stats):
+            out.write(chunk)
+    secs = (datetime.datetime.now() - started).total_seconds()
+    print(f"{stats['pdfs']} PDFs ({stats['failed']} failed), {stats['bytes'] / 1e6:.1f} MB -> {args.out} "
+          f"in {secs:.1f}s ({stats['pdfs'] / max(secs, 1e-9):.1f} PDFs/s, {args.workers or 'no'} workers)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""Challan PDF rendering with cached letterhead, evidence thumbnails and output bytes.
+
+- The static letterhead and footer are built once as a ReportLab drawing and
+  placed in each document as a single form XObject.
+- Evidence photos are downscaled once per file to the size they are printed
+  at, instead of embedding the full-resolution JPEG on every render.
+- Finished PDFs are cached per challan under a hash of everything the page
+  shows, so repeat downloads and emails are a cache hit and any change to
+  the challan (status, amount, evidence file) renders a fresh copy.
+"""
+import collections
+import functools
+import hashlib
+import io
+import json
+import os
+import threading
+
+import cv2
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Circle, Drawing, Line, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+import metrics
+
+PDF_CACHE_MB = float(os.getenv('PDF_CACHE_MB', 64))
+PDF_THUMB_CACHE_SIZE = int(os.getenv('PDF_THUMB_CACHE_SIZE', 256))
+# Evidence box on the page is 300x180 pt; thumbnails keep 2x that for print
+EVIDENCE_BOX = (300, 180)
+THUMB_SCALE = 2
+THUMB_JPEG_QUALITY = 85
+LEFT_M = 50
+# Challan fields that appear on the page, plus status so a payment re-renders
+HASHED_FIELDS = ('challan_id', 'plate_number', 'owner_name', 'location', 'violation_type',
+                 'fine_amount', 'issue_timestamp', 'proof_image_path', 'status')
+
+
+def get_fine(v_name):
+    v_lower = v_name.lower()
+    if 'puc' in v_lower: return 10000
+    if 'rc' in v_lower or 'fitness' in v_lower or 'permit' in v_lower: return 5000
+    if 'insurance' in v_lower or 'tax' in v_lower: return 2000
+    return 500 # Default/Other
+
+
+@functools.lru_cache(maxsize=None)
+def letterhead():
+    """Static header and footer of the notice, in page coordinates."""
+    width, height = letter
+    right_m, y = width - LEFT_M, height - 50
+    dark, orange = colors.Color(0.1, 0.1, 0.2), colors.Color(0.96, 0.51, 0.12)
+    d = Drawing(width, height)
+    # Logo (Stylized Text "ECR" to mimic logo if image unavailable)
+    d.add(String(LEFT_M, y - 10, "ECR", fontName="Helvetica-Bold", fontSize=28, fillColor=dark))
+    d.add(Circle(LEFT_M + 65, y - 8, 4, fillColor=orange, strokeColor=None))
+    d.add(String(LEFT_M, y - 22, "ENFORCEMENT NETWORK", fontName="Helvetica", fontSize=7, fillColor=colors.black))
+    # Official Title
+    d.add(String(right_m, y - 5, "E-CHALLAN NOTICE", fontName="Helvetica-Bold", fontSize=12, textAnchor='end'))
+    d.add(String(right_m, y - 18, "MINISTRY OF ROAD TRANSPORT & HIGHWAYS", fontName="Helvetica", fontSize=8,
+                 textAnchor='end'))
+    d.add(Line(LEFT_M, y - 45, right_m, y - 45, strokeColor=colors.black, strokeWidth=0.5))
+    # Footer
+    for fy, text in ((40, "This is a computer-generated document. No signature is required."),
+                     (30, "PROCESSED BY ECR ENFORCEMENT SYSTEM v2.0")):
+        d.add(String(width / 2, fy, text, fontName="Helvetica", fontSize=7, fillColor=colors.darkgrey,
+                     textAnchor='middle'))
+    return d
+
+
+def _place_letterhead(p):
+    p.beginForm('letterhead')
+    renderPDF.draw(letterhead(), p, 0, 0)
+    p.endForm()
+    p.doForm('letterhead')
+
+
+class ChallanPdfRenderer:
+    def __init__(self, app_dir, cache_mb=PDF_CACHE_MB, thumb_cache_size=PDF_THUMB_CACHE_SIZE):
+        self.app_dir = app_dir
+        self.cache_bytes = int(cache_mb * 1024 * 1024)
+        self.thumb_cache_size = thumb_cache_size
+        self._pdfs = collections.OrderedDict()  # challan_id -> (content hash, pdf bytes)
+        self._pdf_bytes = 0
+        self._thumbs = collections.OrderedDict()  # (path, mtime_ns, size) -> jpeg bytes or None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'renders': 0, 'thumb_hits': 0, 'thumbs': 0}
+
+    # --- Caching ---
+    def _evidence_path(self, d):
+        rel = d.get('proof_image_path', '')
+        if not rel: return None
+        path = os.path.join(self.app_dir, rel.lstrip('/'))
+        return path if os.path.exists(path) else None
+
+    def content_hash(self, d, evidence=None):
+        fields = {k: d.get(k) for k in HASHED_FIELDS}
+        if evidence:
+            st = os.stat(evidence)
+            fields['evidence'] = (st.st_mtime_ns, st.st_size)
+        return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, d):
+        """PDF bytes for challan document `d`, rendered only if it changed since the last call."""
+        cid = d.get('challan_id')
+        digest = self.content_hash(d, self._evidence_path(d))
+        with self._lock:
+            hit = self._pdfs.get(cid)
+            if hit and hit[0] == digest:
+                self._pdfs.move_to_end(cid)
+                self.stats['hits'] += 1
+                return hit[1]
+        data = self.render(d)
+        with self._lock:
+            old = self._pdfs.pop(cid, None)
+            if old: self._pdf_bytes -= len(old[1])
+            if cid and len(data) <= self.cache_bytes:
+                self._pdfs[cid] = (digest, data)
+                self._pdf_bytes += len(data)
+            while self._pdf_bytes > self.cache_bytes:
+                _, (_, evicted) = self._pdfs.popitem(last=False)
+                self._pdf_bytes -= len(evicted)
+        return data
+
+    def invalidate(self, challan_id):
+        with self._lock:
+            old = self._pdfs.pop(challan_id, None)
+            if old: self._pdf_bytes -= len(old[1])
+
+    def thumbnail(self, path):
+        """Evidence image downscaled to print size, as JPEG bytes (None if unreadable)."""
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key in self._thumbs:
+                self._thumbs.move_to_end(key)
+                self.stats['thumb_hits'] += 1
+                return self._thumbs[key]
+        thumb = None
+        img = cv2.imread(path)
+        if img is not None:
+            h, w = img.shape[:2]
+            scale = min(1.0, EVIDENCE_BOX[0] * THUMB_SCALE / w, EVIDENCE_BOX[1] * THUMB_SCALE / h)
+            if scale < 1.0:
+                img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, THUMB_JPEG_QUALITY])
+            if ok: thumb = buf.tobytes()
+        with self._lock:
+            self.stats['thumbs'] += 1
+            self._thumbs[key] = thumb
+            while len(self._thumbs) > self.thumb_cache_size: self._thumbs.popitem(last=False)
+        return thumb
+
+    # --- Rendering ---
+    @metrics.instrument('pdf_render')
+    def render(self, d):
+        self.stats['renders'] += 1
+        buffer = io.BytesIO()
+        p = canvas.Canvas(buffer, pagesize=letter)
+        width, height = letter
+        left_m, right_m = LEFT_M, width - LEFT_M
+        y = height - 50
+
+        # --- Header ---
+        _place_letterhead(p)
+        p.setFillColor(colors.black)
+        p.setFont("Helvetica", 8)
+        ts = d.get('issue_timestamp')
+        if hasattr(ts, 'strftime'): ts_str = ts.strftime('%d/%m/%Y %H:%M')
+        else: ts_str = str(ts)
+        p.drawRightString(right_m, y - 30, f"Date: {ts_str}")
+
+        y -= 45
+        p.setStrokeColor(colors.black)
+        p.setLineWidth(0.5)
+        y -= 25
+
+        # --- Vehicle & Owner Info (Grid) ---
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(left_m, y, "VEHICLE DETAILS")
+        y -= 15
+
+        p.setFont("Helvetica", 9)
+        # Row 1
+        p.drawString(left_m, y, "Registration No:")
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(left_m + 80, y, str(d.get('plate_number', 'N/A')))
+
+        p.setFont("Helvetica", 9)
+        p.drawString(left_m + 250, y, "Challan ID:")
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(left_m + 310, y, str(d.get('challan_id', 'N/A')))
+        y -= 15
+
+        # Row 2
+        p.setFont("Helvetica", 9)
+        p.drawString(left_m, y, "Owner Name:")
+        p.drawString(left_m + 80, y, str(d.get('owner_name', 'Unknown')))
+
+        p.drawString(left_m + 250, y, "Location:")
+        p.drawString(left_m + 310, y, str(d.get('location', 'DELHI ZONE 04')))
+        y -= 25
+
+        p.line(left_m, y, right_m, y)
+        y -= 25
+
+        # --- Violation Table ---
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(left_m, y, "VIOLATION BREAKDOWN")
+        y -= 15
+
+        # Table Header
+        p.setFillColorRGB(0.95, 0.95, 0.95)
+        p.rect(left_m, y - 5, width - 100, 18, fill=1, stroke=0)
+        p.setFillColor(colors.black)
+        p.setFont("Helvetica-Bold", 8)
+        p.drawString(left_m + 10, y, "DESCRIPTION")
+        p.drawString(right_m - 80, y, "AMOUNT (INR)")
+        y -= 20
+
+        # Items
+        v_str = str(d.get('violation_type', ''))
+        violations = [v.strip() for v in v_str.split(',') if v.strip()]
+
+        if not violations: violations = ["Traffic Violation"]
+
+        total_calc = 0
+        p.setFont("Helvetica", 9)
+
+        for v in violations:
+            charge = get_fine(v)
+            total_calc += charge
+            p.drawString(left_m + 10, y, v)
+            p.drawRightString(right_m - 60, y, f"{charge:.2f}")
+            y -= 15
+
+        # Divider
+        y -= 5
+        p.line(left_m + 250, y, right_m - 50, y)
+        y -= 15
+
+        # Total
+        override_total = float(d.get('fine_amount', 0))
+        # Use override if available and > 0, else calculated
+        final_total = override_total if override_total > 0 else total_calc
+
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(left_m + 250, y, "TOTAL PAYABLE AMOUNT")
+        p.drawRightString(right_m - 60, y, f"Rs. {final_total:.2f}")
+        y -= 40
+
+        # --- Evidence Image (Color) ---
+        evidence = self._evidence_path(d)
+        if evidence:
+            try:
+                thumb = self.thumbnail(evidence)
+                if thumb:
+                    p.setFont("Helvetica-Bold", 9)
+                    p.drawString(left_m, y, "EVIDENCE / CAPTURE")
+                    y -= 10
+                    img_w, img_h = EVIDENCE_BOX
+                    # Preserve aspect ratio roughly
+                    p.drawImage(ImageReader(io.BytesIO(thumb)), left_m, y - img_h, width=img_w, height=img_h,
+                                preserveAspectRatio=True)
+                    # Border
+                    p.setStrokeColor(colors.black)
+                    p.rect(left_m, y - img_h, img_w, img_h, fill=0)
+                    y -= (img_h + 20)
+            except Exception: pass
+
+        p.showPage()
+        p.save()
+        return buffer.getvalue()
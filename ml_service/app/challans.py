@@ -0,0 +1,36 @@
+"""Challan issue: inserting a challan under a fresh ECH-XXXXXXXX id.
+
+challan_id is uniquely indexed (schema.py), so ids are drawn at random and a
+colliding one is redrawn rather than checked for up front. Every path that
+issues a challan (manual entry, upload scans, live cameras) and the
+challan_issue benchmark stage go through insert_challan.
+"""
+import uuid
+
+from pymongo.errors import DuplicateKeyError
+
+# A colliding id is redrawn this many times
+CHALLAN_ID_ATTEMPTS = 5
+
+
+def new_challan_id():
+    return f"ECH-{uuid.uuid4().hex[:8].upper()}"
+
+
+def insert_challan(col, doc, on_insert=None, attempts=CHALLAN_ID_ATTEMPTS):
+    """Insert `doc` into `col` under a new challan_id, redrawing it on a collision; returns the id.
+
+    on_insert() runs once the insert succeeds (the dashboard stats invalidate themselves there).
+    """
+    for attempt in range(attempts):
+        doc['challan_id'] = new_challan_id()
+        try:
+            col.insert_one(doc)
+        except DuplicateKeyError as e:
+            doc.pop('_id', None)  # set by the failed insert_one
+            # Only an id collision is retried, not a duplicate on some other unique index
+            if 'challan_id' not in ((e.details or {}).get('keyPattern') or {'challan_id': 1}): raise
+            if attempt == attempts - 1: raise
+            continue
+        if on_insert: on_insert()
+        return doc['challan_id']
@@ -1,148 +1,278 @@
-import pandas as pd
+"""Cleaning pipeline for the vehicle dataset: a quality report plus vectorized fixes.
+
+    python clean_dataset.py indian_vehicle_dataset_non_ev.xlsx          # -> indian_vehicle_dataset_non_ev_CLEANED.xlsx
+    python clean_dataset.py indian_vehicle_dataset.csv --out cleaned.parquet --chunk-rows 200000 --seed 7
+    python clean_dataset.py indian_vehicle_dataset.csv --report-only --json
+
+Input and output may be CSV, Parquet or XLSX (picked by extension). Rows are
+read and written `chunk_rows` at a time, so memory stays bounded by the chunk,
+not the registry. Every fix is a column operation on the chunk:
+
+- EVs (vehicle class matching EV/Electric) get fuel type 'Electric', PUC status
+  'Not Required' and no PUC expiry.
+- Missing insurance statuses are drawn from Valid / Expired / Expiring Soon;
+  missing RC statuses become 'Active'.
+- Insurance expiry dates are generated for every row whose status is not Valid
+  or whose date is missing: Valid 30-365 days ahead, Expiring Soon 1-30 days
+  ahead, Expired 1-180 days back. Non-EV PUC dates likewise (Valid 30-180 ahead,
+  Expired 1-90 back).
+
+Random draws come from one numpy Generator seeded with --seed, so a run is
+reproducible for the same input, seed, chunk size and --today. Column names are
+matched case-insensitively (the XLSX keeps the CSV's Title_Case headers).
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import sys
+import time
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
-
-# Load the dataset
-print("Loading dataset...")
-df = pd.read_excel('indian_vehicle_dataset_non_ev.xlsx')
-
-print(f"\n{'='*80}")
-print(f"ORIGINAL DATASET ANALYSIS")
-print(f"{'='*80}")
-print(f"Total records: {len(df)}")
-print(f"\nColumns: {df.columns.tolist()}")
-print(f"\nFirst 5 rows:")
-print(df.head().to_string())
-
-print(f"\n{'='*80}")
-print(f"DATA QUALITY ISSUES")
-print(f"{'='*80}")
-
-# Check for impurities
-issues = []
-
-# 1. Check for fuel type in EVs
-if 'fuel_type' in df.columns and 'vehicle_class' in df.columns:
-    ev_with_fuel = df[(df['vehicle_class'].str.contains('EV|Electric', case=False, na=False)) & 
-                      (df['fuel_type'].notna()) & 
-                      (~df['fuel_type'].str.contains('Electric|Battery', case=False, na=False))]
-    if len(ev_with_fuel) > 0:
-        issues.append(f"❌ {len(ev_with_fuel)} EVs have non-electric fuel types")
-        print(f"\n1. EVs with wrong fuel type: {len(ev_with_fuel)} records")
-        print(ev_with_fuel[['registration_number', 'vehicle_class', 'fuel_type']].head(10))
-
-# 2. Check for PUC in EVs
-if 'puc_status' in df.columns and 'vehicle_class' in df.columns:
-    ev_with_puc = df[(df['vehicle_class'].str.contains('EV|Electric', case=False, na=False)) & 
-                     (df['puc_status'].notna())]
-    if len(ev_with_puc) > 0:
-        issues.append(f"❌ {len(ev_with_puc)} EVs have PUC status (EVs don't need PUC)")
-        print(f"\n2. EVs with PUC status: {len(ev_with_puc)} records")
-
-# 3. Check for missing critical fields
-critical_fields = ['registration_number', 'insurance_status', 'rc_status']
-for field in critical_fields:
-    if field in df.columns:
-        missing = df[field].isna().sum()
-        if missing > 0:
-            issues.append(f"❌ {missing} records missing {field}")
-            print(f"\n3. Missing {field}: {missing} records")
-
-# 4. Check for invalid dates
-date_fields = ['insurance_expiry', 'puc_expiry', 'fitness_expiry', 'permit_expiry']
-for field in date_fields:
-    if field in df.columns:
+import pandas as pd
+
+CHUNK_ROWS = int(os.getenv('CLEAN_CHUNK_ROWS', 100_000))
+EV_PATTERN = 'EV|Electric'
+CRITICAL_FIELDS = ('registration_number', 'insurance_status', 'rc_status')
+DATE_FIELDS = ('insurance_expiry', 'puc_expiry', 'fitness_expiry', 'permit_expiry')
+INSURANCE_STATUSES = np.array(['Valid', 'Expired', 'Expiring Soon'])
+# status -> (min days, max days, direction) for generated expiry dates
+INSURANCE_RULES = {'Valid': (30, 365, 1), 'Expired': (1, 180, -1), 'Expiring Soon': (1, 30, 1)}
+PUC_RULES = {'Valid': (30, 180, 1), 'Expired': (1, 90, -1)}
+
+
+def resolve_columns(columns):
+    """lower-cased name -> actual column name."""
+    return {c.lower(): c for c in columns}
+
+
+def random_dates(rng, today, n, lo, hi, sign):
+    """n '%Y-%m-%d' strings between lo and hi days from today (back when sign is -1)."""
+    days = rng.integers(lo, hi + 1, n) * sign
+    return np.datetime_as_string(today + days.astype('timedelta64[D]'), unit='D')
+
+
+def _ev_mask(df, cols):
+    return df[cols['vehicle_class']].astype('string').str.contains(EV_PATTERN, case=False, na=False).to_numpy(bool)
+
+
+# --- Quality checks ---
+def find_issues(df, cols):
+    """Counts of each data quality issue in one chunk, before cleaning."""
+    issues = collections.Counter()
+    if 'vehicle_class' in cols:
+        ev = _ev_mask(df, cols)
+        if 'fuel_type' in cols:
+            fuel = df[cols['fuel_type']]
+            electric = fuel.astype('string').str.contains('Electric|Battery', case=False, na=False).to_numpy(bool)
+            issues['EVs with a non-electric fuel type'] += int((ev & fuel.notna().to_numpy() & ~electric).sum())
+        if 'puc_status' in cols:
+            issues['EVs with a PUC status'] += int((ev & df[cols['puc_status']].notna().to_numpy()).sum())
+    for field in CRITICAL_FIELDS:
+        if field in cols: issues[f"missing {field}"] += int(df[cols[field]].isna().sum())
+    for field in DATE_FIELDS:
+        if field in cols:
+            s = df[cols[field]]
+            parsed = pd.to_datetime(s, errors='coerce', format='ISO8601')
+            issues[f"invalid dates in {field}"] += int((s.notna() & parsed.isna()).sum())
+    return issues
+
+
+# --- Fixes ---
+def _expiry_dates(df, status_col, expiry_col, rules, rows, rng, today):
+    """Fill expiry_col for `rows` that are missing a date or not Valid; returns rows changed."""
+    status = df[status_col].to_numpy(object)
+    redo = rows & (df[expiry_col].isna().to_numpy() | (status != 'Valid'))
+    changed = 0
+    for name, (lo, hi, sign) in rules.items():
+        idx = np.flatnonzero(redo & (status == name))
+        if len(idx):
+            df.iloc[idx, df.columns.get_loc(expiry_col)] = random_dates(rng, today, len(idx), lo, hi, sign)
+            changed += len(idx)
+    return changed
+
+
+def clean_chunk(df, rng, today):
+    """Apply every fix to one chunk in place; returns counts of the rows each fix touched."""
+    cols = resolve_columns(df.columns)
+    fixes = collections.Counter()
+    everyone = np.ones(len(df), dtype=bool)
+    ev = _ev_mask(df, cols) if 'vehicle_class' in cols else np.zeros(len(df), dtype=bool)
+    for col in ('fuel_type', 'puc_status', 'puc_expiry', 'insurance_status', 'insurance_expiry', 'rc_status'):
+        # Text columns that may come in all-empty (float) and receive strings
+        if col in cols: df[cols[col]] = df[cols[col]].astype(object)
+
+    if ev.any():
+        if 'fuel_type' in cols:
+            df.loc[ev, cols['fuel_type']] = 'Electric'
+            fixes["EV fuel type set to 'Electric'"] += int(ev.sum())
+        if 'puc_status' in cols:
+            df.loc[ev, cols['puc_status']] = 'Not Required'
+            if 'puc_expiry' in cols: df.loc[ev, cols['puc_expiry']] = None
+            fixes["EV PUC set to 'Not Required'"] += int(ev.sum())
+
+    if 'insurance_status' in cols:
+        missing = df[cols['insurance_status']].isna().to_numpy()
+        if missing.any():
+            df.loc[missing, cols['insurance_status']] = INSURANCE_STATUSES[rng.integers(0, 3, int(missing.sum()))]
+            fixes['insurance status assigned'] += int(missing.sum())
+    if 'rc_status' in cols:
+        missing = df[cols['rc_status']].isna().to_numpy()
+        if missing.any():
+            df.loc[missing, cols['rc_status']] = 'Active'
+            fixes["RC status set to 'Active'"] += int(missing.sum())
+
+    if 'insurance_expiry' in cols and 'insurance_status' in cols:
+        fixes['insurance expiry generated'] += _expiry_dates(
+            df, cols['insurance_status'], cols['insurance_expiry'], INSURANCE_RULES, everyone, rng, today)
+    if 'puc_expiry' in cols and 'puc_status' in cols:
+        fixes['PUC expiry generated'] += _expiry_dates(
+            df, cols['puc_status'], cols['puc_expiry'], PUC_RULES, ~ev, rng, today)
+    return fixes
+
+
+# --- Chunked I/O ---
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.csv', '.txt'): return 'csv'
+    if ext in ('.parquet', '.pq'): return 'parquet'
+    if ext in ('.xlsx', '.xlsm'): return 'xlsx'
+    raise ValueError(f"unsupported file type {ext!r}; expected .csv, .parquet or .xlsx")
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of up to chunk_rows rows from a CSV, Parquet or XLSX file."""
+    fmt = _format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=True)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
         try:
-            invalid_dates = df[field].notna() & (pd.to_datetime(df[field], errors='coerce').isna())
-            if invalid_dates.sum() > 0:
-                issues.append(f"❌ {invalid_dates.sum()} invalid dates in {field}")
-                print(f"\n4. Invalid dates in {field}: {invalid_dates.sum()} records")
-        except:
-            pass
-
-print(f"\n{'='*80}")
-print(f"SUMMARY: {len(issues)} issues found")
-print(f"{'='*80}")
-for issue in issues:
-    print(issue)
-
-print(f"\n{'='*80}")
-print(f"CLEANING DATASET...")
-print(f"{'='*80}")
-
-# Create a cleaned copy
-df_clean = df.copy()
-
-# Fix 1: Remove fuel type from EVs or set to "Electric"
-if 'fuel_type' in df_clean.columns and 'vehicle_class' in df_clean.columns:
-    ev_mask = df_clean['vehicle_class'].str.contains('EV|Electric', case=False, na=False)
-    df_clean.loc[ev_mask, 'fuel_type'] = 'Electric'
-    print("✅ Fixed: Set fuel_type to 'Electric' for all EVs")
-
-# Fix 2: Remove PUC requirement from EVs
-if 'puc_status' in df_clean.columns and 'vehicle_class' in df_clean.columns:
-    ev_mask = df_clean['vehicle_class'].str.contains('EV|Electric', case=False, na=False)
-    df_clean.loc[ev_mask, 'puc_status'] = 'Not Required'
-    df_clean.loc[ev_mask, 'puc_expiry'] = None
-    print("✅ Fixed: Set PUC to 'Not Required' for all EVs")
-
-# Fix 3: Ensure all vehicles have insurance status
-if 'insurance_status' in df_clean.columns:
-    missing_insurance = df_clean['insurance_status'].isna()
-    if missing_insurance.sum() > 0:
-        # Randomly assign Valid/Expired/Expiring Soon
-        statuses = ['Valid', 'Expired', 'Expiring Soon']
-        df_clean.loc[missing_insurance, 'insurance_status'] = np.random.choice(statuses, missing_insurance.sum())
-        print(f"✅ Fixed: Assigned insurance status to {missing_insurance.sum()} records")
-
-# Fix 4: Ensure all vehicles have RC status
-if 'rc_status' in df_clean.columns:
-    missing_rc = df_clean['rc_status'].isna()
-    if missing_rc.sum() > 0:
-        df_clean.loc[missing_rc, 'rc_status'] = 'Active'
-        print(f"✅ Fixed: Set RC status to 'Active' for {missing_rc.sum()} records")
-
-# Fix 5: Generate valid expiry dates
-today = datetime.now()
-
-if 'insurance_expiry' in df_clean.columns:
-    for idx, row in df_clean.iterrows():
-        if pd.isna(row['insurance_expiry']) or row['insurance_status'] != 'Valid':
-            if row['insurance_status'] == 'Valid':
-                # Valid: 1-12 months in future
-                df_clean.at[idx, 'insurance_expiry'] = (today + timedelta(days=random.randint(30, 365))).strftime('%Y-%m-%d')
-            elif row['insurance_status'] == 'Expired':
-                # Expired: 1-180 days in past
-                df_clean.at[idx, 'insurance_expiry'] = (today - timedelta(days=random.randint(1, 180))).strftime('%Y-%m-%d')
-            elif row['insurance_status'] == 'Expiring Soon':
-                # Expiring Soon: 1-30 days in future
-                df_clean.at[idx, 'insurance_expiry'] = (today + timedelta(days=random.randint(1, 30))).strftime('%Y-%m-%d')
-    print("✅ Fixed: Generated valid insurance expiry dates")
-
-# Fix 6: PUC dates for non-EVs
-if 'puc_expiry' in df_clean.columns and 'puc_status' in df_clean.columns:
-    non_ev_mask = ~df_clean['vehicle_class'].str.contains('EV|Electric', case=False, na=False)
-    for idx, row in df_clean[non_ev_mask].iterrows():
-        if pd.isna(row['puc_expiry']) or row['puc_status'] != 'Valid':
-            if row['puc_status'] == 'Valid':
-                df_clean.at[idx, 'puc_expiry'] = (today + timedelta(days=random.randint(30, 180))).strftime('%Y-%m-%d')
-            elif row['puc_status'] == 'Expired':
-                df_clean.at[idx, 'puc_expiry'] = (today - timedelta(days=random.randint(1, 90))).strftime('%Y-%m-%d')
-    print("✅ Fixed: Generated valid PUC expiry dates for non-EVs")
-
-# Save cleaned dataset
-output_file = 'indian_vehicle_dataset_non_ev_CLEANED.xlsx'
-df_clean.to_excel(output_file, index=False)
-print(f"\n✅ Cleaned dataset saved to: {output_file}")
-
-print(f"\n{'='*80}")
-print(f"CLEANING COMPLETE")
-print(f"{'='*80}")
-print(f"Original records: {len(df)}")
-print(f"Cleaned records: {len(df_clean)}")
-print(f"Records removed: {len(df) - len(df_clean)}")
-
-# Show sample of cleaned data
-print(f"\nSample of cleaned data:")
-print(df_clean.head(10)[['registration_number', 'vehicle_class', 'fuel_type', 'insurance_status', 'puc_status']].to_string())
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(h) for h in next(rows, ())]
+            buf = []
+            for row in rows:
+                if not any(v is not None for v in row): continue
+                buf.append(row)
+                if len(buf) >= chunk_rows:
+                    yield pd.DataFrame(buf, columns=header)
+                    buf = []
+            if buf: yield pd.DataFrame(buf, columns=header)
+        finally:
+            wb.close()
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to a CSV, Parquet or XLSX file (write-only, never held whole)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt = _format(path)
+        self.rows = 0
+        self._out = None
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        elif self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Text columns throughout: chunks of one column can otherwise infer different types
+            table = pa.Table.from_pandas(df.astype('string'), preserve_index=False)
+            if self._out is None: self._out = pq.ParquetWriter(self.path, table.schema)
+            self._out.write_table(table)
+        else:
+            if self._out is None:
+                from openpyxl import Workbook
+                self._out = Workbook(write_only=True)
+                self._sheet = self._out.create_sheet('Vehicle Data')
+                self._sheet.append(list(df.columns))
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                self._sheet.append(row)
+        self.rows += len(df)
+
+    def close(self):
+        if self._out is None: return
+        if self.fmt == 'parquet': self._out.close()
+        else: self._out.save(self.path)
+
+
+# --- Pipeline ---
+class QualityReport:
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.columns = []
+        self.issues = collections.Counter()
+        self.fixes = collections.Counter()
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {'rows': self.rows, 'chunks': self.chunks, 'columns': self.columns, 'seconds': round(self.seconds, 2),
+                'issues': dict(self.issues), 'fixes': dict(self.fixes)}
+
+    def format(self):
+        pct = lambda n: f"{100 * n / max(self.rows, 1):.2f}%"
+        lines = [f"{self.rows} records in {self.chunks} chunks, {len(self.columns)} columns, {self.seconds:.1f}s",
+                 f"Issues found: {sum(1 for n in self.issues.values() if n)}"]
+        lines += [f"  {name:<40} {n:>10} {pct(n):>8}" for name, n in self.issues.items() if n]
+        if self.fixes:
+            lines.append("Fixes applied:")
+            lines += [f"  {name:<40} {n:>10} {pct(n):>8}" for name, n in self.fixes.items() if n]
+        return "\n".join(lines)
+
+
+def clean(src, out=None, chunk_rows=CHUNK_ROWS, seed=0, today=None):
+    """Clean `src` into `out` chunk by chunk (report only when out is None); returns the QualityReport."""
+    today = np.datetime64(today or datetime.date.today(), 'D')
+    rng = np.random.default_rng(seed)
+    report = QualityReport()
+    writer = ChunkWriter(out) if out else None
+    t0 = time.perf_counter()
+    try:
+        for df in read_chunks(src, chunk_rows):
+            if not report.chunks: report.columns = list(df.columns)
+            report.chunks += 1
+            report.rows += len(df)
+            report.issues.update(find_issues(df, resolve_columns(df.columns)))
+            if writer:
+                report.fixes.update(clean_chunk(df, rng, today))
+                writer.write(df)
+    finally:
+        if writer: writer.close()
+    report.seconds = time.perf_counter() - t0
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Report and fix data quality issues in the vehicle dataset")
+    ap.add_argument('src', help=".csv, .parquet or .xlsx")
+    ap.add_argument('--out', help="output file; its extension picks the format (default: <src>_CLEANED.<ext>)")
+    ap.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--today', type=datetime.date.fromisoformat, help="date expiries are generated around (YYYY-MM-DD)")
+    ap.add_argument('--report-only', action='store_true', help="check the input without writing a cleaned copy")
+    ap.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = ap.parse_args(argv)
+    out = None
+    if not args.report_only:
+        stem, ext = os.path.splitext(args.src)
+        out = args.out or f"{stem}_CLEANED{ext}"
+    try:
+        report = clean(args.src, out, args.chunk_rows, args.seed, args.today)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"clean_dataset: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report.as_dict(), indent=2) if args.json else report.format())
+    if out and not args.json: print(f"Cleaned dataset saved to: {out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
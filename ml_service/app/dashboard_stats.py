@@ -0,0 +1,134 @@
+"""Challan statistics for /dashboard and /dashboard_stats, computed in one pass and cached.
+
+Counts, revenue, unpaid amounts and the violation buckets come from a single
+`$facet` aggregation instead of one query each. Results are kept for
+DASHBOARD_CACHE_TTL seconds; challan inserts and payments call `invalidate()`,
+so the TTL only bounds staleness from writers outside this process.
+"""
+import datetime
+import os
+import re
+import threading
+import time
+
+from listing import LIST_PAGE_SIZE, page
+
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 15))
+RECENT_DAYS = 30
+PENDING_STATUSES = ["Pending", "Unpaid"]
+# Dashboard bucket -> substring of violation_type it counts (a challan may fall in several)
+VIOLATION_BUCKETS = {'Expired Insurance': 'Insurance', 'Expired PUC': 'PUC', 'Expired RC': 'RC',
+                     'Expired Fitness': 'Fitness', 'No Permit': 'Permit', 'Unpaid Tax': 'Tax'}
+RECENT_FIELDS = {"challan_id": 1, "plate_number": 1, "violation_type": 1, "fine_amount": 1,
+                 "status": 1, "issue_timestamp": 1, "proof_image_path": 1}
+
+
+def _contains(field, sub):
+    return {"$regexMatch": {"input": {"$toString": {"$ifNull": [field, ""]}}, "regex": re.escape(sub)}}
+
+
+def summary_pipeline(since, today):
+    pending = {"$in": ["$status", PENDING_STATUSES]}
+    paid = {"$eq": ["$status", "Paid"]}
+    count_if = lambda cond: {"$sum": {"$cond": [cond, 1, 0]}}
+    return [{"$facet": {
+        "totals": [{"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "pending": count_if(pending),
+            "paid": count_if(paid),
+            "revenue": {"$sum": {"$cond": [paid, "$fine_amount", 0]}},
+            "unpaid": {"$sum": {"$cond": [pending, "$fine_amount", 0]}},
+            "recent": count_if({"$gte": ["$issue_timestamp", since]}),
+            "today": count_if({"$gte": ["$issue_timestamp", today]}),
+        }}],
+        # Group by distinct violation string first so the substring tests run once per string
+        "violations": [
+            {"$group": {"_id": "$violation_type", "c": {"$sum": 1}}},
+            {"$group": dict({"_id": None}, **{f"b{i}": {"$sum": {"$cond": [_contains("$_id", sub), "$c", 0]}}
+                                               for i, sub in enumerate(VIOLATION_BUCKETS.values())})},
+        ],
+    }}]
+
+
+def format_recent(d):
+    return {
+        'id': d.get('challan_id'),
+        'plate': d.get('plate_number'),
+        'type': d.get('violation_type'),
+        'amount': d.get('fine_amount'),
+        'status': d.get('status'),
+        'date': d.get('issue_timestamp').strftime('%d %b %Y | %I:%M %p'),
+        'image_path': d.get('proof_image_path', '')
+    }
+
+
+class DashboardStats:
+    def __init__(self, collection, ttl=DASHBOARD_CACHE_TTL):
+        self.col = collection
+        self.ttl = ttl
+        self._cache = {}  # key -> (expires_at, value)
+        self._version = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._version += 1
+            self.stats['invalidations'] += 1
+
+    def _cached(self, key, load):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                self.stats['hits'] += 1
+                return hit[1]
+            self.stats['misses'] += 1
+            version = self._version
+        value = load()
+        with self._lock:
+            # A write landed while loading; serve this result once but do not keep it
+            if version == self._version: self._cache[key] = (now + self.ttl, value)
+        return value
+
+    def summary(self):
+        """Totals, revenue/unpaid sums and violation buckets for the whole collection."""
+        return self._cached('summary', self._load_summary)
+
+    def _load_summary(self):
+        now = datetime.datetime.now()
+        since = now - datetime.timedelta(days=RECENT_DAYS)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        res = next(iter(self.col.aggregate(summary_pipeline(since, today))), {})
+        totals = (res.get('totals') or [{}])[0]
+        buckets = (res.get('violations') or [{}])[0]
+        return {
+            'total': totals.get('total', 0),
+            'pending': totals.get('pending', 0),
+            'paid': totals.get('paid', 0),
+            'revenue': totals.get('revenue', 0),
+            'unpaid': totals.get('unpaid', 0),
+            'recent': totals.get('recent', 0),
+            'today': totals.get('today', 0),
+            'violation_counts': {name: buckets.get(f"b{i}", 0) for i, name in enumerate(VIOLATION_BUCKETS)},
+        }
+
+    def latest(self, limit=10):
+        """Newest challans as full documents (dashboard table)."""
+        return self._cached(('latest', limit), lambda: list(self.col.find().sort("issue_timestamp", -1).limit(limit)))
+
+    def recent_filter(self, days=RECENT_DAYS):
+        return {"issue_timestamp": {"$gte": datetime.datetime.now() - datetime.timedelta(days=days)}}
+
+    def recent_page(self, cursor=None, limit=LIST_PAGE_SIZE, days=RECENT_DAYS):
+        """One page of the last `days` days of challans, formatted for the admin dashboard.
+
+        Returns (rows, next_cursor); only the first page is cached.
+        """
+        def load():
+            docs, nxt = page(self.col, self.recent_filter(days), "issue_timestamp", RECENT_FIELDS, cursor, limit)
+            return [format_recent(d) for d in docs], nxt
+        if cursor: return load()
+        return self._cached(('recent', days, limit), load)
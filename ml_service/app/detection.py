@@ -0,0 +1,289 @@
+"""Plate detection (YOLO) and reading (EasyOCR) shared by the scan and live endpoints.
+
+Kept out of app.py so the models can be used, and benchmarked, without starting
+the Flask app or connecting to MongoDB.
+
+One YOLO model and one OCR engine are loaded per process and shared by the
+camera detect thread, the scan job workers and request handlers. Neither is
+thread-safe (ultralytics predictors keep per-call state on the model), so every
+YOLO call holds `yolo_lock` and the OCR stage serializes engine calls the same
+way; YOLO on one thread can still overlap OCR on another.
+
+With an inference pool (INFERENCE_WORKERS > 0) every model call goes to the
+worker processes instead, and this process never loads a model: uploaded images
+through `detect_plate_from_image`, and video scans and cameras through
+`detect_candidates_batch` (YOLO boxes) and `read_sightings` (OCR of the
+sightings the tracker asks for). Tracking stays here, since its state spans
+frames; the `*_local` functions are what the workers run.
+"""
+import datetime
+import os
+import threading
+
+import cv2
+
+import metrics
+from frame_sampler import FrameSampler
+from inference import DETECT_BACKEND, MODEL_PATH, load_model
+from ocr_stage import EasyOcrEngine, OcrStage, PlateCandidate
+from tracker import PlateTracker
+
+# OCR engine behind the OCR stage: 'easyocr' or 'plate' (plate_ocr.PlateRecognizer)
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'easyocr')
+
+# Frames per YOLO call in detect_plates_batch
+DETECT_BATCH_SIZE = int(os.getenv('DETECT_BATCH_SIZE', 8))
+
+_model = None
+_reader = None
+_ocr_engine = None
+_ocr_stage = None
+# Held for every call into the shared YOLO model
+yolo_lock = threading.Lock()
+# Two threads asking first must not both load a model
+_load_lock = threading.RLock()
+
+def get_yolo_model():
+    global _model
+    if _model is None:
+        with _load_lock:
+            # DETECT_BACKEND picks the runtime (see inference.py); all return ultralytics Results
+            if _model is None: _model = load_model(DETECT_BACKEND, MODEL_PATH)
+    return _model
+
+def get_ocr_reader():
+    global _reader
+    if _reader is None:
+        with _load_lock:
+            if _reader is None:
+                import easyocr
+                _reader = easyocr.Reader(['en'], gpu=False)
+    return _reader
+
+def _load_frame(image):
+    if isinstance(image, str): return cv2.imread(image)
+    return image.copy() if image is not None else None
+
+def make_ocr_engine(name):
+    if name == 'plate':
+        from plate_ocr import PlateRecognizer
+        return PlateRecognizer()
+    if name == 'easyocr':
+        return EasyOcrEngine(get_ocr_reader())
+    raise ValueError(f"unknown OCR_ENGINE {name!r}; expected 'easyocr' or 'plate'")
+
+def get_ocr_engine():
+    global _ocr_engine
+    if _ocr_engine is None:
+        with _load_lock:
+            if _ocr_engine is None: _ocr_engine = make_ocr_engine(OCR_ENGINE)
+    return _ocr_engine
+
+def get_ocr_stage():
+    global _ocr_stage
+    if _ocr_stage is None:
+        with _load_lock:
+            if _ocr_stage is None: _ocr_stage = OcrStage(get_ocr_engine)
+    return _ocr_stage
+
+def _inference_pool():
+    """The pool to run model calls on, or None to run them here (INFERENCE_WORKERS=0)."""
+    from inference_pool import INFERENCE_WORKERS, get_pool
+    pool = get_pool()
+    # With workers configured the models belong to them; never load a copy here meanwhile
+    if pool is None and INFERENCE_WORKERS > 0: raise RuntimeError("Inference pool is not running")
+    return pool
+
+def _crop(frame, box):
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = box
+    return frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+
+def _plate_candidates(frame, results):
+    """Crops of the boxes above 0.3 confidence in one frame's YOLO results."""
+    cands = []
+    for result in results:
+        for box in result.boxes.cpu().numpy():
+            x1, y1, x2, y2 = (int(v) for v in box.xyxy[0])
+            conf = float(box.conf[0])
+            if conf > 0.3:
+                plate_crop = _crop(frame, (x1, y1, x2, y2))
+                if plate_crop.size > 0:
+                    cands.append(PlateCandidate(conf, (x1, y1, x2, y2), plate_crop))
+    return cands
+
+def annotate_frame(frame, boxes, best_text, best_box, draw_boxes=True):
+    """Draw the candidate boxes and, for a read plate, the highlight and banner."""
+    if not draw_boxes: return frame
+    for x1, y1, x2, y2 in boxes:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 3)
+
+    if best_text and best_box:
+        x1, y1, x2, y2 = best_box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 165, 255), 2)
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 0), -1)
+        frame = cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
+        ts = datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')
+        cv2.putText(frame, f"VEHICLE: {best_text}", (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
+        cv2.putText(frame, f"DATE: {ts}", (20, 60), cv2.FONT_HERSHEY_DUPLEX, 0.6, (200, 200, 200), 1)
+        cv2.putText(frame, "ECR TRAFFIC SYSTEM | DELHI ZONE 04", (frame.shape[1]-400, 45), cv2.FONT_HERSHEY_DUPLEX, 0.6, (0, 165, 255), 1)
+    return frame
+
+def _read_plates(frames, results_per_frame, draw_boxes):
+    """OCR all frames' candidates in one stage call, then annotate each frame."""
+    cands = [_plate_candidates(fr, res) for fr, res in zip(frames, results_per_frame)]
+    # Crops are views of the frames, so read them before any box is drawn
+    reads = get_ocr_stage().read(cands)
+    out = []
+    for fr, fc, (text, conf, crop, box) in zip(frames, cands, reads):
+        fr = annotate_frame(fr, [c.box for c in fc], text, box, draw_boxes)
+        out.append((text, conf, fr, crop, box))
+    return out
+
+def detect_candidates_batch(frames, batch_size=None):
+    """YOLO over `frames`: one list of PlateCandidates per frame, on the inference pool when one runs."""
+    pool = _inference_pool()
+    if pool is None: return detect_candidates_local(frames, batch_size)
+    from inference_pool import INFERENCE_TIMEOUT
+    # All frames are queued first so the workers detect them in parallel
+    futures = [pool.submit_boxes(fr, timeout=INFERENCE_TIMEOUT) for fr in frames]
+    return [[PlateCandidate(conf, box, _crop(fr, box)) for conf, box in f.result(INFERENCE_TIMEOUT)]
+            for fr, f in zip(frames, futures)]
+
+def detect_candidates_local(frames, batch_size=None):
+    return [_plate_candidates(fr, [res]) for fr, res in zip(frames, detect_boxes_batch(frames, batch_size))]
+
+def read_sightings(sightings):
+    """OCR each (frame, PlateCandidate) on its own; [(text, conf)] in order, on the pool when one runs."""
+    pool = _inference_pool()
+    if pool is None:
+        return [(text, conf) for text, conf, _, _ in get_ocr_stage().read([[c] for _, c in sightings])]
+    from inference_pool import INFERENCE_TIMEOUT
+    # One task per frame, reading all of that frame's requested boxes
+    by_frame = {}
+    for k, (frame, _) in enumerate(sightings): by_frame.setdefault(id(frame), (frame, []))[1].append(k)
+    tasks = [(ks, pool.submit_read(frame, [(sightings[k][1].conf, sightings[k][1].box) for k in ks],
+                                   timeout=INFERENCE_TIMEOUT)) for frame, ks in by_frame.values()]
+    out = [None] * len(sightings)
+    for ks, f in tasks:
+        for k, read in zip(ks, f.result(INFERENCE_TIMEOUT)): out[k] = read
+    return out
+
+def read_boxes_local(frame, boxes):
+    """OCR the [(conf, box)] `boxes` of `frame` one at a time: [(text, conf)]."""
+    cands = [PlateCandidate(conf, box, _crop(frame, box)) for conf, box in boxes]
+    return [(text, conf) for text, conf, _, _ in get_ocr_stage().read([[c] for c in cands])]
+
+def track_and_read(tracker, frame_ids, frames, cands_per_frame):
+    """Feed each frame's candidates to `tracker` and OCR only the sightings it asks for.
+
+    All requested crops go through one read_sightings call. Returns the tracks
+    that ended during these frames; live tracks stay in `tracker.tracks`.
+    """
+    ended, wanted = [], []
+    for fid, frame, cands in zip(frame_ids, frames, cands_per_frame):
+        assignments, expired = tracker.update(fid, [(c.box, c.conf) for c in cands])
+        ended.extend(expired)
+        boxes = [c.box for c in cands]
+        for track, di in assignments:
+            if tracker.claim_read(track, cands[di].conf, fid):
+                wanted.append((track, cands[di], frame, boxes))
+    if wanted:
+        reads = read_sightings([(frame, cand) for _, cand, frame, _ in wanted])
+        for (track, cand, frame, boxes), (text, _) in zip(wanted, reads):
+            tracker.add_vote(track, text, cand.conf, (frame, cand.crop, cand.box, boxes))
+    return ended
+
+def track_evidence(track, draw_boxes=True):
+    """(annotated frame, crop, box) of the best read of the track's voted text."""
+    frame, crop, box, boxes = track.evidence[track.text]
+    return annotate_frame(frame.copy(), boxes, track.text, box, draw_boxes), crop, box
+
+def detect_plate_from_image(image, draw_boxes=True):
+    """(text, conf, annotated frame, crop, box) of the best plate in `image` (a path or BGR frame).
+
+    Runs on the inference worker pool when one was started (INFERENCE_WORKERS),
+    else in this process.
+    """
+    pool = _inference_pool()
+    if pool is None: return detect_plate_local(image, draw_boxes)
+    from inference_pool import INFERENCE_TIMEOUT
+    frame = image if not isinstance(image, str) else cv2.imread(image)
+    if frame is None: return None, 0.0, None, None, None
+    return pool.detect(frame, draw_boxes, INFERENCE_TIMEOUT)
+
+def detect_plate_local(image, draw_boxes=True):
+    model = get_yolo_model()
+    frame = _load_frame(image)
+    if frame is None: return None, 0.0, None, None, None
+
+    with yolo_lock, metrics.timer('yolo'):
+        results = model(frame, verbose=False)
+    return _read_plates([frame], [results], draw_boxes)[0]
+
+def detect_boxes_batch(frames, batch_size=None):
+    """Run YOLO over `frames` `batch_size` at a time; yields one Results object per frame."""
+    model = get_yolo_model()
+    batch_size = batch_size or DETECT_BATCH_SIZE
+    for start in range(0, len(frames), batch_size):
+        chunk = frames[start:start + batch_size]
+        with yolo_lock, metrics.timer('yolo', len(chunk)):
+            results = model(chunk, verbose=False)
+        yield from results
+
+def detect_plates_batch(images, draw_boxes=True, batch_size=None):
+    """Batched detect_plate_from_image: one result tuple per input, in order.
+
+    Inputs that cannot be loaded get (None, 0.0, None, None, None), as the
+    single-frame call returns for them.
+    """
+    frames = [_load_frame(im) for im in images]
+    valid = [i for i, fr in enumerate(frames) if fr is not None]
+    out = [(None, 0.0, None, None, None)] * len(frames)
+    batch = [frames[i] for i in valid]
+    results = [[r] for r in detect_boxes_batch(batch, batch_size)]
+    # One OCR stage call for the whole batch so crops from all frames share batches
+    for i, res in zip(valid, _read_plates(batch, results, draw_boxes)):
+        out[i] = res
+    return out
+
+def scan_video(path, progress=None, batch_size=None):
+    """Plates seen in a video file, as {plate: {'conf', 'frame', 'crop'}} with each plate's best read.
+
+    Samples SCAN_SAMPLE_FPS frames per second across the whole clip, runs YOLO
+    in batches (spread over the inference pool when one runs) and OCRs each
+    tracked vehicle on a few frames. `progress(fraction, detection=None)` is called after every batch
+    and with each newly seen plate.
+    """
+    batch_size = batch_size or DETECT_BATCH_SIZE
+    sampler = FrameSampler(path)
+    count = 0 # frames sampled so far
+    unique_plates = {}
+    pending, pending_ids = [], [] # sampled frames waiting for the next YOLO batch
+    tracker = PlateTracker()
+
+    def take(tracks):
+        for t in tracks:
+            text, conf = t.text, t.conf
+            if text and conf > 0.4:
+                if progress and text not in unique_plates:
+                    progress(sampler.progress(count), {'plate': text, 'confidence': round(conf*100, 1)})
+                if text not in unique_plates or conf > unique_plates[text]['conf']:
+                    proc, crop, _ = track_evidence(t)
+                    unique_plates[text] = {'conf': conf, 'frame': proc, 'crop': crop}
+
+    def flush():
+        take(track_and_read(tracker, pending_ids, pending, detect_candidates_batch(pending, batch_size)))
+        pending.clear()
+        pending_ids.clear()
+        if progress: progress(sampler.progress(count))
+
+    for _, _, fr in sampler:
+        pending.append(fr)
+        pending_ids.append(count)
+        count += 1
+        if len(pending) >= batch_size: flush()
+    if pending: flush()
+    take(tracker.finish())
+    return unique_plates
@@ -0,0 +1,82 @@
+"""Time-based frame sampler for uploaded videos: only sampled frames are converted.
+
+Frames between samples are skipped with `grab()`, which still demuxes and
+decodes them (inter-coded frames need their predecessors) but skips the colour
+conversion and copy out; only the sampled frames are retrieved. A gap of at
+least SEEK_MIN_GAP frames is crossed with a seek instead, which lands on the
+previous keyframe and decodes forward from there, so it saves decoding only
+once the gap spans keyframes.
+
+At the defaults (6 fps sampled from 30 fps, a step of 5) no decode is skipped:
+benchmarks/bench_frame_sampler.py on a 60 s 720p clip measures 1.5 s for the
+sampler against 2.4 s reading every frame and 1.2 s just grabbing them, while
+seeking every 5 frames takes 5.6 s. Seeking still loses at a step of 20 (1.4 s
+against 1.2 s grabbing) and wins from 30 on (0.95 s against 1.2 s, 0.2 s
+against 1.1 s at a step of 150), so SEEK_MIN_GAP sits at that crossover and the
+decode time falls with the sampled-frame count once SCAN_SAMPLE_FPS drops to
+1 fps or the SCAN_MAX_FRAMES budget widens the step on long clips. The
+sampling step is widened like that so the whole clip fits in the analysed-frame
+budget, instead of stopping after a fixed frame count.
+"""
+import math
+import os
+
+import cv2
+
+SCAN_SAMPLE_FPS = float(os.getenv('SCAN_SAMPLE_FPS', 6))
+SCAN_MAX_FRAMES = int(os.getenv('SCAN_MAX_FRAMES', 600))
+# Gaps at least this long (in frames) are skipped by seeking rather than grabbing (measured crossover)
+SEEK_MIN_GAP = int(os.getenv('SCAN_SEEK_MIN_GAP', 30))
+DEFAULT_FPS = 30.0
+
+
+class FrameSampler:
+    def __init__(self, path, sample_fps=SCAN_SAMPLE_FPS, max_frames=SCAN_MAX_FRAMES, seek_min_gap=SEEK_MIN_GAP):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 and not math.isnan(fps) else DEFAULT_FPS
+        total = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.total_frames = total if total > 0 else None
+        self.seek_min_gap = seek_min_gap
+
+        self.step = max(1, int(round(self.fps / sample_fps)))
+        if self.total_frames and max_frames and math.ceil(self.total_frames / self.step) > max_frames:
+            # Spread the budget across the whole clip
+            self.step = math.ceil(self.total_frames / max_frames)
+        self.max_frames = max_frames
+        self.planned = math.ceil(self.total_frames / self.step) if self.total_frames else max_frames
+        self.stats = {'grabbed': 0, 'retrieved': 0, 'seeks': 0}
+
+    def progress(self, sampled):
+        return min(sampled / self.planned, 1.0) if self.planned else 0.0
+
+    def __iter__(self):
+        """Yields (frame_index, seconds, frame) for each sampled frame."""
+        cap, pos, n = self.cap, 0, 0
+        try:
+            while cap.isOpened() and (not self.max_frames or n < self.max_frames):
+                target = n * self.step
+                if self.total_frames and target >= self.total_frames: break
+                gap = target - pos
+                # gap is one short of the step: the sampled frame itself was grabbed
+                if gap and self.step >= self.seek_min_gap and self.total_frames:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    self.stats['seeks'] += 1
+                    pos = target
+                else:
+                    while pos < target:
+                        if not cap.grab(): return
+                        self.stats['grabbed'] += 1
+                        pos += 1
+                ok = cap.grab()
+                if not ok: return
+                self.stats['grabbed'] += 1
+                pos += 1
+                ok, frame = cap.retrieve()
+                if not ok: return
+                self.stats['retrieved'] += 1
+                yield target, target / self.fps, frame
+                n += 1
+        finally:
+            cap.release()
@@ -0,0 +1,181 @@
+"""Plate model runtimes: PyTorch, ONNX Runtime and OpenVINO, in FP32 or INT8.
+
+`get_yolo_model` loads whichever runtime DETECT_BACKEND names. Every backend is
+opened through ultralytics' YOLO, which dispatches .onnx files to ONNX Runtime
+and *_openvino_model/ directories to OpenVINO and returns the same Results
+objects as the PyTorch model, so the detection code is backend-agnostic.
+
+The exported artifacts sit next to plate_yolo.pt and are produced once with
+
+    python inference.py export                                  # onnx
+    python inference.py export --backends onnx openvino onnx-int8 openvino-int8 --calib-images samples/
+
+INT8 variants are calibrated on --calib-images (a folder of representative
+frames). Without it onnx-int8 falls back to dynamic quantization and
+openvino-int8 cannot be built.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(APP_DIR, '..', 'module1_plate_detection', 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'plate_yolo.pt')
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8', 'openvino', 'openvino-int8')
+DETECT_BACKEND = os.getenv('DETECT_BACKEND', 'torch')
+# Input size the model is exported and calibrated at (the ultralytics default)
+EXPORT_IMGSZ = int(os.getenv('EXPORT_IMGSZ', 640))
+CALIB_MAX_IMAGES = 300
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def backend_path(backend, model_path=MODEL_PATH):
+    """Where the artifact for `backend` lives (next to the .pt weights)."""
+    stem = os.path.splitext(model_path)[0]
+    return {
+        'torch': model_path,
+        'onnx': stem + '.onnx',
+        'onnx-int8': stem + '.int8.onnx',
+        'openvino': stem + '_openvino_model',
+        'openvino-int8': stem + '_int8_openvino_model',
+    }[backend]
+
+
+def load_model(backend=DETECT_BACKEND, model_path=MODEL_PATH, fallback=True):
+    """YOLO model for `backend`; falls back to the PyTorch weights if it was never exported."""
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown DETECT_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    path = backend_path(backend, model_path)
+    if backend != 'torch' and not os.path.exists(path):
+        if not fallback:
+            raise FileNotFoundError(f"{path} not found; run `python inference.py export --backends {backend}`")
+        print(f"{path} not found; using the PyTorch model (run `python inference.py export --backends {backend}`)")
+        backend, path = 'torch', model_path
+    model = YOLO(path, task='detect')
+    model.backend_name = backend
+    return model
+
+
+# --- Export ---
+def image_files(folder, limit=None):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTS))
+    return [os.path.join(folder, n) for n in names[:limit]]
+
+
+def letterbox(frame, size=EXPORT_IMGSZ):
+    """Resize keeping aspect and pad to size x size, as ultralytics preprocesses (BGR uint8 in, NCHW float out)."""
+    h, w = frame.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = round(h * r), round(w * r)
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(out[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def _calibration_reader(onnx_path, images, imgsz):
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(images)
+
+        def get_next(self):
+            for path in self._it:
+                frame = cv2.imread(path)
+                if frame is not None: return {input_name: letterbox(frame, imgsz)}
+            return None
+
+    return Reader()
+
+
+def quantize_onnx(onnx_path, out_path, calib_images=None, imgsz=EXPORT_IMGSZ):
+    """INT8 ONNX model: static QDQ quantization calibrated on images, else dynamic."""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if not calib_images:
+        quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QUInt8)
+        return out_path
+    # Only Conv/MatMul are quantized; the detect head's decode (Sigmoid, Concat, Mul) stays in float
+    quantize_static(onnx_path, out_path, _calibration_reader(onnx_path, calib_images, imgsz),
+                    quant_format=QuantFormat.QDQ, per_channel=True, op_types_to_quantize=['Conv', 'MatMul'],
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return out_path
+
+
+def _calibration_yaml(tmp, images):
+    """Minimal ultralytics dataset yaml over a flat image folder (labels are not needed to calibrate)."""
+    img_dir = os.path.join(tmp, 'images')
+    os.makedirs(img_dir)
+    for p in images: shutil.copy(p, img_dir)
+    path = os.path.join(tmp, 'calib.yaml')
+    with open(path, 'w') as f:
+        f.write(f"path: {tmp}\ntrain: images\nval: images\nnames:\n  0: plate\n")
+    return path
+
+
+def export(backends=('onnx',), model_path=MODEL_PATH, calib_dir=None, imgsz=EXPORT_IMGSZ, log=print):
+    """Write the artifacts for `backends` next to `model_path`; returns {backend: path}."""
+    from ultralytics import YOLO
+
+    calib = image_files(calib_dir, CALIB_MAX_IMAGES) if calib_dir else []
+    if calib_dir and not calib: raise ValueError(f"no images in {calib_dir}")
+    if 'openvino-int8' in backends and not calib:
+        raise ValueError("openvino-int8 needs --calib-images")
+    out = {}
+    # Dynamic axes everywhere so detect_boxes_batch can send any batch size
+    for backend in backends:
+        target = backend_path(backend, model_path)
+        if backend == 'torch': continue
+        if backend in ('onnx', 'onnx-int8') and 'onnx' not in out:
+            out['onnx'] = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        if backend == 'onnx-int8':
+            quantize_onnx(out['onnx'], target, calib, imgsz)
+            out[backend] = target
+        elif backend == 'openvino':
+            out[backend] = YOLO(model_path).export(format='openvino', imgsz=imgsz, dynamic=True)
+        elif backend == 'openvino-int8':
+            with tempfile.TemporaryDirectory() as tmp:
+                path = YOLO(model_path).export(format='openvino', imgsz=imgsz, dynamic=True, int8=True,
+                                               data=_calibration_yaml(tmp, calib))
+            # ultralytics names it like the FP32 export; keep both side by side
+            if os.path.abspath(path) != os.path.abspath(target):
+                if os.path.isdir(target): shutil.rmtree(target)
+                os.replace(path, target)
+            out[backend] = target
+        log(f"{backend}: {out.get(backend, target)}")
+    return {b: p for b, p in out.items() if b in backends}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export the plate model to CPU inference runtimes")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    ex = sub.add_parser('export')
+    ex.add_argument('--backends', nargs='+', default=['onnx'], choices=[b for b in BACKENDS if b != 'torch'])
+    ex.add_argument('--model', default=MODEL_PATH)
+    ex.add_argument('--calib-images', help="folder of representative frames for INT8 calibration")
+    ex.add_argument('--imgsz', type=int, default=EXPORT_IMGSZ)
+    sub.add_parser('list')
+    args = ap.parse_args(argv)
+    if args.cmd == 'list':
+        for b in BACKENDS:
+            path = backend_path(b)
+            print(f"{b:>14}  {'ok     ' if os.path.exists(path) else 'missing'}  {path}")
+        return 0
+    export(args.backends, args.model, args.calib_images, args.imgsz)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
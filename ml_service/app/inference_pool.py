@@ -0,0 +1,371 @@
+"""Out-of-process plate detection: a pool of worker processes fed through shared memory.
+
+Each worker process loads YOLO and the OCR engine once and serves every model
+call of the web process: detect_plate_from_image for uploaded images, and the
+YOLO boxes and tracked OCR reads of video scans and cameras (detection.py
+routes them here whenever a pool runs). Model pre/post-processing no longer
+holds the web process's GIL, the web process never loads a model, and a worker
+that crashes (or is OOM-killed) fails only its in-flight requests and is
+restarted. A worker that dies before it has loaded its models (missing
+weights, OOM while loading) would only die again, so those restarts back off
+exponentially; after INFERENCE_MAX_START_FAILURES in a row the worker is given
+up and the pool reports itself not ready.
+
+Frames never go through pickle. Every worker owns a ring of INFERENCE_SLOTS
+fixed-size slots in one multiprocessing.shared_memory block: the parent copies
+a frame into a free slot and sends only (task id, slot, shape); the worker runs
+detection on the slot and writes the annotated frame back in place. Results
+carry the small items (text, confidence, box, plate crop; the candidate boxes
+of a `boxes` task; the texts of a `read` task, whose boxes travel with it). A worker with every
+slot busy takes no more work; submit() blocks until any slot frees up. Each
+worker answers on a pipe of its own: a worker killed mid-write (a shared
+multiprocessing.Queue holds a cross-process lock then) can only break its own
+channel, which is replaced when it is restarted.
+
+    pool = InferencePool(workers=4).start()
+    text, conf, frame, crop, box = pool.submit(frame).result()
+    boxes = pool.submit_boxes(frame).result()                 # [(conf, (x1, y1, x2, y2))]
+    reads = pool.submit_read(frame, boxes).result()           # [(text, conf)] per box
+
+The pool is opt-in (INFERENCE_WORKERS, 0 = run in the web process). Workers
+are started through a forkserver (spawn where there is none), never forked from
+the web process: a crashed worker is respawned from the collector thread while
+Flask, Socket.IO, pymongo and camera threads are running, and a child forked
+then can inherit a lock one of them held and hang.
+"""
+import concurrent.futures
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import metrics
+
+_workers_env = os.getenv('INFERENCE_WORKERS', '0')
+# 'auto' = one worker per core
+INFERENCE_WORKERS = (os.cpu_count() or 1) if _workers_env == 'auto' else int(_workers_env)
+# Frames each worker can hold at once, and the size of one slot (a 1080p BGR frame is ~6 MB)
+INFERENCE_SLOTS = int(os.getenv('INFERENCE_SLOTS', 2))
+INFERENCE_SLOT_MB = float(os.getenv('INFERENCE_SLOT_MB', 8))
+INFERENCE_START_METHOD = os.getenv('INFERENCE_START_METHOD',
+                                   'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+# How often the collector checks for dead workers when no results arrive
+HEALTH_CHECK_SECONDS = 0.5
+# Longest a caller waits for a free slot and then for its result
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 60))
+# Deaths in a row before reporting ready after which a worker is not restarted again
+INFERENCE_MAX_START_FAILURES = int(os.getenv('INFERENCE_MAX_START_FAILURES', 5))
+# Cap of the doubling delay between those restarts
+RESPAWN_BACKOFF_MAX = 30.0
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: workers share the parent's resource tracker, so this re-registers a no-op
+        return shared_memory.SharedMemory(name=name)
+
+
+# --- Worker side ---
+def _worker_main(index, shm_name, slot_bytes, tasks, results, threads):
+    import cv2
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import detection
+    # Stage timings travel back with each result; this process's registry is never scraped
+    metrics.buffer_observations()
+    shm = _attach(shm_name)
+    try:
+        detection.get_yolo_model()
+        detection.get_ocr_engine()
+        results.send(('ready', index, os.getpid()))
+        while True:
+            msg = tasks.get()
+            if msg is None: break
+            task_id, slot, shape, op, arg = msg
+            t0 = time.perf_counter()
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            try:
+                if op == 'detect':
+                    text, conf, out, crop, box = detection.detect_plate_local(frame, arg)
+                    if out is not None and out.shape == frame.shape: frame[...] = out
+                    # The crop is a view of the worker's copy of the frame; pickling copies it
+                    payload = (text, conf, crop, box)
+                elif op == 'boxes':
+                    payload = [(c.conf, c.box) for c in detection.detect_candidates_local([frame])[0]]
+                else:
+                    payload = detection.read_boxes_local(frame, arg)
+                results.send(('done', index, task_id, payload, time.perf_counter() - t0, metrics.drain()))
+            except Exception as e:
+                results.send(('error', index, task_id, f"{type(e).__name__}: {e}", time.perf_counter() - t0,
+                             metrics.drain()))
+    finally:
+        shm.close()
+        results.close()
+
+
+# --- Parent side ---
+class _Worker:
+    def __init__(self, index, shm, slots):
+        self.index = index
+        self.shm = shm
+        self.free = list(range(slots))
+        self.inflight = {}  # task id -> (future, slot, shape, op)
+        self.proc = None
+        self.tasks = None
+        self.results = None  # read end of the worker's result pipe
+        self.ready = False
+        self.start_failures = 0  # deaths in a row before reporting ready
+        self.respawn_at = None   # when a dead worker is restarted
+        self.gave_up = False
+        self.started_at = time.time()
+        self.stats = {'tasks': 0, 'errors': 0, 'busy_seconds': 0.0, 'restarts': 0, 'crashed_tasks': 0}
+
+
+class InferencePool:
+    def __init__(self, workers=INFERENCE_WORKERS, slots=INFERENCE_SLOTS, slot_mb=INFERENCE_SLOT_MB,
+                 start_method=INFERENCE_START_METHOD):
+        self.size = max(1, workers)
+        self.slots = slots
+        self.slot_bytes = int(slot_mb * 1024 * 1024)
+        self._ctx = multiprocessing.get_context(start_method)
+        # Split the cores between workers so their torch thread pools do not oversubscribe
+        self._threads = max(1, (os.cpu_count() or 1) // self.size)
+        self._workers = []
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._collector = None
+        self._running = False
+        self.ready_at = None  # when every worker had loaded its models
+        self.failed = None    # why a worker was given up, if one was
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._cond:
+            if self._running: return self
+            for i in range(self.size):
+                shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+                w = _Worker(i, shm, self.slots)
+                self._spawn(w)
+                self._workers.append(w)
+            self._running = True
+        self._collector = threading.Thread(target=self._collect, name='inference-collector', daemon=True)
+        self._collector.start()
+        return self
+
+    def _spawn(self, w):
+        if w.results is not None: w.results.close()
+        w.tasks = self._ctx.Queue()
+        w.results, writer = self._ctx.Pipe(duplex=False)
+        w.ready = False
+        with self._cond:
+            w.free = list(range(self.slots))
+            self._cond.notify_all()
+        w.proc = self._ctx.Process(target=_worker_main, name=f"inference-{w.index}", daemon=True,
+                                   args=(w.index, w.shm.name, self.slot_bytes, w.tasks, writer, self._threads))
+        w.proc.start()
+        # Only the worker holds the write end, so its exit reads as EOF here
+        writer.close()
+
+    def close(self, timeout=5.0):
+        with self._cond:
+            if not self._running: return
+            self._running = False
+            self._cond.notify_all()
+        for w in self._workers: w.tasks.put(None)
+        for w in self._workers:
+            w.proc.join(timeout)
+            if w.proc.is_alive(): w.proc.terminate()
+            self._fail(w, 'Inference pool closed')
+            if w.results is not None: w.results.close()
+            w.shm.close()
+            w.shm.unlink()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def ready(self):
+        """Every worker has loaded its models (a later respawn does not clear this) and none was given up."""
+        return self._running and self.ready_at is not None and self.failed is None
+
+    # --- Submit / result ---
+    def submit(self, frame, draw_boxes=True, timeout=None):
+        """Queue one BGR frame; the Future resolves to detect_plate_from_image's tuple."""
+        return self._submit(frame, 'detect', draw_boxes, timeout)
+
+    def submit_boxes(self, frame, timeout=None):
+        """Queue YOLO on one frame; the Future resolves to its candidate plates as [(conf, box)]."""
+        return self._submit(frame, 'boxes', None, timeout)
+
+    def submit_read(self, frame, boxes, timeout=None):
+        """Queue OCR of the `boxes` [(conf, box)] of one frame; the Future resolves to [(text, conf)]."""
+        return self._submit(frame, 'read', [(float(conf), tuple(int(v) for v in box)) for conf, box in boxes], timeout)
+
+    def _submit(self, frame, op, arg, timeout):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"frame of {frame.nbytes} bytes exceeds INFERENCE_SLOT_MB")
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if not self._running: raise RuntimeError("Inference pool is not running")
+                if all(w.gave_up for w in self._workers): raise RuntimeError(f"No inference worker left: {self.failed}")
+                # Least-loaded worker with a free slot
+                ready = [w for w in self._workers if w.free]
+                if ready: break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0: raise TimeoutError("no free inference slot")
+                self._cond.wait(remaining)
+            w = min(ready, key=lambda w: len(w.inflight))
+            slot = w.free.pop()
+            task_id = next(self._ids)
+            future = concurrent.futures.Future()
+            w.inflight[task_id] = (future, slot, frame.shape, op)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=w.shm.buf, offset=slot * self.slot_bytes)[...] = frame
+        w.tasks.put((task_id, slot, frame.shape, op, arg))
+        return future
+
+    def detect(self, frame, draw_boxes=True, timeout=None):
+        return self.submit(frame, draw_boxes, timeout).result(timeout)
+
+    def _release(self, w, task_id):
+        with self._cond:
+            entry = w.inflight.pop(task_id, None)
+            if entry is None: return None, None
+            future, slot, shape, op = entry
+            # Only detect writes an annotated frame back
+            out = None
+            if op == 'detect':
+                out = np.array(np.ndarray(shape, dtype=np.uint8, buffer=w.shm.buf, offset=slot * self.slot_bytes))
+            w.free.append(slot)
+            self._cond.notify_all()
+        return future, out
+
+    def _collect(self):
+        while self._running:
+            # Dead workers' pipes are closed: at EOF they would read as ready on every wait
+            by_conn = {w.results: w for w in self._workers if w.results is not None}
+            if not by_conn: time.sleep(HEALTH_CHECK_SECONDS)
+            for conn in multiprocessing.connection.wait(list(by_conn), timeout=HEALTH_CHECK_SECONDS) if by_conn else ():
+                w = by_conn[conn]
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    # The worker exited (possibly mid-message); give it a moment to be reaped and restarted
+                    w.proc.join(HEALTH_CHECK_SECONDS)
+                    conn.close()
+                    w.results = None
+                    continue
+                self._handle(w, msg)
+            self._check_workers()
+
+    def _handle(self, w, msg):
+        kind = msg[0]
+        if kind == 'ready':
+            w.ready = True
+            if self.ready_at is None and all(x.ready for x in self._workers): self.ready_at = time.time()
+            return
+        task_id, payload, busy, observed = msg[2], msg[3], msg[4], msg[5]
+        w.stats['busy_seconds'] += busy
+        metrics.replay(observed)
+        future, frame = self._release(w, task_id)
+        if future is None: return
+        if kind == 'done':
+            w.stats['tasks'] += 1
+            if frame is None:
+                future.set_result(payload)
+            else:
+                text, conf, crop, box = payload
+                future.set_result((text, conf, frame, crop, box))
+        else:
+            w.stats['errors'] += 1
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        now = time.time()
+        for w in self._workers:
+            if not self._running or w.gave_up: continue
+            if w.respawn_at is None:
+                if w.proc.is_alive(): continue
+                code = w.proc.exitcode
+                w.stats['crashed_tasks'] += self._fail(w, f"Inference worker exited with code {code}")
+                w.start_failures = 0 if w.ready else w.start_failures + 1
+                if w.start_failures >= INFERENCE_MAX_START_FAILURES:
+                    w.gave_up = True
+                    self.failed = f"worker {w.index} died {w.start_failures} times while starting (exit code {code})"
+                    print(f"Inference {self.failed}; giving up on it")
+                    with self._cond: self._cond.notify_all()
+                    continue
+                # A worker that was serving restarts at once; one that never got ready backs off
+                delay = min(HEALTH_CHECK_SECONDS * 2 ** w.start_failures, RESPAWN_BACKOFF_MAX) if w.start_failures else 0
+                print(f"Inference worker {w.index} (pid {w.proc.pid}) exited with {code}; restarting in {delay:g}s")
+                w.respawn_at = now + delay
+            if now >= w.respawn_at:
+                w.respawn_at = None
+                w.stats['restarts'] += 1
+                self._spawn(w)
+
+    def _fail(self, w, reason):
+        with self._cond:
+            lost = list(w.inflight.values())
+            w.inflight.clear()
+            # No new work until the worker is restarted (its task queue is replaced then)
+            w.free = []
+            self._cond.notify_all()
+        for future, _, _, _ in lost:
+            if not future.done(): future.set_exception(WorkerCrashed(reason))
+        return len(lost)
+
+    # --- Stats ---
+    def reset_stats(self):
+        for w in self._workers:
+            w.started_at = time.time()
+            w.stats.update(tasks=0, errors=0, busy_seconds=0.0)
+
+    def snapshot(self):
+        now = time.time()
+        workers = []
+        for w in self._workers:
+            up = max(now - w.started_at, 1e-9)
+            workers.append(dict(w.stats, index=w.index, pid=w.proc.pid if w.proc else None,
+                                alive=bool(w.proc and w.proc.is_alive()), ready=w.ready, gave_up=w.gave_up,
+                                inflight=len(w.inflight),
+                                utilization=round(w.stats['busy_seconds'] / up, 3)))
+        return {'running': self._running, 'failed': self.failed, 'workers': workers, 'slots_per_worker': self.slots,
+                'slot_mb': round(self.slot_bytes / 1024 / 1024, 1), 'torch_threads': self._threads}
+
+
+_pool = None
+
+
+def start_pool(workers=INFERENCE_WORKERS):
+    """Start the shared pool (no-op when INFERENCE_WORKERS is 0)."""
+    global _pool
+    if workers > 0 and _pool is None:
+        _pool = InferencePool(workers).start()
+    return _pool
+
+
+def pool_ready():
+    """For /api/health: True with no pool configured, else once every worker has loaded its models."""
+    return INFERENCE_WORKERS <= 0 or (_pool is not None and _pool.ready)
+
+
+def get_pool():
+    """The running pool, or None to run inference in this process."""
+    return _pool if _pool is not None and _pool.running else None
@@ -0,0 +1,75 @@
+"""Keyset pagination and NDJSON streaming for challan and capture listings.
+
+Pages are ordered newest first on (timestamp field, _id). The cursor encodes
+the last row of a page, so fetching the next page is an index range scan
+instead of a skip over everything already returned. NDJSON exports write one
+row per line straight from the Mongo cursor, so memory stays bounded however
+many rows match.
+"""
+import base64
+import datetime
+import json
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 50))
+LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 500))
+NDJSON_BATCH_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def encode_cursor(doc, field):
+    raw = f"{doc[field].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, ObjectId); raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ts, oid = raw.split('|')
+        return datetime.datetime.fromisoformat(ts), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def page_args(args, default_limit=LIST_PAGE_SIZE):
+    """(cursor, limit) from request args; raises ValueError on bad input."""
+    cursor = args.get('cursor') or None
+    if cursor: decode_cursor(cursor)
+    limit = args.get('limit', default_limit, type=int)
+    if limit is None or limit < 1: raise ValueError("limit must be a positive integer")
+    return cursor, min(limit, LIST_MAX_PAGE_SIZE)
+
+
+def wants_ndjson(request):
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def _after(filter, field, cursor):
+    if not cursor: return filter
+    ts, oid = decode_cursor(cursor)
+    after = {"$or": [{field: {"$lt": ts}}, {field: ts, "_id": {"$lt": oid}}]}
+    return {"$and": [filter, after]} if filter else after
+
+
+def find_sorted(col, filter, field, projection=None, cursor=None):
+    return col.find(_after(filter, field, cursor), projection).sort([(field, -1), ("_id", -1)])
+
+
+def page(col, filter, field, projection=None, cursor=None, limit=LIST_PAGE_SIZE):
+    """Returns (docs, next_cursor); next_cursor is None on the last page."""
+    docs = list(find_sorted(col, filter, field, projection, cursor).limit(limit + 1))
+    if len(docs) <= limit: return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], field)
+
+
+def ndjson(col, filter, field, fmt, projection=None, cursor=None, limit=0):
+    """Generator of NDJSON lines for every matching row (or the first `limit`)."""
+    cur = find_sorted(col, filter, field, projection, cursor).batch_size(NDJSON_BATCH_SIZE)
+    if limit: cur = cur.limit(limit)
+    for doc in cur:
+        yield json.dumps(fmt(doc), default=str) + '\n'
@@ -0,0 +1,284 @@
+"""Staged capture / detect / post-process pipeline behind the live /video_feed.
+
+- capture: one thread reads the camera and keeps only the newest frame. A
+  source that fails to open or stops delivering frames is reopened with
+  exponential backoff; video files loop at their own frame rate.
+- detect: one thread takes the newest frame every `detect_interval` seconds,
+  runs YOLO plus tracked OCR, and queues one decision per confirmed track.
+  Pipelines run by cameras.CameraManager skip this thread and are fed by the
+  manager's shared detector instead (`take_frame` / `analyze`).
+- post: one thread drains that queue and does the slow I/O (evidence image,
+  Mongo inserts, challan, email) through the `on_plate` callback.
+
+MJPEG clients only ever read the newest captured frame, so inference and I/O
+never hold up the stream. Every stage keeps counters for its queue depth and
+the frames or decisions it dropped.
+"""
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+import metrics
+from detection import detect_candidates_batch, track_and_read, track_evidence
+from tracker import PlateTracker
+
+POST_QUEUE_MAX = 64
+# How long a stream client waits for a new frame before re-checking the pipeline
+FRAME_WAIT_SECONDS = 1.0
+JPEG_QUALITY = 80
+# Backoff between attempts to reopen a camera that failed or dropped
+CAMERA_RECONNECT_MIN = float(os.getenv('CAMERA_RECONNECT_MIN', 1.0))
+CAMERA_RECONNECT_MAX = float(os.getenv('CAMERA_RECONNECT_MAX', 30.0))
+# Frame rate assumed for video files that do not report one
+DEFAULT_FILE_FPS = 25.0
+
+
+class LatestFrame:
+    """Single-slot buffer: writers overwrite, readers wait for a newer sequence number."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.frame, self.seq = None, 0
+        self.closed = False
+
+    def put(self, frame):
+        with self._cond:
+            self.frame, self.seq = frame, self.seq + 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond: return self.frame, self.seq
+
+    def wait_newer(self, seq, timeout):
+        """Return (frame, seq) once a frame newer than `seq` exists, or (None, seq) on timeout/close."""
+        with self._cond:
+            if self.seq <= seq and not self.closed: self._cond.wait(timeout)
+            if self.seq <= seq: return None, seq
+            return self.frame, self.seq
+
+
+def is_file_source(source):
+    return isinstance(source, str) and '://' not in source and os.path.isfile(source)
+
+
+class LivePipeline:
+    def __init__(self, source, on_plate, detect_interval=1.5, track_max_age=3, claim=None, name='live',
+                 shared_detect=False, loop=True):
+        # on_plate(text, conf, track_id, evidence_frame); claim(text) -> False to skip a repeat plate
+        self.source = source
+        self.on_plate = on_plate
+        self.claim = claim
+        self.detect_interval = detect_interval
+        self.name = name
+        # Detection driven from outside (CameraManager) instead of by this pipeline's own thread
+        self.shared_detect = shared_detect
+        # Video files start over at their end instead of ending the stream
+        self.loop = loop
+        self.tracker = PlateTracker(max_age=track_max_age)
+        self.frames = LatestFrame()
+        self.post_queue = queue.Queue(maxsize=POST_QUEUE_MAX)
+        self.stats = {'frames_captured': 0, 'frames_detected': 0, 'frames_skipped': 0,
+                      'decisions': 0, 'post_dropped': 0, 'post_done': 0, 'post_errors': 0,
+                      'detect_seconds': 0.0, 'jpeg_encodes': 0, 'reconnects': 0, 'loops': 0}
+        self.state = 'stopped'  # stopped, connecting, streaming, reconnecting
+        self.last_error = None
+        self._seq = self._tick = 0  # last frame analyzed, detection cycles
+        self._running = False
+        self._gen = 0  # bumped on every start so threads of a stopped run exit
+        self._threads = []
+        self._clients = 0
+        self._lock = threading.Lock()
+        self._jpeg = (0, None)  # (seq, bytes) shared by all stream clients
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._running: return
+            self._running = True
+            self._gen += 1
+            self.frames = LatestFrame()
+            self._jpeg = (0, None)
+            self._seq = self._tick = 0
+            self.tracker = PlateTracker(max_age=self.tracker.max_age)
+            stages = [('capture', self._capture), ('post', self._post)]
+            if not self.shared_detect: stages.append(('detect', self._detect))
+            self._threads = [threading.Thread(target=fn, args=(self._gen,), name=f"{self.name}-{stage}", daemon=True)
+                             for stage, fn in stages]
+            for t in self._threads: t.start()
+
+    def stop(self, gen=None):
+        with self._lock:
+            if gen is not None and gen != self._gen: return
+            self._running = False
+            self.state = 'stopped'
+            self.frames.close()
+
+    def _alive(self, gen):
+        return self._running and gen == self._gen
+
+    @property
+    def running(self):
+        return self._running
+
+    # --- Stages ---
+    def _open(self):
+        return cv2.VideoCapture(self.source)
+
+    def _sleep(self, gen, seconds):
+        """Sleep up to `seconds`, returning early (False) once this run is stopped."""
+        end = time.time() + seconds
+        while self._alive(gen) and time.time() < end:
+            time.sleep(min(0.2, end - time.time()))
+        return self._alive(gen)
+
+    def _capture(self, gen):
+        is_file = is_file_source(self.source)
+        delay = CAMERA_RECONNECT_MIN
+        self.state = 'connecting'
+        try:
+            while self._alive(gen):
+                camera = self._open()
+                if not camera.isOpened():
+                    camera.release()
+                    self.last_error = f"cannot open source {self.name}"
+                    self.state = 'reconnecting'
+                    if not self._sleep(gen, delay): break
+                    delay = min(delay * 2, CAMERA_RECONNECT_MAX)
+                    self.stats['reconnects'] += 1
+                    continue
+                self.state = 'streaming'
+                # Files are read at their own frame rate, as a camera would deliver them
+                interval = 1.0 / (camera.get(cv2.CAP_PROP_FPS) or DEFAULT_FILE_FPS) if is_file else 0.0
+                next_at = time.time()
+                got_frame = False
+                try:
+                    while self._alive(gen):
+                        success, frame = camera.read()
+                        if not success: break
+                        got_frame = True
+                        self.frames.put(frame)
+                        self.stats['frames_captured'] += 1
+                        if interval:
+                            next_at += interval
+                            time.sleep(max(0.0, next_at - time.time()))
+                finally:
+                    camera.release()
+                if not self._alive(gen): break
+                if is_file and got_frame:
+                    if not self.loop: break
+                    self.stats['loops'] += 1
+                    continue
+                # A dropped stream (RTSP timeout, unplugged device): reopen after a backoff
+                self.last_error = f"source {self.name} stopped delivering frames"
+                self.state = 'reconnecting'
+                if got_frame: delay = CAMERA_RECONNECT_MIN
+                if not self._sleep(gen, delay): break
+                delay = min(delay * 2, CAMERA_RECONNECT_MAX)
+                self.stats['reconnects'] += 1
+        finally:
+            self.stop(gen)
+
+    def take_frame(self):
+        """Newest frame not yet analyzed, or None; counts the frames skipped in between."""
+        frame, seq = self.frames.latest()
+        if frame is None or seq <= self._seq: return None
+        # Frames captured since the last detection were never analyzed
+        self.stats['frames_skipped'] += max(0, seq - self._seq - 1)
+        self._seq = seq
+        return frame
+
+    def analyze(self, frame, cands, seconds=0.0):
+        """Track and OCR one frame's plate candidates, then queue decisions for finished tracks."""
+        self._tick += 1
+        t0 = time.perf_counter()
+        ended = track_and_read(self.tracker, [self._tick], [frame], [cands])
+        self.stats['detect_seconds'] += seconds + time.perf_counter() - t0
+        self.stats['frames_detected'] += 1
+        self._decide(ended)
+
+    def _detect(self, gen):
+        while self._alive(gen):
+            started = time.time()
+            frame, _ = self.frames.wait_newer(self._seq, FRAME_WAIT_SECONDS)
+            if frame is None: continue
+            frame = self.take_frame()
+            if frame is None: continue
+            t0 = time.perf_counter()
+            cands = detect_candidates_batch([frame], 1)[0]
+            self.analyze(frame, cands, time.perf_counter() - t0)
+            time.sleep(max(0.0, self.detect_interval - (time.time() - started)))
+
+    def _decide(self, ended):
+        # One decision per track: once its text is confirmed, or when it leaves the view
+        for t in list(self.tracker.tracks.values()) + ended:
+            if t.decided or not t.text: continue
+            if not (t.confirmed(self.tracker.quorum) or t in ended): continue
+            t.decided = True
+            if self.claim and not self.claim(t.text): continue
+            self.stats['decisions'] += 1
+            proc, _, _ = track_evidence(t)
+            try:
+                self.post_queue.put_nowait((t.text, t.conf, t.id, proc))
+            except queue.Full:
+                self.stats['post_dropped'] += 1
+
+    def _post(self, gen):
+        while self._alive(gen) or not self.post_queue.empty():
+            try:
+                item = self.post_queue.get(timeout=FRAME_WAIT_SECONDS)
+            except queue.Empty:
+                continue
+            try:
+                self.on_plate(*item)
+                self.stats['post_done'] += 1
+            except Exception as e:
+                self.stats['post_errors'] += 1
+                print(f"Live post-processing failed: {e}")
+
+    # --- Streaming ---
+    def _encode(self, frame, seq):
+        cached_seq, data = self._jpeg
+        if cached_seq == seq: return data
+        with metrics.timer('mjpeg_encode'):
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        data = buffer.tobytes()
+        self._jpeg = (seq, data)
+        self.stats['jpeg_encodes'] += 1
+        return data
+
+    def mjpeg(self, manage=True):
+        """Generator of multipart JPEG chunks; never waits on detection.
+
+        With `manage` the first viewer starts the pipeline and the last one stops
+        it; otherwise the viewer only subscribes to a pipeline run elsewhere.
+        """
+        with self._lock: self._clients += 1
+        if manage: self.start()
+        seq = 0
+        try:
+            while self._running:
+                frame, new_seq = self.frames.wait_newer(seq, FRAME_WAIT_SECONDS)
+                if frame is None: continue
+                seq = new_seq
+                yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + self._encode(frame, seq) + b'\r\n'
+        finally:
+            with self._lock:
+                self._clients -= 1
+                idle = self._clients == 0
+            # Release the camera when the last viewer leaves, as the per-request capture did
+            if idle and manage: self.stop()
+
+    def snapshot(self):
+        s = dict(self.stats)
+        s.update(running=self._running, state=self.state, last_error=self.last_error, clients=self._clients,
+                 post_queue_depth=self.post_queue.qsize(), latest_seq=self.frames.seq,
+                 active_tracks=len(self.tracker.tracks))
+        return s
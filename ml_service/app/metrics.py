@@ -0,0 +1,229 @@
+"""Hot-path latency histograms and counters, served in Prometheus format on /metrics.
+
+Every instrumented stage feeds one histogram, `echallan_stage_seconds{stage=...}`,
+and failures feed `echallan_stage_errors_total{stage=...}`:
+
+    yolo          YOLO inference, per frame (a batch's time is split over its frames)
+    ocr           OCR per crop (likewise split over the crops of a batch)
+    lookup        registry verdict for one plate
+    pdf_render    one challan PDF rendered
+    smtp_send     one e-challan email handed to the SMTP server
+    mjpeg_encode  one live frame JPEG-encoded for the stream
+    registry_reload  one registry rebuild (snapshot or delta files) by registry_manager
+
+Mongo commands are timed by a pymongo command listener into
+`echallan_mongo_command_seconds{command, collection}`, so every insert and
+aggregation is covered without touching the call sites. Queue depths and
+per-camera frame drops are read from the components' own stats at scrape time
+(ServiceCollector).
+
+With METRICS_ENABLED=False, or without prometheus_client installed, timer()
+hands out one shared no-op context manager, instrument() returns the function
+unchanged and no Mongo listener is registered. Inference pool workers buffer
+their observations and ship them back with each result (drain / replay).
+"""
+import contextlib
+import functools
+import os
+import threading
+import time
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    REGISTRY = None
+try:
+    from pymongo import monitoring
+except ImportError:
+    monitoring = None
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True' and REGISTRY is not None
+# Lookups take microseconds and scans seconds, so the buckets span both
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL = contextlib.nullcontext()
+_buffer = None  # set in inference pool workers: observations wait here to be drained
+
+if METRICS_ENABLED:
+    STAGE_SECONDS = Histogram('echallan_stage_seconds', 'Latency of hot-path stages', ['stage'], buckets=BUCKETS)
+    STAGE_ERRORS = Counter('echallan_stage_errors_total', 'Hot-path stage calls that raised', ['stage'])
+    MONGO_SECONDS = Histogram('echallan_mongo_command_seconds', 'MongoDB command latency',
+                              ['command', 'collection'], buckets=BUCKETS)
+    MONGO_ERRORS = Counter('echallan_mongo_command_errors_total', 'MongoDB commands that failed',
+                           ['command', 'collection'])
+
+_children = {}
+
+
+def _child(metric, *labels):
+    # labels() takes a lock and hashes every call; the children never change once made
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None: child = _children[key] = metric.labels(*labels)
+    return child
+
+
+def observe(stage, seconds, n=1):
+    """Record `n` calls of `stage` that took `seconds` in total (seconds / n each)."""
+    if not METRICS_ENABLED: return
+    if _buffer is not None:
+        _buffer.append((stage, seconds, n))
+        return
+    h = _child(STAGE_SECONDS, stage)
+    for _ in range(n): h.observe(seconds / n)
+
+
+def error(stage):
+    if METRICS_ENABLED and _buffer is None: _child(STAGE_ERRORS, stage).inc()
+
+
+class _Timer:
+    __slots__ = ('stage', 'n', 't0')
+
+    def __init__(self, stage, n):
+        self.stage, self.n = stage, n
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: observe(self.stage, time.perf_counter() - self.t0, self.n)
+        else: error(self.stage)
+
+
+def timer(stage, n=1):
+    """`with timer('yolo', len(frames)):` times the block as n calls of stage."""
+    return _Timer(stage, n) if METRICS_ENABLED else _NULL
+
+
+def instrument(stage):
+    """Decorator form of timer(); the function is returned as is when metrics are off."""
+    def wrap(fn):
+        if not METRICS_ENABLED: return fn
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with _Timer(stage, 1): return fn(*args, **kwargs)
+        return timed
+    return wrap
+
+
+# --- Inference pool workers ---
+def buffer_observations():
+    """In a worker process: keep observations for drain() instead of recording them."""
+    global _buffer
+    _buffer = []
+
+
+def drain():
+    global _buffer
+    if _buffer is None: return []
+    out, _buffer = _buffer, []
+    return out
+
+
+def replay(observations):
+    """Record observations drained in a worker process."""
+    for stage, seconds, n in observations: observe(stage, seconds, n)
+
+
+# --- Mongo ---
+if METRICS_ENABLED and monitoring is not None:
+    class MongoCommandMetrics(monitoring.CommandListener):
+        def __init__(self):
+            self._collections = {}  # (connection, request id) -> collection, between started and finished
+            self._lock = threading.Lock()
+
+        def started(self, event):
+            coll = event.command.get(event.command_name)
+            with self._lock:
+                self._collections[(event.connection_id, event.request_id)] = coll if isinstance(coll, str) else ''
+
+        def _finish(self, event):
+            with self._lock: return self._collections.pop((event.connection_id, event.request_id), '')
+
+        def succeeded(self, event):
+            coll = self._finish(event)
+            _child(MONGO_SECONDS, event.command_name, coll).observe(event.duration_micros / 1e6)
+
+        def failed(self, event):
+            coll = self._finish(event)
+            _child(MONGO_SECONDS, event.command_name, coll).observe(event.duration_micros / 1e6)
+            _child(MONGO_ERRORS, event.command_name, coll).inc()
+
+
+def mongo_listeners():
+    """event_listeners for MongoClient: a command timer, or none when metrics are off."""
+    return [MongoCommandMetrics()] if METRICS_ENABLED and monitoring is not None else []
+
+
+# --- Scrape-time gauges ---
+class ServiceCollector:
+    """Queue depths and per-camera counters, read from each component at scrape time."""
+
+    def __init__(self, cameras=None, pool=None, scan_jobs=None, outbox=None, pdfs=None):
+        # pool is a callable returning the running InferencePool or None
+        self.cameras, self.pool, self.scan_jobs, self.outbox, self.pdfs = cameras, pool, scan_jobs, outbox, pdfs
+
+    def describe(self):
+        # Nothing to check up front; without this, registering would scrape once at import
+        return []
+
+    def collect(self):
+        if self.cameras is not None: yield from self._cameras(self.cameras.snapshot())
+        pool = self.pool() if self.pool else None
+        if pool is not None: yield from self._pool(pool.snapshot())
+        if self.scan_jobs is not None:
+            yield GaugeMetricFamily('echallan_scan_job_queue_depth', 'Video scan jobs waiting for a worker',
+                                    value=self.scan_jobs.queue_depth)
+        if self.outbox is not None:
+            try:
+                pending = self.outbox.pending_count()
+            except Exception as e:  # Mongo down: scrape the rest
+                print(f"Metrics: outbox depth unavailable: {e}")
+            else:
+                yield GaugeMetricFamily('echallan_email_outbox_pending', 'E-challan emails waiting to be sent',
+                                        value=pending)
+        if self.pdfs is not None:
+            for key in ('hits', 'renders'):
+                yield CounterMetricFamily(f"echallan_pdf_cache_{key}", f"Challan PDF cache {key}",
+                                          value=self.pdfs.stats[key])
+
+    def _cameras(self, snap):
+        families = {
+            'frames_captured': CounterMetricFamily('echallan_camera_frames_captured', 'Frames read from the camera', labels=['camera']),
+            'frames_detected': CounterMetricFamily('echallan_camera_frames_detected', 'Frames run through detection', labels=['camera']),
+            'frames_skipped': CounterMetricFamily('echallan_camera_frames_dropped', 'Frames captured but never analyzed', labels=['camera']),
+            'post_dropped': CounterMetricFamily('echallan_camera_decisions_dropped', 'Plate decisions dropped on a full post queue', labels=['camera']),
+            'reconnects': CounterMetricFamily('echallan_camera_reconnects', 'Camera reopen attempts', labels=['camera']),
+            'post_queue_depth': GaugeMetricFamily('echallan_camera_post_queue_depth', 'Plate decisions waiting for post-processing', labels=['camera']),
+            'clients': GaugeMetricFamily('echallan_camera_stream_clients', 'MJPEG viewers', labels=['camera']),
+        }
+        up = GaugeMetricFamily('echallan_camera_up', 'Camera is streaming (1) or not (0)', labels=['camera'])
+        for sid, s in snap['sources'].items():
+            for key, fam in families.items(): fam.add_metric([sid], s[key])
+            up.add_metric([sid], 1 if s['state'] == 'streaming' else 0)
+        yield from families.values()
+        yield up
+
+    def _pool(self, snap):
+        inflight = GaugeMetricFamily('echallan_inference_inflight', 'Frames queued or running on a worker', labels=['worker'])
+        alive = GaugeMetricFamily('echallan_inference_worker_up', 'Worker process alive (1) or not (0)', labels=['worker'])
+        restarts = CounterMetricFamily('echallan_inference_worker_restarts', 'Worker restarts after a crash', labels=['worker'])
+        for w in snap['workers']:
+            inflight.add_metric([str(w['index'])], w['inflight'])
+            alive.add_metric([str(w['index'])], 1 if w['alive'] else 0)
+            restarts.add_metric([str(w['index'])], w['restarts'])
+        yield from (inflight, alive, restarts)
+
+
+def register(collector):
+    if METRICS_ENABLED: REGISTRY.register(collector)
+
+
+def exposition():
+    """(body, content type) for /metrics."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,140 @@
+"""Batched, gated EasyOCR stage for YOLO plate crops.
+
+detect_plate_from_image keeps the highest-confidence box whose OCR yields at
+least 4 characters. The stage reproduces that rule without reading every box:
+each frame's candidates are tried in descending confidence, one per round, and a
+frame drops out as soon as a candidate reads, since nothing left in it can beat
+that confidence. The top remaining candidate of every unresolved frame goes into
+the same round, so crops from many frames share EasyOCR batches. Crops smaller
+than the minimum size are never sent.
+
+The recognizer itself is an engine object: `prepare(crop)` turns a BGR crop into
+the engine's input and `read_batch(images)` returns one cleaned string per
+image. EasyOcrEngine wraps EasyOCR; plate_ocr.PlateRecognizer is the lightweight
+plate-specific alternative (OCR_ENGINE in detection.py picks one).
+"""
+import os
+import threading
+import time
+
+import cv2
+
+import metrics
+
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', 16))
+OCR_INPUT_SIZE = (int(os.getenv('OCR_INPUT_WIDTH', 256)), int(os.getenv('OCR_INPUT_HEIGHT', 64)))
+OCR_MIN_CROP_SIZE = (int(os.getenv('OCR_MIN_CROP_WIDTH', 24)), int(os.getenv('OCR_MIN_CROP_HEIGHT', 8)))
+OCR_LOG_TIMINGS = os.getenv('OCR_LOG_TIMINGS', 'False') == 'True'
+# Repair EasyOCR output against the Indian plate grammar (O/0, I/1, B/8, ... in the wrong position)
+OCR_GRAMMAR_CORRECTION = os.getenv('OCR_GRAMMAR_CORRECTION', 'False') == 'True'
+
+
+def clean_plate_text(ocr):
+    return ''.join(c for c in "".join(ocr).upper() if c.isalnum())
+
+
+class PlateCandidate:
+    """One YOLO box above the confidence threshold, with its crop (a view of the frame)."""
+    __slots__ = ('conf', 'box', 'crop')
+
+    def __init__(self, conf, box, crop):
+        self.conf, self.box, self.crop = conf, box, crop
+
+
+class EasyOcrEngine:
+    """EasyOCR's general English model, batched through readtext_batched."""
+    name = 'easyocr'
+
+    def __init__(self, reader, input_size=OCR_INPUT_SIZE, grammar=OCR_GRAMMAR_CORRECTION):
+        self.reader = reader
+        self.input_size = input_size
+        self.grammar = grammar
+
+    def prepare(self, crop):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return cv2.resize(gray, self.input_size, interpolation=cv2.INTER_LINEAR)
+
+    def read_batch(self, images):
+        w, h = self.input_size
+        res = self.reader.readtext_batched(images, n_width=w, n_height=h, batch_size=len(images), detail=0)
+        texts = [clean_plate_text(r) for r in res]
+        if self.grammar:
+            from plate_ocr import correct_plate_text
+            texts = [correct_plate_text(t) for t in texts]
+        return texts
+
+
+class OcrStage:
+    def __init__(self, engine_factory, batch_size=OCR_BATCH_SIZE, min_size=OCR_MIN_CROP_SIZE):
+        self.engine_factory = engine_factory
+        self.batch_size = batch_size
+        self.min_w, self.min_h = min_size
+        self.last_timings = None
+        self.totals = {'calls': 0, 'crops_in': 0, 'crops_read': 0, 'skipped_small': 0, 'skipped_gated': 0, 'ocr_s': 0.0, 'total_s': 0.0}
+        self._lock = threading.Lock()
+        # One engine serves every thread and is not thread-safe (EasyOCR runs torch models)
+        self._engine_lock = threading.Lock()
+
+    def read(self, frames_candidates):
+        """frames_candidates: one list of PlateCandidate per frame.
+
+        Returns one (text, conf, crop, box) per frame; (None, 0.0, None, None) when
+        no candidate reads as a plate.
+        """
+        t_start = time.perf_counter()
+        timings = {'frames': len(frames_candidates), 'crops_in': 0, 'crops_read': 0, 'skipped_small': 0,
+                   'skipped_gated': 0, 'batches': 0, 'ocr_s': 0.0}
+        queues = []
+        for cands in frames_candidates:
+            timings['crops_in'] += len(cands)
+            keep = [c for c in cands if c.crop.shape[1] >= self.min_w and c.crop.shape[0] >= self.min_h]
+            timings['skipped_small'] += len(cands) - len(keep)
+            # Stable sort: equal confidences keep box order, as the strict `>` did
+            keep.sort(key=lambda c: c.conf, reverse=True)
+            queues.append(keep)
+
+        out = [(None, 0.0, None, None)] * len(frames_candidates)
+        pos = [0] * len(queues)
+        pending = [i for i, q in enumerate(queues) if q]
+        while pending:
+            batch = [queues[i][pos[i]] for i in pending]
+            texts = self._ocr([c.crop for c in batch], timings)
+            still = []
+            for i, cand, text in zip(pending, batch, texts):
+                pos[i] += 1
+                if len(text) >= 4:
+                    out[i] = (text, cand.conf, cand.crop, cand.box)
+                    timings['skipped_gated'] += len(queues[i]) - pos[i]
+                elif pos[i] < len(queues[i]):
+                    still.append(i)
+            pending = still
+
+        timings['total_s'] = time.perf_counter() - t_start
+        self._record(timings)
+        return out
+
+    def _ocr(self, crops, timings):
+        engine = self.engine_factory()
+        images = [engine.prepare(c) for c in crops]
+        texts = []
+        with self._engine_lock:
+            t0 = time.perf_counter()
+            for start in range(0, len(images), self.batch_size):
+                texts.extend(engine.read_batch(images[start:start + self.batch_size]))
+                timings['batches'] += 1
+            elapsed = time.perf_counter() - t0
+        metrics.observe('ocr', elapsed, len(crops))
+        timings['crops_read'] += len(crops)
+        timings['ocr_s'] += elapsed
+        return texts
+
+    def _record(self, timings):
+        with self._lock:
+            self.last_timings = timings
+            t = self.totals
+            t['calls'] += 1
+            for k in ('crops_in', 'crops_read', 'skipped_small', 'skipped_gated', 'ocr_s', 'total_s'):
+                t[k] += timings[k]
+        if OCR_LOG_TIMINGS:
+            print(f"OCR stage: {timings['frames']} frames, {timings['crops_read']}/{timings['crops_in']} crops read "
+                  f"in {timings['batches']} batches, {timings['ocr_s']*1000:.1f} ms OCR / {timings['total_s']*1000:.1f} ms total")
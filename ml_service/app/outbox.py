@@ -0,0 +1,199 @@
+"""MongoDB-backed outbox for e-challan emails.
+
+Request handlers and the camera loop only insert an outbox document. Dispatcher
+threads claim due messages in batches, build each one (PDF rendering included)
+off the request path, and send the batch over one SMTP connection that the
+worker keeps open between batches. Failed sends are retried with exponential
+backoff; the outcome is mirrored on the challan as `email_status`. A message
+left in `sending` by a worker that died mid-send is put back to pending once
+its claim is STALE_CLAIM_SECONDS old; workers look for such claims at startup
+and every STALE_CHECK_SECONDS while running, so a crash is recovered without a
+restart. A worker that cannot reach Mongo logs the error and backs off instead
+of exiting.
+
+Point MAIL_SERVER/MAIL_PORT at a local stand-in (for example
+`python -m aiosmtpd -n -l localhost:1025` with MAIL_USE_SSL=False) to test it.
+"""
+import datetime
+import os
+import random
+import smtplib
+import threading
+import time
+import traceback
+
+import metrics
+
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', 2))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 20))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+# Idle time after which a worker closes its SMTP connection
+SMTP_IDLE_CLOSE_SECONDS = 60
+POLL_SECONDS = 5
+# A message stuck in `sending` this long (worker died mid-send) is retried
+STALE_CLAIM_SECONDS = 600
+STALE_CHECK_SECONDS = 60
+# Longest pause of a worker after a failure outside a send (Mongo unreachable)
+ERROR_BACKOFF_MAX = 60.0
+
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+
+
+class SmtpSettings:
+    def __init__(self, server, port, use_ssl=False, use_tls=False, username=None, password=None, timeout=30):
+        self.server, self.port = server, port
+        self.use_ssl, self.use_tls = use_ssl, use_tls
+        self.username, self.password = username, password
+        self.timeout = timeout
+
+    @classmethod
+    def from_flask_config(cls, config):
+        return cls(config['MAIL_SERVER'], config['MAIL_PORT'], config.get('MAIL_USE_SSL', False),
+                   config.get('MAIL_USE_TLS', False), config.get('MAIL_USERNAME'), config.get('MAIL_PASSWORD'))
+
+    def connect(self):
+        if self.use_ssl: conn = smtplib.SMTP_SSL(self.server, self.port, timeout=self.timeout)
+        else: conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.use_tls and not self.use_ssl: conn.starttls()
+        if self.username and self.password: conn.login(self.username, self.password)
+        return conn
+
+
+class Outbox:
+    def __init__(self, collection, challans_col, build_message, smtp, workers=EMAIL_WORKERS,
+                 batch_size=EMAIL_BATCH_SIZE, max_attempts=EMAIL_MAX_ATTEMPTS, retry_base=EMAIL_RETRY_BASE_SECONDS,
+                 stale_after=STALE_CLAIM_SECONDS, poll_seconds=POLL_SECONDS):
+        # build_message(outbox_doc) -> email.message.EmailMessage
+        self.col = collection
+        self.challans_col = challans_col
+        self.build_message = build_message
+        self.smtp = smtp
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.stale_after = stale_after
+        self.poll_seconds = poll_seconds
+        self._recovered_at = float('-inf')
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads: return
+            self.recover_stale()
+            for n in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"outbox-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self):
+        """Let the workers exit after their current batch."""
+        self._stop.set()
+        self._wake.set()
+
+    def enqueue(self, recipient, challan_id, **payload):
+        """Queue an e-challan email; returns the outbox message id."""
+        self.start()
+        now = datetime.datetime.now()
+        res = self.col.insert_one({
+            "recipient": recipient, "challan_id": challan_id, "payload": payload,
+            "status": PENDING, "attempts": 0, "next_attempt_at": now, "created_at": now
+        })
+        self._set_challan_status(challan_id, "Queued", email_recipient=recipient)
+        self._wake.set()
+        return str(res.inserted_id)
+
+    def pending_count(self):
+        return self.col.count_documents({"status": {"$in": [PENDING, SENDING]}})
+
+    def _set_challan_status(self, challan_id, status, **extra):
+        if challan_id:
+            self.challans_col.update_one({"challan_id": challan_id}, {"$set": dict(extra, email_status=status)})
+
+    def recover_stale(self):
+        """Put messages claimed more than stale_after seconds ago back to pending; returns how many."""
+        self._recovered_at = time.monotonic()
+        stale = datetime.datetime.now() - datetime.timedelta(seconds=self.stale_after)
+        res = self.col.update_many({"status": SENDING, "claimed_at": {"$lt": stale}}, {"$set": {"status": PENDING}})
+        return res.modified_count
+
+    def _claim_batch(self, worker):
+        batch = []
+        now = datetime.datetime.now()
+        while len(batch) < self.batch_size:
+            doc = self.col.find_one_and_update(
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"$set": {"status": SENDING, "claimed_by": worker, "claimed_at": now}},
+                sort=[("next_attempt_at", 1)])
+            if not doc: break
+            batch.append(doc)
+        return batch
+
+    def _work(self):
+        name = threading.current_thread().name
+        conn, last_used = None, 0.0
+        backoff = 0.0
+        while not self._stop.is_set():
+            try:
+                conn, last_used = self._step(name, conn, last_used)
+                backoff = 0.0
+            except Exception:
+                # Mongo unreachable while claiming or recording; a message claimed by
+                # this pass stays `sending` and is recovered once its claim is stale
+                traceback.print_exc()
+                backoff = min(max(self.poll_seconds, backoff * 2), ERROR_BACKOFF_MAX)
+                self._stop.wait(backoff)
+        self._close(conn)
+
+    def _step(self, name, conn, last_used):
+        """Claim and send one batch, or wait for work; returns the (connection, last use) to carry on with."""
+        if time.monotonic() - self._recovered_at > min(STALE_CHECK_SECONDS, self.stale_after):
+            self.recover_stale()
+        batch = self._claim_batch(name)
+        if not batch:
+            if conn and datetime.datetime.now().timestamp() - last_used > SMTP_IDLE_CLOSE_SECONDS:
+                conn = self._close(conn)
+            self._wake.wait(self.poll_seconds)
+            if not self._stop.is_set(): self._wake.clear()
+            return conn, last_used
+        for doc in batch:
+            try:
+                msg = self.build_message(doc)
+                if conn is None: conn = self.smtp.connect()
+                with metrics.timer('smtp_send'): conn.send_message(msg)
+            except Exception as e:
+                traceback.print_exc()
+                # Any SMTP error may leave the session unusable; reconnect next time
+                if isinstance(e, (smtplib.SMTPException, OSError)): conn = self._close(conn)
+                self._failed(doc, e)
+                continue
+            # Outside the send's handler: a Mongo error recording a delivered message is not a failed send
+            self._sent(doc)
+        return conn, datetime.datetime.now().timestamp()
+
+    def _close(self, conn):
+        if conn is not None:
+            try: conn.quit()
+            except Exception: pass
+        return None
+
+    def _sent(self, doc):
+        now = datetime.datetime.now()
+        self.col.update_one({"_id": doc['_id']}, {"$set": {"status": SENT, "sent_at": now}, "$inc": {"attempts": 1}})
+        self._set_challan_status(doc.get('challan_id'), "Sent", email_sent_at=now)
+
+    def _failed(self, doc, error):
+        attempts = doc.get('attempts', 0) + 1
+        fields = {"attempts": attempts, "last_error": str(error)}
+        if attempts >= self.max_attempts:
+            fields["status"] = FAILED
+            self._set_challan_status(doc.get('challan_id'), "Failed", email_error=str(error))
+        else:
+            delay = self.retry_base * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            fields.update(status=PENDING, next_attempt_at=datetime.datetime.now() + datetime.timedelta(seconds=delay))
+            self._set_challan_status(doc.get('challan_id'), "Retrying")
+        self.col.update_one({"_id": doc['_id']}, {"$set": fields})
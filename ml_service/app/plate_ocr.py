@@ -0,0 +1,327 @@
+"""Plate-specific OCR engine for Indian registration plates.
+
+An alternative to EasyOCR's general English model (OCR_ENGINE=plate). A plate is
+one short string over 36 characters with a known layout, so recognition is:
+
+1. segmentation: Otsu binarization in both polarities (dark-on-light plates and
+   light-on-dark EV/commercial plates), connected components filtered to
+   character size, one or two rows read top to bottom, touching characters split
+   by expected width;
+2. per-glyph scoring: every glyph is correlated with a bank of character
+   templates, giving a log-probability over 0-9A-Z;
+3. grammar-constrained decoding: the best string that fits an Indian layout
+   (state code, RTO district, series, number, or the BH series) is chosen
+   jointly over all glyphs, so a glyph that looks like "0" in a letter position
+   decodes as "O", "1" as "I", "8" as "B" and so on.
+
+Templates are rendered from OpenCV's Hershey fonts at startup. Glyphs cut from
+real, labelled plate crops fit the plate typeface much better; collect them with
+
+    python plate_ocr.py harvest crops/ glyphs/      # crops named after their plate, e.g. MH12AB1234_3.jpg
+
+and point PLATE_OCR_GLYPHS at the output folder.
+
+`correct_plate_text` applies the same grammar to a plain string, e.g. EasyOCR's
+output (OCR_GRAMMAR_CORRECTION=True).
+"""
+import argparse
+import functools
+import os
+import string
+import sys
+
+import cv2
+import numpy as np
+
+PLATE_OCR_GLYPHS = os.getenv('PLATE_OCR_GLYPHS', '')
+# Crop height a one-row plate is scaled to before segmentation (two-row plates get twice this)
+PLATE_OCR_HEIGHT = int(os.getenv('PLATE_OCR_HEIGHT', 64))
+
+ALPHABET = string.digits + string.ascii_uppercase
+CHAR_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+DIGITS = np.array([c.isdigit() for c in ALPHABET])
+LETTERS = ~DIGITS
+
+STATE_CODES = ('AN', 'AP', 'AR', 'AS', 'BR', 'CG', 'CH', 'DD', 'DL', 'DN', 'GA', 'GJ', 'HP', 'HR', 'JH', 'JK',
+               'KA', 'KL', 'LA', 'LD', 'MH', 'ML', 'MN', 'MP', 'MZ', 'NL', 'OD', 'OR', 'PB', 'PY', 'RJ', 'SK',
+               'TG', 'TN', 'TR', 'TS', 'UA', 'UK', 'UP', 'WB')
+# Look-alike characters OCR swaps; used to repair plain strings against the grammar
+CONFUSIONS = {'0': 'ODQ', '1': 'IL', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+
+GLYPH_SIZE = (16, 24)  # (w, h) glyphs are normalized to before matching
+# Sharpness of the template-similarity -> probability softmax
+TEMPERATURE = 25.0
+# Log-prob penalties for the rarer layouts, so ties go to "DL 01 AB 1234"
+SHORT_DISTRICT_PENALTY = 0.5
+SHORT_NUMBER_PENALTY = 1.0
+NO_SERIES_PENALTY = 0.5
+
+
+# --- Grammar ---
+@functools.lru_cache(maxsize=None)
+def layouts(n):
+    """Layouts of n characters: tuples of ('state'|'D'|'L'|'B'|'H', ...) and their prior penalty."""
+    out = []
+    # Standard: state(2) district(1-2) series(0-3) number(1-4)
+    for d in (1, 2):
+        for s in range(4):
+            num = n - 2 - d - s
+            if 1 <= num <= 4:
+                pen = (d == 1) * SHORT_DISTRICT_PENALTY + (4 - num) * SHORT_NUMBER_PENALTY + (s == 0) * NO_SERIES_PENALTY
+                out.append((('state', 'state') + ('D',) * d + ('L',) * s + ('D',) * num, pen))
+    # Bharat series: YY BH NNNN X(X)
+    if n in (9, 10):
+        out.append((('D', 'D', 'B', 'H', 'D', 'D', 'D', 'D') + ('L',) * (n - 8), 0.0))
+    return out
+
+
+_STATE_A = np.array([CHAR_INDEX[s[0]] for s in STATE_CODES])
+_STATE_B = np.array([CHAR_INDEX[s[1]] for s in STATE_CODES])
+
+
+def decode(logp):
+    """Best grammatical string for per-glyph log-probs over ALPHABET; (text, score) or (None, -inf)."""
+    n = len(logp)
+    best, best_score = None, -np.inf
+    if not n: return best, best_score
+    digit_best = np.where(DIGITS, logp, -np.inf).argmax(axis=1)
+    letter_best = np.where(LETTERS, logp, -np.inf).argmax(axis=1)
+    rows = np.arange(n)
+    digit_score, letter_score = logp[rows, digit_best], logp[rows, letter_best]
+    state_scores = logp[0, _STATE_A] + logp[1, _STATE_B] if n >= 2 else None
+    for layout, penalty in layouts(n):
+        score, chars = -penalty, []
+        for i, kind in enumerate(layout):
+            if kind == 'state':
+                if i == 0:
+                    k = int(state_scores.argmax())
+                    score += state_scores[k]
+                    chars.append(STATE_CODES[k])
+            elif kind == 'D':
+                score += digit_score[i]
+                chars.append(ALPHABET[digit_best[i]])
+            elif kind == 'L':
+                score += letter_score[i]
+                chars.append(ALPHABET[letter_best[i]])
+            else:
+                score += logp[i, CHAR_INDEX[kind]]
+                chars.append(kind)
+        if score > best_score:
+            best, best_score = ''.join(chars), score
+    return best, best_score
+
+
+def _confusion_logp(text, swap_cost=1.0, miss_cost=20.0):
+    logp = np.full((len(text), len(ALPHABET)), -miss_cost)
+    for i, c in enumerate(text):
+        logp[i, CHAR_INDEX[c]] = 0.0
+        for alt in CONFUSIONS.get(c, ''):
+            logp[i, CHAR_INDEX[alt]] = -swap_cost
+        for digit, alts in CONFUSIONS.items():
+            if c in alts: logp[i, CHAR_INDEX[digit]] = -swap_cost
+    return logp
+
+
+def correct_plate_text(text):
+    """Swap look-alike characters so `text` fits a plate layout; unchanged if no layout fits that way."""
+    text = ''.join(c for c in str(text).upper() if c in CHAR_INDEX)
+    if not text: return text
+    fixed, score = decode(_confusion_logp(text))
+    # Any position needing more than a look-alike swap means the text is not a plate we know
+    return fixed if fixed is not None and score > -10.0 else text
+
+
+# --- Glyphs ---
+def glyph_feature(glyph):
+    """Binary glyph crop (text = 255) -> zero-mean, unit-norm vector, aspect kept by padding."""
+    h, w = glyph.shape[:2]
+    gw, gh = GLYPH_SIZE
+    if w * gh < h * gw:
+        pad = (h * gw // gh - w) // 2
+        glyph = cv2.copyMakeBorder(glyph, 0, 0, pad, pad, cv2.BORDER_CONSTANT, value=0)
+    else:
+        pad = (w * gh // gw - h) // 2
+        glyph = cv2.copyMakeBorder(glyph, pad, pad, 0, 0, cv2.BORDER_CONSTANT, value=0)
+    v = cv2.resize(glyph, GLYPH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    v -= v.mean()
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+
+def _crop_ink(img):
+    ys, xs = np.nonzero(img)
+    if not len(ys): return None
+    return img[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+
+def render_templates():
+    """Features and labels of every character in a few Hershey fonts and stroke widths."""
+    feats, labels = [], []
+    fonts = (cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX, cv2.FONT_HERSHEY_TRIPLEX)
+    for c in ALPHABET:
+        for font in fonts:
+            for thickness in (3, 5, 7):
+                canvas = np.zeros((120, 100), dtype=np.uint8)
+                cv2.putText(canvas, c, (10, 95), font, 3.0, 255, thickness, cv2.LINE_AA)
+                ink = _crop_ink((canvas > 127).astype(np.uint8) * 255)
+                if ink is None: continue
+                feats.append(glyph_feature(ink))
+                labels.append(CHAR_INDEX[c])
+    return feats, labels
+
+
+def load_glyphs(folder):
+    """Harvested glyphs: <folder>/<char>/*.png, binary with text = 255."""
+    feats, labels = [], []
+    for c in ALPHABET:
+        sub = os.path.join(folder, c)
+        if not os.path.isdir(sub): continue
+        for name in os.listdir(sub):
+            img = cv2.imread(os.path.join(sub, name), cv2.IMREAD_GRAYSCALE)
+            ink = _crop_ink(img > 127) if img is not None else None
+            if ink is None: continue
+            feats.append(glyph_feature(ink.astype(np.uint8) * 255))
+            labels.append(CHAR_INDEX[c])
+    return feats, labels
+
+
+class PlateRecognizer:
+    """OCR engine (see ocr_stage.EasyOcrEngine for the interface) that reads plates by template matching."""
+    name = 'plate'
+
+    def __init__(self, glyph_dir=PLATE_OCR_GLYPHS, height=PLATE_OCR_HEIGHT):
+        feats, labels = render_templates()
+        if glyph_dir:
+            more_feats, more_labels = load_glyphs(glyph_dir)
+            feats, labels = feats + more_feats, labels + more_labels
+        # Grouped by character so per-character maxima are one reduceat
+        order = np.argsort(labels, kind='stable')
+        self.templates = np.stack(feats)[order]    # (m, d)
+        self.labels = np.array(labels)[order]      # (m,) index into ALPHABET
+        self._starts = np.searchsorted(self.labels, np.arange(len(ALPHABET)))
+        self.height = height
+
+    def prepare(self, crop):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        h, w = gray.shape[:2]
+        # Near-square crops are usually two-row plates (motorcycles, trucks)
+        target = self.height if w >= 2 * h else 2 * self.height
+        return cv2.resize(gray, (max(1, round(w * target / h)), target), interpolation=cv2.INTER_LINEAR)
+
+    def read_batch(self, images):
+        return [self.read(img) for img in images]
+
+    def read(self, gray):
+        glyphs = self.segment(gray)
+        if len(glyphs) < 4: return ''
+        logp = self.score(glyphs)
+        text, _ = decode(logp)
+        # Formats the grammar does not know (old or foreign plates) read unconstrained
+        return text if text is not None else ''.join(ALPHABET[i] for i in logp.argmax(axis=1))
+
+    def score(self, glyphs):
+        """(n, 36) log-probs: best template similarity per character, softmaxed."""
+        sims = np.stack([glyph_feature(g) for g in glyphs]) @ self.templates.T   # (n, m)
+        z = np.maximum.reduceat(sims, self._starts, axis=1) * TEMPERATURE
+        z -= z.max(axis=1, keepdims=True)
+        return z - np.log(np.exp(z).sum(axis=1, keepdims=True))
+
+    # --- Segmentation ---
+    def segment(self, gray):
+        """Binary glyph crops in reading order, from the polarity that yields more characters."""
+        blur = cv2.GaussianBlur(gray, (3, 3), 0)
+        best = []
+        for flag in (cv2.THRESH_BINARY_INV, cv2.THRESH_BINARY):
+            _, binary = cv2.threshold(blur, 0, 255, flag | cv2.THRESH_OTSU)
+            glyphs = self._glyphs(binary)
+            if len(glyphs) > len(best): best = glyphs
+        return best
+
+    def _glyphs(self, binary):
+        H, W = binary.shape[:2]
+        n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        boxes = []
+        for x, y, w, h, area in stats[1:n]:
+            if not 0.2 * H <= h <= 0.95 * H: continue
+            if w > 3.0 * h or w < 2 or area < 0.1 * w * h: continue
+            if x == 0 or x + w == W: continue  # plate border / frame edge
+            boxes.append((x, y, w, h))
+        if not boxes: return []
+        # Characters share one height per row; drops the IND strip, bolts and screw heads
+        med_h = float(np.median([b[3] for b in boxes]))
+        boxes = [b for b in boxes if 0.65 * med_h <= b[3] <= 1.35 * med_h]
+        # Touching characters come out as one wide component; split it by the typical width
+        narrow = [b[2] for b in boxes if b[2] <= 1.1 * b[3]]
+        char_w = float(np.median(narrow)) if narrow else 0.6 * med_h
+        out = []
+        for row in self._rows(boxes, med_h):
+            for x, y, w, h in sorted(row):
+                pieces = max(1, round(w / char_w)) if w > 1.1 * h else 1
+                step = w / pieces
+                for k in range(pieces):
+                    x0, x1 = x + round(k * step), x + round((k + 1) * step)
+                    ink = _crop_ink(binary[y:y + h, x0:x1])
+                    if ink is not None: out.append(ink)
+        return out
+
+    @staticmethod
+    def _rows(boxes, med_h):
+        """One row, or two when the character centres split by more than half a character height."""
+        centers = sorted((b[1] + b[3] / 2.0, b) for b in boxes)
+        ys = [c for c, _ in centers]
+        gaps = np.diff(ys)
+        if len(gaps) and gaps.max() > 0.5 * med_h:
+            cut = int(gaps.argmax()) + 1
+            return [[b for _, b in centers[:cut]], [b for _, b in centers[cut:]]]
+        return [boxes]
+
+
+# --- Harvesting glyphs from labelled crops ---
+def label_of(path):
+    """Plate text from a crop's file name: MH12AB1234.jpg or MH12AB1234_7.png."""
+    stem = os.path.splitext(os.path.basename(path))[0].split('_')[0]
+    return ''.join(c for c in stem.upper() if c in CHAR_INDEX)
+
+
+def harvest(crops_dir, out_dir, recognizer=None, log=print):
+    """Cut labelled plate crops into per-character glyph images for PLATE_OCR_GLYPHS."""
+    rec = recognizer or PlateRecognizer(glyph_dir='')
+    used = skipped = 0
+    for name in sorted(os.listdir(crops_dir)):
+        img = cv2.imread(os.path.join(crops_dir, name))
+        text = label_of(name)
+        if img is None or not text: continue
+        glyphs = rec.segment(rec.prepare(img))
+        # Only crops that segment into exactly one glyph per character are trustworthy
+        if len(glyphs) != len(text):
+            skipped += 1
+            continue
+        for k, (c, g) in enumerate(zip(text, glyphs)):
+            os.makedirs(os.path.join(out_dir, c), exist_ok=True)
+            cv2.imwrite(os.path.join(out_dir, c, f"{os.path.splitext(name)[0]}_{k}.png"), g)
+        used += 1
+    log(f"{used} crops harvested, {skipped} skipped (segmentation did not match the label)")
+    return used, skipped
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Plate-specific OCR engine")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    hv = sub.add_parser('harvest', help="cut labelled plate crops into glyph templates")
+    hv.add_argument('crops')
+    hv.add_argument('out')
+    rd = sub.add_parser('read', help="read plate crops")
+    rd.add_argument('images', nargs='+')
+    args = ap.parse_args(argv)
+    if args.cmd == 'harvest':
+        harvest(args.crops, args.out)
+        return 0
+    rec = PlateRecognizer()
+    for path in args.images:
+        img = cv2.imread(path)
+        print(f"{path}: {rec.read(rec.prepare(img)) if img is not None else '(unreadable)'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
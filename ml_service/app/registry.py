@@ -0,0 +1,262 @@
+"""Hash-indexed vehicle registry used by validate_vehicle_in_csv.
+
+The registry keeps each dataset column as a flat array and a dict that maps the
+normalized plate (spaces removed, upper-cased) to its row position, so a lookup
+costs one hash probe plus one read per column instead of a scan of the whole
+DataFrame.
+
+Document compliance is derived in bulk: the expiry columns are parsed once into
+native date arrays at load, and the per-row statuses, violations and fine totals
+are computed for the whole registry one calendar day at a time. The registry
+watcher (registry_manager) computes the next day's arrays before midnight with
+`prepare_compliance`, and the first lookup of the new day swaps them in with
+one assignment; only when nothing prepared them does that lookup recompute.
+A lookup only reads those precomputed arrays. Registries opened memory-mapped by
+registry_store skip that step and derive compliance for the one row looked up
+(`row_compliance`).
+"""
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+# (status key, violation label, expiry column, fine, commercial vehicles only)
+CHECKS = [
+    ('rc_status', 'RC', 'Fitness_Expiry', 5000, False),
+    ('insurance_status', 'Insurance', 'Insurance_Expiry', 2000, False),
+    ('puc_status', 'PUC', 'PUC_Expiry', 10000, False),
+    ('fitness_status', 'Fitness', 'Fitness_Expiry', 5000, True),
+    ('permit_status', 'Permit', 'Permit_Expiry', 5000, True),
+    ('tax_status', 'Tax', 'Road_Tax_Expiry', 2000, False),
+]
+COMMERCIAL_KEYWORDS = ['commercial', 'transport', 'goods', 'truck', 'taxi']
+
+VALID, EXPIRED, UNKNOWN, NOT_APPLICABLE = 0, 1, 2, 3
+STATUS_NAMES = ("Valid", "Expired", "Unknown", "N/A")
+
+# Per-check violation digit (base 3) packed into one code per row
+_NO_VIOLATION, _EXPIRED, _MISSING = 0, 1, 2
+
+
+def normalize_plate(plate):
+    return str(plate).replace(" ", "").upper()
+
+
+def _violation_labels(code):
+    out = []
+    for _, name, _, _, _ in CHECKS:
+        digit = code % 3
+        code //= 3
+        if digit == _MISSING: out.append(f"Expired/Missing {name}")
+        elif digit == _EXPIRED: out.append(f"Expired {name}")
+    return tuple(out)
+
+
+VIOLATION_LABELS = [_violation_labels(c) for c in range(3 ** len(CHECKS))]
+
+
+def clean_column(values):
+    """Vectorized form of the old per-field `clean`: NaN/'nan' -> 'N/A', else str."""
+    s = pd.Series(values, dtype=object).astype(str)
+    return s.mask(s.str.lower() == 'nan', 'N/A').to_numpy()
+
+
+def parse_expiry(values):
+    """Parse a '%Y-%m-%d' column once; returns (datetime64[D] array, missing mask)."""
+    raw = pd.Series(values, dtype=object)
+    dates = pd.to_datetime(raw.astype(str).str.strip(), format='%Y-%m-%d', errors='coerce').to_numpy().astype('datetime64[D]')
+    # Only rows that failed to parse can be missing; classify just those
+    missing = np.zeros(len(raw), dtype=bool)
+    bad = np.flatnonzero(np.isnat(dates))
+    if len(bad):
+        sub = raw.iloc[bad]
+        missing[bad] = (sub.isna() | (sub.astype(str).str.lower() == 'nan') | (sub == '')).to_numpy()
+    return dates, missing
+
+
+def registry_columns(df):
+    """(columns, plates, expiries, commercial) of a registry DataFrame, as VehicleRegistry takes them."""
+    plates = df['Registration_Number'].astype(str).str.replace(" ", "").str.upper()
+    df = df.assign(_plate_normalized=plates)
+    expiries = {}
+    for _, _, col, _, _ in CHECKS:
+        if col in df.columns and col not in expiries:
+            expiries[col] = parse_expiry(df[col].to_numpy())
+    v_class = df['Vehicle_Class'] if 'Vehicle_Class' in df.columns else pd.Series('', index=df.index)
+    commercial = v_class.astype(str).str.lower().str.contains('|'.join(COMMERCIAL_KEYWORDS), regex=True).to_numpy()
+    columns = [(c, clean_column(df[c].to_numpy())) for c in df.columns]
+    return columns, plates.tolist(), expiries, commercial
+
+
+class Compliance:
+    """Registry-wide compliance state for one calendar day."""
+
+    def __init__(self, as_of, statuses, codes, fines):
+        self.as_of = as_of
+        self.statuses = statuses  # status key -> uint8 array
+        self.codes = codes        # uint16 violation code per row
+        self.fines = fines        # int64 total fine per row
+
+
+class VehicleRegistry:
+    """Read-only plate -> vehicle record index built once at load time."""
+
+    def __init__(self, columns, plates, expiries=None, commercial=None, index=None, precompute=True, source=None):
+        # columns: list of (name, array) pairs of display strings, aligned by row
+        self.columns = columns
+        self._column_map = dict(columns)
+        n = len(plates)
+        if index is None:
+            # Reversed so the first occurrence of a duplicated plate wins, as the old
+            # `match.iloc[0]` did.
+            index = dict(zip(plates[::-1], range(n - 1, -1, -1)))
+        # Any mapping with .get(normalized plate) -> row, e.g. the on-disk index of registry_store
+        self.index = index
+        # expiry column -> (datetime64[D] array, missing mask)
+        self.expiries = expiries or {}
+        self.commercial = commercial if commercial is not None else np.zeros(n, dtype=bool)
+        self._n = n
+        # Without precompute (memory-mapped registries) compliance is derived per lookup,
+        # so no per-process array of registry size is allocated
+        self.precompute = precompute
+        # Version directory a memory-mapped registry was opened from (registry_store), else None
+        self.source = source
+        self._compliance = None
+        self._upcoming = None  # a later day's Compliance from prepare_compliance
+        self._lock = threading.Lock()
+        if n and precompute:
+            self.refresh_compliance()
+
+    @classmethod
+    def from_dataframe(cls, df):
+        if df.empty or 'Registration_Number' not in df.columns:
+            return cls([], [])
+        return cls(*registry_columns(df))
+
+    @classmethod
+    def from_csv(cls, path):
+        df = pd.read_csv(path)
+        df.columns = [c.strip() for c in df.columns]
+        return cls.from_dataframe(df)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def empty(self):
+        return not self.index
+
+    def _value(self, name, i):
+        arr = self._column_map.get(name)
+        return arr[i] if arr is not None else 'N/A'
+
+    def compute_compliance(self, today=None):
+        """Statuses, violations and fines of every row as of `today`."""
+        today = today or datetime.date.today()
+        day = np.datetime64(today, 'D')
+        n = self._n
+        statuses, codes, fines = {}, np.zeros(n, dtype=np.uint16), np.zeros(n, dtype=np.int64)
+        weight = 1
+        for key, _, col, fine, comm_only in CHECKS:
+            if col in self.expiries:
+                dates, missing = self.expiries[col]
+            else:
+                dates, missing = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]'), np.ones(n, dtype=bool)
+            parsed = ~np.isnat(dates)
+            expired = parsed & (dates < day)
+            status = np.full(n, UNKNOWN, dtype=np.uint8)
+            status[parsed] = VALID
+            status[expired | missing] = EXPIRED
+            digit = np.where(missing, _MISSING, np.where(expired, _EXPIRED, _NO_VIOLATION)).astype(np.uint16)
+            if comm_only:
+                status[~self.commercial] = NOT_APPLICABLE
+                digit[~self.commercial] = _NO_VIOLATION
+            statuses[key] = status
+            codes += digit * weight
+            fines += (digit != _NO_VIOLATION) * fine
+            weight *= 3
+        return Compliance(today, statuses, codes, fines)
+
+    def row_compliance(self, i, today=None):
+        """compute_compliance for the single row `i`, as (statuses, violation code, fine)."""
+        day = np.datetime64(today or datetime.date.today(), 'D')
+        commercial = bool(self.commercial[i])
+        statuses, code, total, weight = {}, 0, 0, 1
+        for key, _, col, fine, comm_only in CHECKS:
+            if col in self.expiries:
+                dates, missing = self.expiries[col]
+                date, miss = dates[i], bool(missing[i])
+            else:
+                date, miss = np.datetime64('NaT'), True
+            parsed = not np.isnat(date)
+            expired = parsed and date < day
+            status = EXPIRED if expired or miss else VALID if parsed else UNKNOWN
+            digit = _MISSING if miss else _EXPIRED if expired else _NO_VIOLATION
+            if comm_only and not commercial: status, digit = NOT_APPLICABLE, _NO_VIOLATION
+            statuses[key] = status
+            code += digit * weight
+            total += fine if digit != _NO_VIOLATION else 0
+            weight *= 3
+        return statuses, code, total
+
+    def refresh_compliance(self, today=None):
+        """Recompute statuses, violations and fines for every row as of `today`."""
+        # Single attribute swap so concurrent lookups see either the old or new day
+        self._compliance = self.compute_compliance(today)
+
+    def prepare_compliance(self, day):
+        """Compute compliance for the coming `day` now; lookups switch to it when the date turns."""
+        if not (self._n and self.precompute): return
+        upcoming = self._upcoming
+        if upcoming is None or upcoming.as_of != day:
+            self._upcoming = self.compute_compliance(day)
+
+    def _current_compliance(self):
+        comp = self._compliance
+        today = datetime.date.today()
+        if comp.as_of != today:
+            with self._lock:
+                if self._compliance.as_of != today:
+                    upcoming = self._upcoming
+                    if upcoming is not None and upcoming.as_of == today:
+                        self._compliance = upcoming
+                    else:
+                        self.refresh_compliance(today)
+            comp = self._compliance
+        return comp
+
+    def row_of(self, plate):
+        return self.index.get(normalize_plate(plate))
+
+    def get(self, plate):
+        """Return the display record for `plate` as a {column: value} dict, or None."""
+        i = self.index.get(normalize_plate(plate))
+        if i is None: return None
+        return {name: arr[i] for name, arr in self.columns}
+
+    def verdict(self, plate):
+        """Precomputed validation result for `plate` in the validate_vehicle_in_csv shape."""
+        i = self.index.get(normalize_plate(plate))
+        if i is None: return None
+        if self.precompute:
+            comp = self._current_compliance()
+            statuses = {key: status[i] for key, status in comp.statuses.items()}
+            code, fine = comp.codes[i], comp.fines[i]
+        else:
+            statuses, code, fine = self.row_compliance(i)
+        val = self._value
+        out = {
+            'plate_number': val('Registration_Number', i),
+            'owner_name': val('Owner_Name', i),
+            'owner_email': val('Owner_Email', i),
+            'vehicle_type': val('Vehicle_Class', i),
+            'make_model': f"{val('Make', i)} {val('Model', i)}",
+            'fuel_type': val('Fuel_Type', i),
+        }
+        for key, status in statuses.items():
+            out[key] = STATUS_NAMES[status]
+        out['violations'] = list(VIOLATION_LABELS[code])
+        out['total_fine'] = int(fine)
+        out['raw_data'] = {name: arr[i] for name, arr in self.columns}
+        return out
@@ -0,0 +1,252 @@
+"""Hot reloading of the vehicle registry: new snapshots and delta files, swapped in atomically.
+
+A snapshot is the registry CSV, or its memory-mapped conversion when that is
+current (registry_store.load_registry). Deltas are CSV files in
+REGISTRY_DELTA_DIR holding changed or added plates, for example an RTO's daily
+insurance/PUC/fitness renewals:
+
+    Registration_Number,Insurance_Expiry,PUC_Expiry
+    MH12AB1234,2027-03-31,2026-12-31
+
+Each delta row updates the columns its file has and keeps the plate's other
+values; a plate not in the registry is added. Files apply in name order, so a
+later file wins. Every delta applies on top of the snapshot except the files a
+converted snapshot records as folded into it (registry_store --folded-deltas),
+matched by name, size and mtime; re-converting or touching the CSV never drops
+a delta by itself.
+
+A watcher thread polls the snapshot and delta files every REGISTRY_POLL_SECONDS.
+A file must look the same on two polls in a row before it is read, so a copy in
+progress is never loaded. The new registry is built in full on that thread and
+published by one reference assignment: a lookup reads `current` once and
+finishes against that registry even if a reload swaps it mid-call. If a build
+fails the previous registry keeps serving, and the same files are not retried
+until they change.
+
+A converted snapshot is republished as a new version directory
+(registry_store), so the old registry's files stay untouched while lookups
+still map them. After a swap, and again on every poll, superseded versions are
+collected; the one the current registry maps is always kept, and one an
+in-flight lookup still maps is removed once it is released (on Windows, a
+later poll retries it).
+
+Within REGISTRY_PRECOMPUTE_LEAD_SECONDS of midnight the watcher also computes
+the next day's compliance for the current registry, so no lookup after midnight
+waits for a registry-wide recompute.
+"""
+import datetime
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from registry import VehicleRegistry, normalize_plate
+import registry_store
+from registry_store import load_registry
+
+REGISTRY_DELTA_DIR = os.getenv('REGISTRY_DELTA_DIR')
+REGISTRY_POLL_SECONDS = float(os.getenv('REGISTRY_POLL_SECONDS', 30))
+REGISTRY_PRECOMPUTE_LEAD_SECONDS = float(os.getenv('REGISTRY_PRECOMPUTE_LEAD_SECONDS', 600))
+
+
+class LayeredRegistry:
+    """A snapshot registry with the plates of the delta files in front of it."""
+
+    def __init__(self, base, delta, added=0):
+        self.base, self.delta = base, delta
+        self._n = len(base) + added
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def empty(self):
+        return self.base.empty and self.delta.empty
+
+    def get(self, plate):
+        rec = self.delta.get(plate)
+        return rec if rec is not None else self.base.get(plate)
+
+    def verdict(self, plate):
+        out = self.delta.verdict(plate)
+        return out if out is not None else self.base.verdict(plate)
+
+    def prepare_compliance(self, day):
+        self.base.prepare_compliance(day)
+        self.delta.prepare_compliance(day)
+
+
+def _stat(path):
+    try: st = os.stat(path)
+    except OSError: return None
+    return st.st_size, st.st_mtime
+
+
+def read_delta(path):
+    df = pd.read_csv(path, dtype=str)
+    df.columns = [str(c).strip() for c in df.columns]
+    if 'Registration_Number' not in df.columns: raise ValueError(f"{path} has no Registration_Number column")
+    return df[df['Registration_Number'].notna()]
+
+
+def apply_deltas(base, paths):
+    """LayeredRegistry of `base` with the delta files `paths` applied in order."""
+    records = {}  # normalized plate -> {column: raw value}
+    for path in paths:
+        df = read_delta(path)
+        columns = list(df.columns)
+        for row in df.itertuples(index=False, name=None):
+            update = dict(zip(columns, row))
+            key = normalize_plate(update['Registration_Number'])
+            rec = records.get(key)
+            if rec is None:
+                # Display values back to what read_csv gives: 'N/A' is a missing value
+                shown = base.get(key) or {}
+                rec = {c: np.nan if v == 'N/A' else v for c, v in shown.items()}
+            rec.update(update)
+            records[key] = rec
+    added = sum(1 for key in records if base.row_of(key) is None)
+    return LayeredRegistry(base, VehicleRegistry.from_dataframe(pd.DataFrame(list(records.values()))), added)
+
+
+class RegistryManager:
+    """Owns the registry lookups use and rebuilds it when its files change."""
+
+    def __init__(self, csv_path, mapped_path=None, delta_dir=REGISTRY_DELTA_DIR, poll_seconds=REGISTRY_POLL_SECONDS):
+        self.csv_path, self.mapped_path = csv_path, mapped_path
+        self.delta_dir = delta_dir
+        self.poll_seconds = poll_seconds
+        self.current = VehicleRegistry([], [])
+        self.version = 0  # bumped on every swap
+        self.loaded_at = None
+        self.reload_seconds = None
+        self.last_error = None
+        self._base = self.current
+        self._snapshot = None  # snapshot stamp the base was loaded from
+        self._deltas = ()      # (name, size, mtime) of the applied deltas
+        self._seen = None      # stamps of the previous poll
+        self._failed = None    # stamps whose build failed
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot_stamp(self):
+        if not self.mapped_path: return _stat(self.csv_path), None
+        meta = registry_store.meta_path(self.mapped_path)
+        st = _stat(meta)
+        # The live version's path is part of the stamp: a republish can match size and mtime
+        return _stat(self.csv_path), st + (meta,) if st else None
+
+    def _folded(self):
+        """Deltas the snapshot load_registry would pick records as already folded into it."""
+        if not self.mapped_path or not registry_store.is_current(self.mapped_path, self.csv_path): return set()
+        try: return registry_store.folded_deltas(self.mapped_path)
+        except (OSError, ValueError): return set()
+
+    def _delta_stamps(self):
+        if not self.delta_dir or not os.path.isdir(self.delta_dir): return ()
+        folded = self._folded()
+        out = []
+        for name in sorted(os.listdir(self.delta_dir)):
+            if not name.lower().endswith('.csv'): continue
+            st = _stat(os.path.join(self.delta_dir, name))
+            if st and (name,) + st not in folded: out.append((name,) + st)
+        return tuple(out)
+
+    def load(self):
+        """Load the current snapshot and deltas now; raises if the build fails."""
+        self._reload(self._snapshot_stamp(), self._delta_stamps(), full=True)
+
+    def check(self):
+        """One poll: rebuild if the files changed and have settled. Returns whether it swapped."""
+        self.collect()
+        snapshot = self._snapshot_stamp()
+        deltas = self._delta_stamps()
+        stamps = (snapshot, deltas)
+        settled, self._seen = stamps == self._seen, stamps
+        if not settled or stamps == self._failed: return False
+        full = snapshot != self._snapshot
+        if not full and deltas == self._deltas: return False
+        try:
+            self._reload(snapshot, deltas, full)
+        except Exception as e:
+            self._failed = stamps
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Registry reload failed, keeping version {self.version}: {e}")
+            traceback.print_exc()
+            return False
+        return True
+
+    def _reload(self, snapshot, deltas, full):
+        with self._lock:
+            t0 = time.perf_counter()
+            base = load_registry(self.csv_path, self.mapped_path) if full else self._base
+            paths = [os.path.join(self.delta_dir, d[0]) for d in deltas]
+            reg = apply_deltas(base, paths) if paths else base
+            elapsed = time.perf_counter() - t0
+            # The swap: lookups already holding the old registry finish on it
+            self.current = reg
+            self._base, self._snapshot, self._deltas = base, snapshot, deltas
+            self.version += 1
+            self.loaded_at = datetime.datetime.now()
+            self.reload_seconds = elapsed
+            self.last_error = self._failed = None
+        # The swap dropped the old registry; its version goes once no lookup maps it
+        self.collect()
+        metrics.observe('registry_reload', elapsed)
+        print(f"Registry version {self.version}: {len(reg)} plates, {len(deltas)} delta file(s), "
+              f"{'full' if full else 'delta'} reload in {elapsed:.2f}s")
+
+    def collect(self):
+        """Delete converted versions nothing serves from any more; returns their names."""
+        if not self.mapped_path or not os.path.isdir(self.mapped_path): return []
+        source = getattr(self._base, 'source', None)
+        try:
+            return registry_store.collect(self.mapped_path, keep=[source] if source else ())
+        except OSError as e:
+            print(f"Registry version cleanup failed: {e}")
+            return []
+
+    def prepare_next_day(self, now=None):
+        """Near midnight, compute tomorrow's compliance for the current registry. Returns whether it did."""
+        now = now or datetime.datetime.now()
+        tomorrow = now.date() + datetime.timedelta(days=1)
+        # At least two polls of lead, so a long poll interval cannot step over the window
+        lead = max(REGISTRY_PRECOMPUTE_LEAD_SECONDS, 2 * self.poll_seconds)
+        if (datetime.datetime.combine(tomorrow, datetime.time()) - now).total_seconds() > lead: return False
+        self.current.prepare_compliance(tomorrow)
+        return True
+
+    def start(self):
+        if self._thread or self.poll_seconds <= 0: return self
+        self._seen = (self._snapshot, self._deltas)
+        self._thread = threading.Thread(target=self._watch, name="registry-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+                self.prepare_next_day()
+            except Exception:
+                traceback.print_exc()
+
+    def status(self):
+        """The `registry` object of /api/health."""
+        return {
+            'version': self.version,
+            'plates': len(self.current),
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'reload_seconds': round(self.reload_seconds, 3) if self.reload_seconds is not None else None,
+            'deltas': [d[0] for d in self._deltas],
+            'watching': self._thread is not None,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,442 @@
+"""Columnar, memory-mapped on-disk format for the vehicle registry.
+
+`convert` turns the registry CSV into a directory of flat numpy files:
+
+    CURRENT                            name of the live version directory below
+    v<time>-<id>/                      one complete conversion:
+    meta.json                          row count, column names, source CSV size/mtime,
+                                       delta files folded into the CSV (name/size/mtime)
+    col_<k>.data.npy / .offsets.npy    UTF-8 bytes of string column k and its row offsets
+    plates.data.npy / .offsets.npy     normalized plates
+    slots.npy                          open-addressing hash table (crc32, linear probing) -> row
+    expiry_<k>.npy / missing_<k>.npy   parsed expiry dates and missing masks
+    commercial.npy
+
+`RegistryWriter` builds the same layout from DataFrame chunks (see
+process_vehicle_data.py) with memory bounded by the chunk, not the registry.
+
+`open_registry` maps every file read-only, so opening costs a few page faults
+instead of a CSV parse, and every worker process on the host shares the same
+page cache instead of holding its own copy of each column as Python strings.
+
+A conversion is written to a staging directory, renamed to a new version
+directory and published by rewriting CURRENT, so a reader opens either the old
+version or the new one. Files of a published version are never replaced while
+it may be mapped (Windows refuses to delete or rename mapped files). Publishing
+removes versions older than the one it replaces; `collect` removes that one
+too once nothing serves it, and a version still mapped somewhere is left for a
+later call. Directories from before versioning (the files directly in the registry
+directory) are still opened.
+
+Delta files (registry_manager) that were merged into the CSV are named with
+--folded-deltas; the service then skips exactly those files, and applies every
+other delta on top of the conversion.
+
+    python registry_store.py indian_vehicle_dataset.csv               # writes indian_vehicle_dataset.registry/
+    python registry_store.py indian_vehicle_dataset.csv --out /srv/registry
+    python registry_store.py indian_vehicle_dataset.csv --folded-deltas deltas/2026-10-*.csv
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from registry import VehicleRegistry, registry_columns
+
+FORMAT_VERSION = 1
+EMPTY = -1
+# Pointer file naming the live version directory
+CURRENT = 'CURRENT'
+# Rows hashed into the table per step when RegistryWriter builds it
+SLOT_CHUNK_ROWS = 1 << 18
+
+
+class StringColumn:
+    """Read-only column of strings stored as one UTF-8 buffer plus row offsets."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        return self.raw(i).decode('utf-8')
+
+
+class MappedIndex:
+    """Plate -> row lookups against the on-disk hash table."""
+
+    def __init__(self, slots, plates, count):
+        self.slots = slots
+        self.plates = plates
+        self.count = count
+        self._mask = len(slots) - 1
+
+    def __len__(self):
+        return self.count
+
+    def get(self, plate, default=None):
+        key = plate.encode('utf-8')
+        h = zlib.crc32(key) & self._mask
+        while True:
+            row = int(self.slots[h])
+            if row == EMPTY: return default
+            if self.plates.raw(row) == key: return row
+            h = (h + 1) & self._mask
+
+
+def _write_strings(path, values):
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    np.save(path + '.offsets.npy', offsets)
+    np.save(path + '.data.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+def _load(path):
+    """Map a .npy file read-only as a plain ndarray (no np.memmap per-slice overhead).
+
+    Lookups touch a few bytes at random rows, so kernel read-ahead is turned off;
+    otherwise every probe would pull in neighbouring pages nobody reads.
+    """
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        offset = f.tell()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_RANDOM'): mm.madvise(mmap.MADV_RANDOM)
+    count = int(np.prod(shape))
+    return np.frombuffer(mm, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def _read_strings(path):
+    return StringColumn(_load(path + '.data.npy'), _load(path + '.offsets.npy'))
+
+
+def build_slots(plates):
+    """Hash table of size 2^k >= 2n; the first occurrence of a duplicated plate wins."""
+    first = ~pd.Series(plates).duplicated(keep='first').to_numpy()
+    rows = np.flatnonzero(first)
+    size = 1 << max(4, int(2 * max(len(rows), 1) - 1).bit_length())
+    mask = size - 1
+    hashes = np.fromiter((zlib.crc32(p.encode('utf-8')) for p in plates), dtype=np.int64, count=len(plates))
+    slots = np.full(size, EMPTY, dtype=np.int64)
+    pos = hashes[rows] & mask
+    # Place colliding keys in rounds: one winner per free slot, the rest probe onward
+    while len(rows):
+        free = slots[pos] == EMPTY
+        cand_pos, cand_rows = pos[free], rows[free]
+        _, first_idx = np.unique(cand_pos, return_index=True)
+        slots[cand_pos[first_idx]] = cand_rows[first_idx]
+        placed = np.zeros(len(rows), dtype=bool)
+        placed[np.flatnonzero(free)[first_idx]] = True
+        rows, pos = rows[~placed], (pos[~placed] + 1) & mask
+    return slots, int(first.sum())
+
+
+def convert(csv_path, out_dir=None, deltas=()):
+    """Write the columnar registry for `csv_path`, recording the delta files `deltas` as folded into it.
+
+    Returns the output directory.
+    """
+    out_dir = out_dir or os.path.splitext(csv_path)[0] + '.registry'
+    df = pd.read_csv(csv_path)
+    df.columns = [c.strip() for c in df.columns]
+    reg = VehicleRegistry.from_dataframe(df)
+    write(reg, out_dir, source=csv_path, deltas=deltas)
+    return out_dir
+
+
+def write(reg, out_dir, source=None, deltas=()):
+    tmp = _staging_dir(out_dir)
+    names = [name for name, _ in reg.columns]
+    for k, (_, values) in enumerate(reg.columns):
+        _write_strings(os.path.join(tmp, f"col_{k}"), values)
+    # Every row's normalized plate (from_dataframe keeps them as a column), duplicates included
+    plates = list(reg._column_map['_plate_normalized'])
+    _write_strings(os.path.join(tmp, 'plates'), plates)
+    slots, unique = build_slots(plates)
+    np.save(os.path.join(tmp, 'slots.npy'), slots)
+    expiry_cols = list(reg.expiries)
+    for k, col in enumerate(expiry_cols):
+        dates, missing = reg.expiries[col]
+        np.save(os.path.join(tmp, f"expiry_{k}.npy"), np.asarray(dates, dtype='datetime64[D]'))
+        np.save(os.path.join(tmp, f"missing_{k}.npy"), np.asarray(missing, dtype=bool))
+    np.save(os.path.join(tmp, 'commercial.npy'), np.asarray(reg.commercial, dtype=bool))
+    meta = {'format_version': FORMAT_VERSION, 'rows': reg._n, 'unique_plates': unique,
+            'columns': names, 'expiry_columns': expiry_cols, 'created_at': time.time()}
+    _publish(tmp, out_dir, meta, source, deltas)
+
+
+def _staging_dir(out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.tmp-', dir=out_dir)
+
+
+def _publish(tmp, out_dir, meta, source=None, deltas=()):
+    if source:
+        st = os.stat(source)
+        meta['source'] = {'path': os.path.abspath(source), 'size': st.st_size, 'mtime': st.st_mtime}
+    folded = []
+    for path in deltas:
+        st = os.stat(path)
+        folded.append({'name': os.path.basename(path), 'size': st.st_size, 'mtime': st.st_mtime})
+    meta['folded_deltas'] = folded
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f: json.dump(meta, f, indent=2)
+    # The complete conversion becomes a version directory, then CURRENT points at it
+    previous = version_dir(out_dir)
+    name = f"v{time.strftime('%Y%m%dT%H%M%S')}-{os.path.basename(tmp)[len('.tmp-'):]}"
+    os.replace(tmp, os.path.join(out_dir, name))
+    pointer = os.path.join(out_dir, CURRENT + '.tmp')
+    with open(pointer, 'w') as f: f.write(name)
+    for attempt in range(10):
+        try:
+            os.replace(pointer, os.path.join(out_dir, CURRENT))
+            break
+        except PermissionError:  # Windows: a reader has CURRENT open this instant
+            if attempt == 9: raise
+            time.sleep(0.05)
+    # The version just replaced may still be served; a running service collects it after swapping
+    collect(out_dir, keep=[previous])
+
+
+def version_dir(path):
+    """The live version directory of registry `path` (`path` itself for the flat pre-versioning layout)."""
+    try:
+        with open(os.path.join(path, CURRENT)) as f: name = f.read().strip()
+    except FileNotFoundError:
+        return path
+    return os.path.join(path, name)
+
+
+def collect(path, keep=()):
+    """Delete superseded versions of registry `path`, except the live one and the directories in `keep`.
+
+    A version that cannot be removed yet (on Windows, one some process still
+    maps) is skipped and retried by the next call. Returns the removed names.
+    """
+    live = version_dir(path)
+    keep = {os.path.abspath(k) for k in keep} | {os.path.abspath(live)}
+    removed = []
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if name.startswith('v') and os.path.isdir(full) and os.path.abspath(full) not in keep:
+            try: shutil.rmtree(full)
+            except OSError: continue
+            removed.append(name)
+        # Files of a flat, pre-versioning conversion that a version has replaced
+        elif (name == 'meta.json' or name.endswith('.npy')) and os.path.abspath(path) not in keep:
+            try: os.remove(full)
+            except OSError: continue
+            removed.append(name)
+    return removed
+
+
+def _raw_to_npy(raw, dtype):
+    """Turn a raw dump of a 1-D array into an .npy file by prefixing the header; the data is only copied."""
+    dtype = np.dtype(dtype)
+    n = os.path.getsize(raw) // dtype.itemsize
+    with open(raw[:-len('.raw')] + '.npy', 'wb') as out, open(raw, 'rb') as src:
+        np.lib.format.write_array_header_1_0(
+            out, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (n,)})
+        shutil.copyfileobj(src, out, 16 << 20)
+    os.remove(raw)
+
+
+def build_slots_chunked(plates, hashes, path, chunk_rows=SLOT_CHUNK_ROWS):
+    """build_slots for a mapped plates column, into a memory-mapped table at `path`.
+
+    Rows are inserted chunk_rows at a time in row order. A row that probes into a
+    slot holding the same plate (same crc32, same bytes) is a later duplicate and
+    is dropped, so the first occurrence still wins. Returns the unique plate count.
+    """
+    n = len(plates)
+    size = 1 << max(4, int(2 * max(n, 1) - 1).bit_length())
+    mask = size - 1
+    slots = np.lib.format.open_memmap(path, mode='w+', dtype=np.int64, shape=(size,))
+    slots[:] = EMPTY
+    unique = 0
+    for start in range(0, n, chunk_rows):
+        keys = [plates.raw(i) for i in range(start, min(n, start + chunk_rows))]
+        rows = start + np.flatnonzero(~pd.Series(keys).duplicated(keep='first').to_numpy())
+        h = np.asarray(hashes[rows])
+        pos = h & mask
+        while len(rows):
+            occ = slots[pos]
+            free = occ == EMPTY
+            dup = np.zeros(len(rows), dtype=bool)
+            for j in np.flatnonzero(~free & (hashes[np.where(free, 0, occ)] == h)):
+                dup[j] = plates.raw(int(occ[j])) == plates.raw(int(rows[j]))
+            cand = np.flatnonzero(free)
+            _, first_idx = np.unique(pos[cand], return_index=True)
+            won = cand[first_idx]
+            slots[pos[won]] = rows[won]
+            unique += len(won)
+            keep = ~dup
+            keep[won] = False
+            rows, h, pos = rows[keep], h[keep], (pos[keep] + 1) & mask
+    slots.flush()
+    del slots
+    return unique
+
+
+class RegistryWriter:
+    """Writes the columnar registry from DataFrame chunks, one chunk in memory at a time.
+
+    Every array streams to a raw file that close() turns into its .npy. The hash
+    table is then filled from the mapped plates, so it is sized for every row
+    rather than for the unique plates as in write(); lookups are the same.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.tmp = _staging_dir(out_dir)
+        self.rows = 0
+        self.names = None
+        self.expiry_cols = []
+        self._raw = {}   # file name -> (open raw file, dtype)
+        self._ends = {}  # string column -> bytes written so far
+
+    def _file(self, name, dtype):
+        entry = self._raw.get(name)
+        if entry is None:
+            entry = self._raw[name] = (open(os.path.join(self.tmp, name + '.raw'), 'wb'), dtype)
+        return entry[0]
+
+    def _append_strings(self, name, values):
+        encoded = [str(v).encode('utf-8') for v in values]
+        offsets = self._file(name + '.offsets', np.int64)
+        if name not in self._ends:
+            offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+            self._ends[name] = 0
+        ends = self._ends[name] + np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        offsets.write(ends.tobytes())
+        self._file(name + '.data', np.uint8).write(b''.join(encoded))
+        if len(ends): self._ends[name] = int(ends[-1])
+
+    def write(self, df):
+        if df.empty: return
+        if 'Registration_Number' not in df.columns: raise ValueError("no Registration_Number column")
+        columns, plates, expiries, commercial = registry_columns(df)
+        names = [name for name, _ in columns]
+        if self.names is None: self.names, self.expiry_cols = names, list(expiries)
+        elif names != self.names: raise ValueError("chunk columns differ from the first chunk's")
+        for k, (_, values) in enumerate(columns):
+            self._append_strings(f"col_{k}", values)
+        self._append_strings('plates', plates)
+        hashes = np.fromiter((zlib.crc32(p.encode('utf-8')) for p in plates), dtype=np.int64, count=len(plates))
+        self._file('hashes', np.int64).write(hashes.tobytes())
+        for k, col in enumerate(self.expiry_cols):
+            dates, missing = expiries[col]
+            self._file(f"expiry_{k}", 'datetime64[D]').write(np.asarray(dates, dtype='datetime64[D]').tobytes())
+            self._file(f"missing_{k}", bool).write(np.asarray(missing, dtype=bool).tobytes())
+        self._file('commercial', bool).write(np.asarray(commercial, dtype=bool).tobytes())
+        self.rows += len(plates)
+
+    def close(self, source=None, deltas=()):
+        """Finish the files and publish them as out_dir's new version; returns out_dir."""
+        for name, (f, dtype) in self._raw.items():
+            f.close()
+            _raw_to_npy(os.path.join(self.tmp, name + '.raw'), dtype)
+        unique = 0
+        if self.rows:
+            hashes_path = os.path.join(self.tmp, 'hashes.npy')
+            hashes = np.load(hashes_path, mmap_mode='r')
+            unique = build_slots_chunked(_read_strings(os.path.join(self.tmp, 'plates')), hashes,
+                                         os.path.join(self.tmp, 'slots.npy'))
+            del hashes
+            os.remove(hashes_path)
+        meta = {'format_version': FORMAT_VERSION, 'rows': self.rows, 'unique_plates': unique,
+                'columns': self.names or [], 'expiry_columns': self.expiry_cols, 'created_at': time.time()}
+        _publish(self.tmp, self.out_dir, meta, source, deltas)
+        return self.out_dir
+
+
+def meta_path(path):
+    return os.path.join(version_dir(path), 'meta.json')
+
+
+def read_meta(path):
+    with open(meta_path(path)) as f: return json.load(f)
+
+
+def is_current(path, csv_path):
+    """Whether `path` holds a conversion of `csv_path` as it is now."""
+    try: meta = read_meta(path)
+    except (OSError, ValueError): return False
+    src = meta.get('source') or {}
+    if meta.get('format_version') != FORMAT_VERSION: return False
+    if not os.path.exists(csv_path): return True
+    st = os.stat(csv_path)
+    return src.get('size') == st.st_size and src.get('mtime') == st.st_mtime
+
+
+def folded_deltas(path):
+    """(name, size, mtime) of the delta files the live conversion at `path` was recorded to include."""
+    return {(d['name'], d['size'], d['mtime']) for d in read_meta(path).get('folded_deltas', ())}
+
+
+def open_registry(path):
+    """Open the live version of a converted registry memory-mapped; nothing is read until looked up."""
+    for attempt in range(3):
+        vdir = version_dir(path)
+        try:
+            return _open_version(vdir)
+        except FileNotFoundError:
+            # CURRENT moved on and the version it named was collected between the two reads
+            if attempt == 2 or version_dir(path) == vdir: raise
+
+
+def _open_version(path):
+    with open(os.path.join(path, 'meta.json')) as f: meta = json.load(f)
+    n = meta['rows']
+    if not n: return VehicleRegistry([], [], source=path)
+    load = lambda name: _load(os.path.join(path, name))
+    columns = [(name, _read_strings(os.path.join(path, f"col_{k}"))) for k, name in enumerate(meta['columns'])]
+    plates = _read_strings(os.path.join(path, 'plates'))
+    index = MappedIndex(load('slots.npy'), plates, meta['unique_plates'])
+    expiries = {col: (load(f"expiry_{k}.npy"), load(f"missing_{k}.npy"))
+                for k, col in enumerate(meta['expiry_columns'])}
+    return VehicleRegistry(columns, plates, expiries, load('commercial.npy'), index=index, precompute=False,
+                           source=path)
+
+
+def load_registry(csv_path, mapped_path=None):
+    """Mapped registry when a current conversion exists, else the CSV loaded in memory."""
+    mapped_path = mapped_path or os.path.splitext(csv_path)[0] + '.registry'
+    if os.path.isdir(mapped_path):
+        if is_current(mapped_path, csv_path): return open_registry(mapped_path)
+        print(f"{mapped_path} is older than {csv_path}; loading the CSV (re-run registry_store.py)")
+    return VehicleRegistry.from_csv(csv_path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert the vehicle registry CSV to the memory-mapped format")
+    ap.add_argument('csv')
+    ap.add_argument('--out', help="output directory (default: <csv name>.registry next to the CSV)")
+    ap.add_argument('--folded-deltas', nargs='+', default=[], metavar='DELTA',
+                    help="delta CSVs already merged into the CSV; the service will not apply them again")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    out = convert(args.csv, args.out, args.folded_deltas)
+    meta = read_meta(out)
+    print(f"{meta['rows']} rows ({meta['unique_plates']} plates) -> {out} in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
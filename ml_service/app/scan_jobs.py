@@ -0,0 +1,195 @@
+"""Background jobs for video scans submitted to /api/upload_scan.
+
+A job is a MongoDB document in `scan_jobs`, so state survives a restart. Jobs
+run on a fixed number of worker threads fed by a bounded queue. Progress and
+per-plate detections are pushed over Socket.IO to the room named after the job
+id, and the finished job document holds the same payload upload_scan returns.
+
+Every worker detects on the web process's one YOLO model and OCR engine, which
+detection.py serializes, so extra workers only overlap decoding and tracking
+with another job's inference; the default is one.
+
+Several processes (gunicorn workers, replicas) may share the collection. Each
+manager has an owner id and, every JOB_HEARTBEAT_SECONDS, stamps `heartbeat_at`
+on the jobs it holds (queued here or running). A job whose heartbeat is older
+than JOB_STALE_SECONDS belonged to a process that died: any manager takes it
+over with a conditional update, so exactly one re-queues it, and jobs a live
+sibling is running are never touched. Managers look for such jobs at start and
+on every heartbeat.
+"""
+import datetime
+import os
+import queue
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+SCAN_JOB_WORKERS = int(os.getenv('SCAN_JOB_WORKERS', 1))
+SCAN_JOB_QUEUE_MAX = int(os.getenv('SCAN_JOB_QUEUE_MAX', 16))
+# Minimum progress step between Mongo writes / progress events
+PROGRESS_STEP = 0.05
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 15))
+# A job not heartbeaten for this long is taken over
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 60))
+# Longest pause of a worker after a failure outside the runner (Mongo unreachable)
+ERROR_BACKOFF_MAX = 60.0
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ScanJobManager:
+    def __init__(self, collection, socketio, runner, workers=SCAN_JOB_WORKERS, queue_max=SCAN_JOB_QUEUE_MAX,
+                 heartbeat_seconds=JOB_HEARTBEAT_SECONDS, stale_seconds=JOB_STALE_SECONDS):
+        # runner(job_doc, progress) -> payload dict; progress(fraction, detection=None)
+        self.col = collection
+        self.socketio = socketio
+        self.runner = runner
+        self.workers = workers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._held = set()  # job ids queued here or running here; these get the heartbeat
+        self._held_lock = threading.Lock()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the workers and the heartbeat, and take over jobs a dead process left unfinished."""
+        with self._start_lock:
+            if self._threads: return
+            for n in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"scan-job-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._heartbeat, name="scan-job-heartbeat", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._recover()
+
+    def _hold(self, job_id, held=True):
+        with self._held_lock:
+            if held: self._held.add(job_id)
+            else: self._held.discard(job_id)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                with self._held_lock: held = list(self._held)
+                if held:
+                    self.col.update_many({"job_id": {"$in": held}, "status": {"$in": [QUEUED, RUNNING]}},
+                                         {"$set": {"heartbeat_at": datetime.datetime.now()}})
+                self._recover()
+            except Exception:
+                traceback.print_exc()
+
+    def _recover(self):
+        """Take over and re-queue the jobs whose owner stopped heartbeating."""
+        stale = datetime.datetime.now() - datetime.timedelta(seconds=self.stale_seconds)
+        for job in self.col.find({"status": {"$in": [QUEUED, RUNNING]},
+                                  "$or": [{"heartbeat_at": {"$lt": stale}}, {"heartbeat_at": {"$exists": False}}]}
+                                 ).sort("created_at", 1):
+            if self._queue.full(): return  # the rest waits for a later heartbeat
+            # Conditional on the stale heartbeat read above: of several recovering managers one wins
+            job = self.col.find_one_and_update(
+                {"job_id": job['job_id'], "status": job['status'], "heartbeat_at": job.get('heartbeat_at')},
+                {"$set": {"status": QUEUED, "progress": 0.0, "owner": self.owner,
+                          "heartbeat_at": datetime.datetime.now()}})
+            if not job: continue
+            if not os.path.exists(job.get('file_path', '')):
+                self._finish(job, FAILED, error='Interrupted by a service restart')
+                continue
+            self._hold(job['job_id'])
+            try:
+                self._queue.put_nowait(job['job_id'])
+            except queue.Full:
+                # Filled up meanwhile; drop the claim so a later heartbeat retries it
+                self._hold(job['job_id'], False)
+
+    def submit(self, file_path, **fields):
+        """Queue a scan of `file_path`; `fields` are stored on the job for the runner."""
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = datetime.datetime.now()
+        doc = dict(fields, job_id=job_id, file_path=file_path, status=QUEUED, progress=0.0,
+                   detections=[], created_at=now, owner=self.owner, heartbeat_at=now)
+        self._hold(job_id)
+        self.col.insert_one(doc)
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            self._hold(job_id, False)
+            self.col.delete_one({"job_id": job_id})
+            raise QueueFull()
+        return job_id
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def get(self, job_id):
+        return self.col.find_one({"job_id": job_id}, {"_id": 0, "file_path": 0})
+
+    def _emit(self, event, payload, job_id):
+        try:
+            self.socketio.emit(event, payload, to=job_id)
+        except Exception as e:
+            print(f"Scan job emit failed: {e}")
+
+    def _work(self):
+        backoff = 0.0
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+                backoff = 0.0
+            except Exception:
+                # Claiming or recording the job failed (Mongo unreachable). The job is no
+                # longer heartbeaten, so it is taken over once stale; this worker carries on.
+                traceback.print_exc()
+                backoff = min(max(1.0, backoff * 2), ERROR_BACKOFF_MAX)
+                time.sleep(backoff)
+            finally:
+                self._hold(job_id, False)
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        job = self.col.find_one_and_update({"job_id": job_id, "status": QUEUED, "owner": self.owner},
+                                           {"$set": {"status": RUNNING, "started_at": datetime.datetime.now(),
+                                                     "heartbeat_at": datetime.datetime.now()}})
+        if not job: return
+        last = [0.0]
+
+        def progress(fraction, detection=None):
+            update = {}
+            if detection is not None:
+                update["$push"] = {"detections": detection}
+                self._emit('scan_job_plate', dict(detection, job_id=job_id), job_id)
+            if fraction - last[0] >= PROGRESS_STEP or fraction >= 1.0:
+                last[0] = fraction
+                update["$set"] = {"progress": round(fraction, 3)}
+                self._emit('scan_job_progress', {'job_id': job_id, 'progress': round(fraction, 3)}, job_id)
+            if update: self.col.update_one({"job_id": job_id}, update)
+
+        try:
+            result = self.runner(job, progress)
+            self._finish(job, DONE, result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, FAILED, error=str(e))
+
+    def _finish(self, job, status, result=None, error=None):
+        fields = {"status": status, "finished_at": datetime.datetime.now()}
+        if status == DONE: fields.update(progress=1.0, result=result)
+        if error: fields["error"] = error
+        self.col.update_one({"job_id": job['job_id']}, {"$set": fields})
+        path = job.get('file_path')
+        if path and os.path.exists(path): os.remove(path)
+        self._emit('scan_job_done', {'job_id': job['job_id'], 'status': status, 'result': result, 'error': error}, job['job_id'])
@@ -0,0 +1,165 @@
+"""Versioned MongoDB schema: the indexes the routes rely on, applied at startup or from the CLI.
+
+Each migration declares indexes; `apply_schema` creates the ones above the
+version recorded in `schema_meta` and bumps it. Creating an index that already
+exists with the same spec is a no-op, so re-running is safe. An index a later
+migration drops is never created, so a fresh database or --reapply does not
+build it only to drop it again. `check_plans` runs `explain()` on the hot
+queries and reports any that do not use an index; the app runs it after
+migrating (SCHEMA_CHECK_PLANS) and logs a warning per route that would scan.
+
+    python schema.py            # apply pending migrations
+    python schema.py --reapply  # also re-create indexes of applied migrations
+    python schema.py --check    # apply, then verify query plans (exit 1 on a collection scan)
+"""
+import argparse
+import datetime
+import os
+import sys
+
+META_COLLECTION = 'schema_meta'
+SCHEMA_CHECK_PLANS = os.getenv('SCHEMA_CHECK_PLANS', 'True') == 'True'
+# pymongo.ASCENDING / DESCENDING, so migrations can be read without pymongo installed
+ASCENDING, DESCENDING = 1, -1
+
+# (version, description, [(collection, keys, options)]); keys=None drops the index named in options
+MIGRATIONS = [
+    (1, "challan lookups, vehicle search and capture feed", [
+        ('challans', [("challan_id", ASCENDING)], {'name': 'challan_id_unique', 'unique': True}),
+        ('challans', [("plate_number", ASCENDING), ("status", ASCENDING), ("issue_timestamp", DESCENDING)],
+         {'name': 'plate_status_issued'}),
+        ('challans', [("issue_timestamp", DESCENDING), ("_id", DESCENDING)], {'name': 'issued_desc'}),
+        ('captures', [("timestamp", DESCENDING), ("_id", DESCENDING)], {'name': 'timestamp_desc'}),
+    ]),
+    (2, "scan job and email outbox queues", [
+        ('scan_jobs', [("job_id", ASCENDING)], {'name': 'job_id_unique', 'unique': True}),
+        ('scan_jobs', [("status", ASCENDING), ("created_at", ASCENDING)], {'name': 'status_created'}),
+        ('email_outbox', [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {'name': 'status_next_attempt'}),
+    ]),
+    (3, "keyset pagination of vehicle search on (issue_timestamp, _id)", [
+        ('challans', [("plate_number", ASCENDING), ("status", ASCENDING), ("issue_timestamp", DESCENDING),
+                      ("_id", DESCENDING)], {'name': 'plate_status_issued_id'}),
+        ('challans', None, {'name': 'plate_status_issued'}),  # superseded by the index above
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(db):
+    meta = db[META_COLLECTION].find_one({"_id": "schema"})
+    return meta['version'] if meta else 0
+
+
+# Index names dropped by some migration: not worth creating on the way to the latest version
+SUPERSEDED = {options['name'] for _, _, indexes in MIGRATIONS for _, keys, options in indexes if keys is None}
+
+
+def _apply_index(col, keys, options):
+    if keys is not None:
+        if options['name'] not in SUPERSEDED: col.create_index(keys, **options)
+    elif options['name'] in col.index_information():
+        col.drop_index(options['name'])
+
+
+def apply_schema(db, reapply=False, log=print):
+    """Apply migrations newer than the recorded version; returns the resulting version.
+
+    reapply=True also re-creates the indexes of already applied migrations
+    (for example after one was dropped by hand).
+    """
+    version = current_version(db)
+    for target, description, indexes in MIGRATIONS:
+        if target <= version:
+            if reapply:
+                for col, keys, options in indexes: _apply_index(db[col], keys, options)
+            continue
+        for col, keys, options in indexes:
+            _apply_index(db[col], keys, options)
+        db[META_COLLECTION].update_one({"_id": "schema"},
+                                       {"$set": {"version": target, "applied_at": datetime.datetime.now()}},
+                                       upsert=True)
+        version = target
+        log(f"Schema migrated to v{target}: {description}")
+    return version
+
+
+# route -> command explained against the live collections; mirrors the queries in app.py
+def _find(col, filter, sort=None, limit=0):
+    cmd = {"find": col, "filter": filter}
+    if sort: cmd["sort"] = sort
+    if limit: cmd["limit"] = limit
+    return cmd
+
+
+QUERY_PLANS = {
+    'get_challan_api': _find('challans', {"challan_id": "ECH-000000"}, limit=1),
+    'search_challans_by_vehicle': _find('challans', {"plate_number": "DL01AB1234", "status": "Pending"},
+                                        sort={"issue_timestamp": -1, "_id": -1}, limit=51),
+    'pay_challan_api': {"update": 'challans', "updates": [
+        {"q": {"challan_id": "ECH-000000"}, "u": {"$set": {"status": "Paid"}}}]},
+    'recent_captures': _find('captures', {}, sort={"timestamp": -1, "_id": -1}, limit=51),
+    'dashboard': _find('challans', {}, sort={"issue_timestamp": -1}, limit=10),
+    'dashboard_stats': _find('challans', {"issue_timestamp": {"$gte": datetime.datetime(2000, 1, 1)}},
+                             sort={"issue_timestamp": -1, "_id": -1}, limit=51),
+}
+
+
+def _stages(plan):
+    """Every stage name in an explain plan tree (classic and slot-based engine layouts)."""
+    if isinstance(plan, dict):
+        if 'stage' in plan: yield plan['stage']
+        for v in plan.values(): yield from _stages(v)
+    elif isinstance(plan, list):
+        for v in plan: yield from _stages(v)
+
+
+def check_plans(db):
+    """Returns {route: (ok, [stages])}; ok means an index scan and no collection scan or in-memory sort."""
+    out = {}
+    for route, cmd in QUERY_PLANS.items():
+        explained = db.command("explain", cmd, verbosity="queryPlanner")
+        stages = list(_stages(explained.get('queryPlanner', {}).get('winningPlan', {})))
+        indexed = any(s in ('IXSCAN', 'IDHACK', 'EXPRESS_IXSCAN') for s in stages)
+        out[route] = (indexed and 'COLLSCAN' not in stages and 'SORT' not in stages, stages)
+    return out
+
+
+def warn_unindexed(db, log=print):
+    """Runs check_plans and logs each route whose query would not use an index; returns those routes."""
+    try:
+        plans = check_plans(db)
+    except Exception as e:  # e.g. a server or user without the explain command
+        log(f"Query plan check skipped: {e}")
+        return []
+    failed = [route for route, (ok, _) in plans.items() if not ok]
+    for route in failed:
+        log(f"WARNING: {route} query does not use an index ({' > '.join(plans[route][1])}); "
+            f"run python schema.py --reapply --check")
+    return failed
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    ap.add_argument('--db', default=os.getenv('DATABASE_NAME', 'echallan_system'))
+    ap.add_argument('--reapply', action='store_true', help='re-create indexes of applied migrations too')
+    ap.add_argument('--check', action='store_true', help='verify query plans with explain()')
+    args = ap.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+    version = apply_schema(db, reapply=args.reapply)
+    print(f"Schema at v{version} (latest v{SCHEMA_VERSION})")
+    if not args.check: return 0
+    failed = 0
+    for route, (ok, stages) in check_plans(db).items():
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {route:28s} {' > '.join(stages)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""IoU/centroid tracker for YOLO plate boxes.
+
+Boxes are matched to existing tracks by IoU, falling back to centroid distance
+for plates that moved more than their own size between sampled frames. Each
+track collects a few OCR reads and votes on the text, so callers make one
+capture/challan decision per vehicle instead of one per frame.
+"""
+import os
+
+TRACK_IOU_THRESHOLD = float(os.getenv('TRACK_IOU_THRESHOLD', 0.3))
+# Sampled frames a track may go unseen before it is closed
+TRACK_MAX_AGE = int(os.getenv('TRACK_MAX_AGE', 6))
+# OCR reads per track, and how many identical reads settle the text early
+TRACK_MAX_READS = int(os.getenv('TRACK_MAX_READS', 3))
+TRACK_VOTE_QUORUM = int(os.getenv('TRACK_VOTE_QUORUM', 2))
+# Centroid match radius, in multiples of the track's box width
+CENTROID_RATIO = 1.0
+# Re-read a track after this many frames even if its box did not improve
+READ_GAP = 3
+
+
+def iou(a, b):
+    ix1, iy1, ix2, iy2 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0: return 0.0
+    area = lambda r: max(0, r[2] - r[0]) * max(0, r[3] - r[1])
+    return inter / float(area(a) + area(b) - inter)
+
+
+def _centroid(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class Track:
+    def __init__(self, track_id, box, conf, frame_id):
+        self.id = track_id
+        self.box = box
+        self.first_seen = self.last_seen = frame_id
+        self.hits = 1
+        self.max_conf = conf
+        self.votes = {}  # text -> [count, best detection conf]
+        self.reads = 0
+        self.last_read_frame = None
+        self.last_read_conf = 0.0
+        self.evidence = {}  # text -> (frame, crop, box, frame boxes) of its best read
+        self.decided = False
+
+    @property
+    def text(self):
+        if not self.votes: return None
+        return max(self.votes.items(), key=lambda kv: (kv[1][0], kv[1][1]))[0]
+
+    @property
+    def conf(self):
+        t = self.text
+        return self.votes[t][1] if t else 0.0
+
+    def confirmed(self, quorum=TRACK_VOTE_QUORUM):
+        t = self.text
+        return t is not None and self.votes[t][0] >= quorum
+
+
+class PlateTracker:
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_age=TRACK_MAX_AGE,
+                 max_reads=TRACK_MAX_READS, quorum=TRACK_VOTE_QUORUM):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.max_reads = max_reads
+        self.quorum = quorum
+        self.tracks = {}
+        self._next_id = 1
+        self.stats = {'tracks': 0, 'detections': 0, 'ocr_reads': 0}
+
+    def update(self, frame_id, detections):
+        """detections: list of (box, conf) for one frame.
+
+        Returns (assignments, expired): a (track, detection index) pair for every
+        detection, and the tracks closed because they were not seen for max_age frames.
+        """
+        self.stats['detections'] += len(detections)
+        live = list(self.tracks.values())
+        pairs = []
+        for ti, t in enumerate(live):
+            cx, cy = _centroid(t.box)
+            radius = CENTROID_RATIO * max(1, t.box[2] - t.box[0])
+            for di, (box, _) in enumerate(detections):
+                score = iou(t.box, box)
+                if score < self.iou_threshold:
+                    dx, dy = _centroid(box)
+                    dist = ((cx - dx) ** 2 + (cy - dy) ** 2) ** 0.5
+                    if dist > radius: continue
+                    # Below any IoU match, closer centroids first
+                    score = -dist / radius
+                pairs.append((score, ti, di))
+        pairs.sort(reverse=True)
+
+        used_t, used_d, assignments = set(), set(), []
+        for _, ti, di in pairs:
+            if ti in used_t or di in used_d: continue
+            used_t.add(ti); used_d.add(di)
+            t = live[ti]
+            box, conf = detections[di]
+            t.box, t.last_seen = box, frame_id
+            t.hits += 1
+            t.max_conf = max(t.max_conf, conf)
+            assignments.append((t, di))
+        for di, (box, conf) in enumerate(detections):
+            if di in used_d: continue
+            t = Track(self._next_id, box, conf, frame_id)
+            self._next_id += 1
+            self.tracks[t.id] = t
+            self.stats['tracks'] += 1
+            assignments.append((t, di))
+
+        expired = [t for t in self.tracks.values() if frame_id - t.last_seen > self.max_age]
+        for t in expired: del self.tracks[t.id]
+        return assignments, expired
+
+    def claim_read(self, track, conf, frame_id):
+        """Whether this sighting of `track` is worth an OCR call; if so, count it now.
+
+        Claiming up front keeps a batch of frames from queueing more than
+        max_reads crops of the same track before any result has come back.
+        """
+        if track.reads >= self.max_reads or track.confirmed(self.quorum): return False
+        if track.reads and conf <= track.last_read_conf and frame_id - track.last_read_frame < READ_GAP:
+            return False
+        self.stats['ocr_reads'] += 1
+        track.reads += 1
+        track.last_read_frame, track.last_read_conf = frame_id, conf
+        return True
+
+    def add_vote(self, track, text, conf, evidence=None):
+        """Record the OCR result of a claimed read."""
+        if not text: return
+        vote = track.votes.setdefault(text, [0, 0.0])
+        vote[0] += 1
+        if conf > vote[1]:
+            vote[1] = conf
+            if evidence is not None: track.evidence[text] = evidence
+
+    def finish(self):
+        """Close and return every remaining track (end of a video)."""
+        rest = list(self.tracks.values())
+        self.tracks.clear()
+        return rest
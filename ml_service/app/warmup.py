@@ -0,0 +1,106 @@
+"""Startup phase timing and the opt-in model warm-up behind /api/health readiness.
+
+With WARM_START=True the service loads YOLO and the OCR engine in the
+background right after it starts listening and runs one dummy inference through
+each, at the sizes real requests use. Until that finishes /api/health answers 503, so a load
+balancer only routes traffic to workers that will not pay model loading and
+first-inference setup on a user request. With an inference pool
+(INFERENCE_WORKERS) the models live in the worker processes, which load them
+as they start, so there is nothing to warm here and readiness waits on the pool
+instead.
+"""
+import contextlib
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+WARM_START = os.getenv('WARM_START', 'False') == 'True'
+# Dummy frame for the YOLO warm-up (the camera/upload size; YOLO letterboxes it to its input size)
+WARMUP_FRAME_SIZE = (int(os.getenv('WARMUP_FRAME_WIDTH', 1280)), int(os.getenv('WARMUP_FRAME_HEIGHT', 720)))
+
+COLD, WARMING, READY, FAILED = 'cold', 'warming', 'ready', 'failed'
+
+
+class Startup:
+    """Per-phase startup timings plus the readiness flag /api/health reports."""
+
+    def __init__(self, warm=WARM_START):
+        self.warm = warm
+        self.started_at = time.time()
+        self.phases = {}  # phase -> seconds, in the order they ran
+        self.state = COLD if warm else READY
+        self.error = None
+        self.ready_at = None if warm else self.started_at
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock: self.phases[name] = round(time.perf_counter() - t0, 3)
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def report(self):
+        with self._lock: phases = dict(self.phases)
+        out = {'state': self.state, 'warm_start': self.warm, 'phases': phases,
+               'total_s': round(sum(phases.values()), 3)}
+        if self.ready_at: out['ready_after_s'] = round(self.ready_at - self.started_at, 3)
+        if self.error: out['error'] = self.error
+        return out
+
+    def summary(self):
+        return ", ".join(f"{name} {secs:.2f}s" for name, secs in self.phases.items())
+
+    # --- Warm-up ---
+    def start_warmup(self):
+        """Run warm_up on a background thread (no-op unless warm start is on)."""
+        if not self.warm or self.state != COLD: return
+        from inference_pool import INFERENCE_WORKERS
+        if INFERENCE_WORKERS > 0:
+            self.ready_at = time.time()
+            self.state = READY
+            return
+        self.state = WARMING
+        threading.Thread(target=self._warm, name='warmup', daemon=True).start()
+
+    def _warm(self):
+        try:
+            warm_up(self)
+            self.ready_at = time.time()
+            self.state = READY
+            print(f"Warm start complete: {self.summary()}")
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e)
+            self.state = FAILED
+
+
+def warm_up(startup):
+    """Load both models and push one dummy input through each, timing every phase."""
+    from detection import DETECT_BATCH_SIZE, get_ocr_engine, get_ocr_stage, get_yolo_model, yolo_lock
+    from ocr_stage import OCR_INPUT_SIZE, PlateCandidate
+
+    w, h = WARMUP_FRAME_SIZE
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    with startup.phase('yolo_load'):
+        model = get_yolo_model()
+    # Cameras and scan jobs may already be detecting on the same model
+    with startup.phase('yolo_warmup'), yolo_lock:
+        model(frame, verbose=False)
+    # Uploaded videos run batched; the first batch of that shape has its own setup cost
+    if DETECT_BATCH_SIZE > 1:
+        with startup.phase('yolo_warmup_batch'), yolo_lock:
+            model([frame] * DETECT_BATCH_SIZE, verbose=False)
+    with startup.phase('ocr_load'):
+        get_ocr_engine()
+    crop = np.full((OCR_INPUT_SIZE[1], OCR_INPUT_SIZE[0], 3), 255, dtype=np.uint8)
+    with startup.phase('ocr_warmup'):
+        get_ocr_stage().read([[PlateCandidate(1.0, (0, 0, crop.shape[1], crop.shape[0]), crop)]])
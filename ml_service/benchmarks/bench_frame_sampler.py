@@ -0,0 +1,74 @@
+"""Uploaded-video sampling cost: reading every frame vs. FrameSampler's grab and seek paths.
+
+    python benchmarks/bench_frame_sampler.py --video clip.mp4 --fps 6 2 1 0.5 0.2
+
+For each sampling rate the sampler runs three times: grabbing through every
+gap, seeking across every gap, and as configured (seeking from SCAN_SEEK_MIN_GAP
+on). The configured rows should fall with the sampled-frame count once the step
+passes SCAN_SEEK_MIN_GAP, and never be slower than the better of the other two. Grabbing still decodes each frame (it only skips the
+colour conversion and copy of unsampled ones); a seek lands on the previous
+keyframe and decodes forward, so it only wins once gaps span keyframes. That
+crossover is where SCAN_SEEK_MIN_GAP belongs. Without --video a 60 s 720p clip
+is synthesized.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from frame_sampler import FrameSampler, SEEK_MIN_GAP  # noqa: E402
+
+
+def make_clip(path, seconds=60, fps=30):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (1280, 720))
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8), (15, 15), 0)
+    for i in range(seconds * fps): out.write(np.roll(base, i * 4, axis=1))
+    out.release()
+
+
+def read_all(path, retrieve):
+    cap = cv2.VideoCapture(path)
+    n = 0
+    while cap.read()[0] if retrieve else cap.grab(): n += 1
+    cap.release()
+    return n
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--video')
+    ap.add_argument('--fps', type=float, nargs='+', default=[6, 2, 1, 0.5, 0.2], help="sampling rates to compare")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.video
+        if not path:
+            path = os.path.join(tmp, 'clip.mp4')
+            make_clip(path)
+        secs, n = timed(lambda: read_all(path, True))
+        print(f"{'':>28} {'seconds':>8} {'sampled':>8} {'grabbed':>8} {'seeks':>6}")
+        print(f"{'read every frame':>28} {secs:8.2f} {n:8d} {n:8d} {0:6d}")
+        secs, n = timed(lambda: read_all(path, False))
+        print(f"{'grab every frame':>28} {secs:8.2f} {0:8d} {n:8d} {0:6d}")
+        for fps in args.fps:
+            for label, gap in (('grab', 10 ** 9), ('seek', 1), ('default', SEEK_MIN_GAP)):
+                sampler = FrameSampler(path, sample_fps=fps, seek_min_gap=gap)
+                secs, k = timed(lambda: sum(1 for _ in sampler))
+                s = sampler.stats
+                print(f"{f'{fps:g} fps, step {sampler.step}, {label}':>28} {secs:8.2f} {k:8d} {s['grabbed']:8d} {s['seeks']:6d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Plate detector accuracy vs. latency across inference backends.
+
+    python benchmarks/bench_inference_backends.py --images samples/
+    python benchmarks/bench_inference_backends.py --images samples/ --labels samples/labels --ocr
+
+Runs every exported backend (see app/inference.py) over a folder of plate
+images and reports per-image latency (median and p95, model load and first call
+excluded) next to detection accuracy. With --labels (YOLO-format .txt files
+named like the images) boxes are scored against ground truth; otherwise against
+the first backend listed (PyTorch by default), which measures how much an
+export or quantization changes the detector. --ocr also compares the plate text
+read from each backend's boxes.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+import inference  # noqa: E402
+
+CONF = 0.3  # detection._plate_candidates' threshold
+IOU_MATCH = 0.5
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(pred, truth):
+    """Greedy IoU matching, highest confidence first; returns (true positives, IoUs of the matches)."""
+    used, tp, ious = set(), 0, []
+    for box in pred:
+        best, best_j = IOU_MATCH, None
+        for j, t in enumerate(truth):
+            if j not in used and iou(box, t) >= best: best, best_j = iou(box, t), j
+        if best_j is not None:
+            used.add(best_j)
+            tp += 1
+            ious.append(best)
+    return tp, ious
+
+
+def read_labels(path, shape):
+    """YOLO txt (class cx cy w h, normalized) -> xyxy pixel boxes."""
+    if not os.path.exists(path): return []
+    h, w = shape[:2]
+    boxes = []
+    for line in open(path):
+        parts = line.split()
+        if len(parts) < 5: continue
+        cx, cy, bw, bh = (float(v) for v in parts[1:5])
+        boxes.append(((cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h))
+    return boxes
+
+
+def run_backend(model, frames, repeat):
+    """Boxes (conf-sorted, above CONF) and per-image latencies in ms."""
+    model(frames[0], verbose=False)
+    boxes, times = [], []
+    for fr in frames:
+        best, res = float('inf'), None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            res = model(fr, verbose=False)
+            best = min(best, time.perf_counter() - t0)
+        times.append(best * 1000)
+        b = res[0].boxes.cpu().numpy()
+        keep = [(float(c), tuple(float(v) for v in xy)) for xy, c in zip(b.xyxy, b.conf) if c > CONF]
+        boxes.append([xy for _, xy in sorted(keep, reverse=True)])
+    return boxes, np.array(times)
+
+
+def plate_texts(frames, boxes):
+    """Text of the top box that reads per image, via the service's OCR stage."""
+    from detection import get_ocr_stage
+    from ocr_stage import PlateCandidate
+
+    cands = []
+    for fr, bs in zip(frames, boxes):
+        h, w = fr.shape[:2]
+        fc = []
+        for x1, y1, x2, y2 in (tuple(int(v) for v in b) for b in bs):
+            crop = fr[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+            if crop.size: fc.append(PlateCandidate(1.0, (x1, y1, x2, y2), crop))
+        cands.append(fc)
+    return [text for text, _, _, _ in get_ocr_stage().read(cands)]
+
+
+def artifact_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--images', required=True, help="folder of sample plate images")
+    ap.add_argument('--labels', help="folder of YOLO .txt labels; default compares against the first backend")
+    ap.add_argument('--backends', nargs='+', default=list(inference.BACKENDS), choices=inference.BACKENDS)
+    ap.add_argument('--limit', type=int, default=200)
+    ap.add_argument('--repeat', type=int, default=3, help="timed runs per image (best is kept)")
+    ap.add_argument('--ocr', action='store_true', help="also compare plate text read from each backend's boxes")
+    args = ap.parse_args()
+
+    loaded = [(p, cv2.imread(p)) for p in inference.image_files(args.images, args.limit)]
+    paths, frames = [p for p, f in loaded if f is not None], [f for _, f in loaded if f is not None]
+    if not frames: sys.exit(f"no images in {args.images}")
+    if args.labels:
+        truth = [read_labels(os.path.join(args.labels, os.path.splitext(os.path.basename(p))[0] + '.txt'), f.shape)
+                 for p, f in zip(paths, frames)]
+
+    backends = [b for b in args.backends if os.path.exists(inference.backend_path(b))]
+    for b in args.backends:
+        if b not in backends: print(f"skipping {b}: {inference.backend_path(b)} not exported")
+    if not backends: sys.exit("no backends available")
+
+    ref_name = 'labels' if args.labels else backends[0]
+    print(f"{len(frames)} images, accuracy vs. {ref_name}")
+    print(f"{'backend':>14} {'size MB':>8} {'p50 ms':>7} {'p95 ms':>7} {'img/s':>6} "
+          f"{'precision':>9} {'recall':>7} {'mean IoU':>8}" + (f" {'text agree':>10}" if args.ocr else ''))
+    ref_boxes = ref_texts = None
+    for b in backends:
+        model = inference.load_model(b, fallback=False)
+        boxes, times = run_backend(model, frames, args.repeat)
+        reference = truth if args.labels else (ref_boxes if ref_boxes is not None else boxes)
+        tp = n_pred = n_true = 0
+        ious = []
+        for pred, ref in zip(boxes, reference):
+            t, i = match(pred, ref)
+            tp, n_pred, n_true = tp + t, n_pred + len(pred), n_true + len(ref)
+            ious += i
+        line = (f"{b:>14} {artifact_mb(inference.backend_path(b)):8.1f} {np.median(times):7.1f} "
+                f"{np.percentile(times, 95):7.1f} {1000 / times.mean():6.1f} {tp / max(n_pred, 1):9.3f} "
+                f"{tp / max(n_true, 1):7.3f} {np.mean(ious) if ious else 0.0:8.3f}")
+        if args.ocr:
+            texts = plate_texts(frames, boxes)
+            ref_texts = ref_texts or texts
+            agree = np.mean([a == r for a, r in zip(texts, ref_texts)])
+            line += f" {agree:10.3f}"
+        print(line)
+        if ref_boxes is None: ref_boxes = boxes
+
+
+if __name__ == '__main__':
+    main()
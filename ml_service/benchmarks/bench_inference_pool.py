@@ -0,0 +1,67 @@
+"""detect_plate_from_image throughput: in-process vs. the shared-memory worker pool.
+
+    python benchmarks/bench_inference_pool.py --images samples/ --workers 1 2 4 --clients 8
+
+--clients threads call detect_plate_from_image concurrently, as request
+handlers would. The in-process row runs them against the web process's models;
+the pool rows submit to InferencePool and also report per-worker utilization.
+Frames come from --images or are random 1280x720 noise.
+"""
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+import detection  # noqa: E402
+from inference_pool import InferencePool  # noqa: E402
+
+
+def load_frames(folder, n):
+    if folder:
+        names = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        frames = [f for f in (cv2.imread(os.path.join(folder, x)) for x in names[:n]) if f is not None]
+        if frames: return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def run(call, frames, clients):
+    t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(clients) as ex:
+        list(ex.map(call, frames))
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--images')
+    ap.add_argument('--frames', type=int, default=64)
+    ap.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    ap.add_argument('--clients', type=int, default=8)
+    args = ap.parse_args()
+
+    frames = load_frames(args.images, args.frames)
+    print(f"{len(frames)} frames, {args.clients} concurrent clients")
+    print(f"{'workers':>8} {'frames/s':>9} {'utilization':>30}")
+    # Pools first, so the forkserver starts before this process has loaded torch
+    for w in args.workers:
+        pool = InferencePool(workers=w).start()
+        try:
+            pool.detect(frames[0])
+            pool.reset_stats()
+            rate = run(pool.detect, frames, args.clients)
+            util = ' '.join(f"{x['utilization']:.2f}" for x in pool.snapshot()['workers'])
+            print(f"{w:>8} {rate:9.2f} {util:>30}")
+        finally:
+            pool.close()
+    detection.detect_plate_local(frames[0])
+    print(f"{'in-proc':>8} {run(detection.detect_plate_local, frames, args.clients):9.2f} {'-':>30}")
+
+
+if __name__ == '__main__':
+    main()
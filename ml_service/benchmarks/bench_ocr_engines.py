@@ -0,0 +1,92 @@
+"""OCR engines on plate crops: per-crop latency and exact-match accuracy.
+
+    python benchmarks/bench_ocr_engines.py --crops test_crops/
+    python benchmarks/bench_ocr_engines.py --crops test_crops/ --labels labels.csv --engines plate easyocr easyocr+grammar
+
+--crops is a folder of plate crops (as YOLO cuts them). Ground truth comes from
+--labels (CSV of filename,text) or else from the file names: MH12AB1234.jpg or
+MH12AB1234_7.png. Engines: `easyocr`, `easyocr+grammar` (EasyOCR output repaired
+with plate_ocr.correct_plate_text) and `plate` (plate_ocr.PlateRecognizer).
+Latency is per crop at batch size 1 (engine load and first call excluded); the
+batched column is crops/sec through read_batch at OCR_BATCH_SIZE.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from ocr_stage import OCR_BATCH_SIZE, EasyOcrEngine  # noqa: E402
+from plate_ocr import label_of  # noqa: E402
+
+ENGINES = ('easyocr', 'easyocr+grammar', 'plate')
+
+
+def make_engine(name):
+    if name == 'plate':
+        from plate_ocr import PlateRecognizer
+        return PlateRecognizer()
+    from detection import get_ocr_reader
+    return EasyOcrEngine(get_ocr_reader(), grammar=name == 'easyocr+grammar')
+
+
+def load_crops(folder, labels_csv=None, limit=None):
+    labels = {}
+    if labels_csv:
+        with open(labels_csv, newline='') as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0] != 'filename': labels[row[0]] = row[1].replace(' ', '').upper()
+    crops = []
+    for name in sorted(os.listdir(folder)):
+        text = labels.get(name) if labels_csv else label_of(name)
+        if not text: continue
+        img = cv2.imread(os.path.join(folder, name))
+        if img is not None: crops.append((name, img, text))
+    return crops[:limit]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--crops', required=True)
+    ap.add_argument('--labels', help="CSV of filename,text (default: text from file names)")
+    ap.add_argument('--engines', nargs='+', default=list(ENGINES), choices=ENGINES)
+    ap.add_argument('--limit', type=int)
+    ap.add_argument('--errors', type=int, default=0, help="print up to N misreads per engine")
+    args = ap.parse_args()
+
+    crops = load_crops(args.crops, args.labels, args.limit)
+    if not crops: sys.exit(f"no labelled crops in {args.crops}")
+    print(f"{len(crops)} crops")
+    print(f"{'engine':>16} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'batched/s':>10} {'exact':>6} {'char acc':>8}")
+    for name in args.engines:
+        t0 = time.perf_counter()
+        engine = make_engine(name)
+        t_load = time.perf_counter() - t0
+        images = [engine.prepare(img) for _, img, _ in crops]
+        engine.read_batch(images[:1])
+        texts, times = [], []
+        for im in images:
+            t0 = time.perf_counter()
+            texts.extend(engine.read_batch([im]))
+            times.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        for start in range(0, len(images), OCR_BATCH_SIZE): engine.read_batch(images[start:start + OCR_BATCH_SIZE])
+        batched = len(images) / (time.perf_counter() - t0)
+        truth = [t for _, _, t in crops]
+        exact = np.mean([a == b for a, b in zip(texts, truth)])
+        # Position-wise agreement over the longer string; rewards near-misses exact match does not
+        chars = sum(sum(x == y for x, y in zip(a, b)) for a, b in zip(texts, truth))
+        total = sum(max(len(a), len(b)) for a, b in zip(texts, truth))
+        print(f"{name:>16} {t_load:7.2f} {np.median(times):7.2f} {np.percentile(times, 95):7.2f} "
+              f"{batched:10.1f} {exact:6.3f} {chars / max(total, 1):8.3f}")
+        misses = [(n, t, r) for (n, _, t), r in zip(crops, texts) if t != r]
+        for n, t, r in misses[:args.errors]:
+            print(f"{'':>16} {n}: expected {t}, read {r or '-'}")
+
+
+if __name__ == '__main__':
+    main()
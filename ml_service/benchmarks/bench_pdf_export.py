@@ -0,0 +1,70 @@
+"""Bulk challan export throughput: PDFs/sec by worker count.
+
+    python benchmarks/bench_pdf_export.py --challans 400 --workers 0 1 2 4 8
+
+Challans are synthetic and share a few full-HD evidence photos written to a
+temporary app dir, so no MongoDB is needed. The ZIP stream is consumed and
+discarded. The in-process row is a bare render loop, for reference; workers 0 is
+the export's own in-process path (the default).
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from bulk_export import export_zip  # noqa: E402
+from challan_pdf import ChallanPdfRenderer  # noqa: E402
+from synthetic import plate_numbers  # noqa: E402
+
+VIOLATIONS = ['Expired PUC', 'Expired Insurance, Expired PUC', 'Expired RC, No Permit', 'Unpaid Road Tax']
+
+
+def make_challans(n, app_dir, photos=8, seed=0):
+    rng = np.random.default_rng(seed)
+    uploads = os.path.join(app_dir, 'static', 'uploads')
+    os.makedirs(uploads, exist_ok=True)
+    for k in range(photos):
+        img = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(uploads, f"bench_{k}.jpg"), cv2.GaussianBlur(img, (9, 9), 0))
+    plates = plate_numbers(n)
+    now = datetime.datetime.now()
+    return [{
+        "challan_id": f"ECH-{i:06d}", "plate_number": plates[i], "owner_name": "Bench Owner",
+        "location": "DELHI ZONE 04 - TECH PARK", "violation_type": VIOLATIONS[i % len(VIOLATIONS)],
+        "fine_amount": float(rng.integers(1, 20) * 1000), "issue_timestamp": now - datetime.timedelta(minutes=i),
+        "proof_image_path": f"/static/uploads/bench_{i % photos}.jpg", "status": "Pending",
+    } for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--challans', type=int, default=400)
+    ap.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, 8])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as app_dir:
+        docs = make_challans(args.challans, app_dir)
+
+        renderer = ChallanPdfRenderer(app_dir, cache_mb=0)
+        t0 = time.perf_counter()
+        for d in docs: renderer.render(d)
+        base = len(docs) / (time.perf_counter() - t0)
+
+        print(f"{'workers':>10} {'PDFs/s':>8} {'speedup':>8} {'zip MB':>7}")
+        print(f"{'in-proc':>10} {base:8.1f} {1.0:8.2f} {'-':>7}")
+        for w in args.workers:
+            stats = {}
+            t0 = time.perf_counter()
+            for _ in export_zip(docs, workers=w, app_dir=app_dir, stats=stats): pass
+            rate = stats['pdfs'] / (time.perf_counter() - t0)
+            print(f"{w:>10} {rate:8.1f} {rate / base:8.2f} {stats['bytes'] / 1e6:7.1f}")
+
+
+if __name__ == '__main__':
+    main()
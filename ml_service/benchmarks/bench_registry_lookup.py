@@ -0,0 +1,62 @@
+"""Plate lookup latency: hash-indexed VehicleRegistry vs. the old DataFrame mask scan.
+
+    python benchmarks/bench_registry_lookup.py --sizes 10000 100000 1000000 10000000
+
+The indexed lookup should stay flat as the registry grows; the scan grows linearly,
+so it is only timed up to --scan-max rows.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from registry import VehicleRegistry  # noqa: E402
+from synthetic import make_registry, sample_plates  # noqa: E402
+
+
+def time_calls(fn, keys):
+    out = np.empty(len(keys))
+    for j, k in enumerate(keys):
+        t0 = time.perf_counter()
+        fn(k)
+        out[j] = time.perf_counter() - t0
+    return out * 1e6
+
+
+def legacy_scan(df):
+    norm = df['Registration_Number'].astype(str).str.replace(" ", "").str.upper()
+
+    def lookup(plate):
+        match = df[norm == plate.replace(" ", "").upper()]
+        return match.iloc[0].to_dict() if not match.empty else None
+    return lookup
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    ap.add_argument('--lookups', type=int, default=20_000)
+    ap.add_argument('--scan-max', type=int, default=1_000_000, help='largest registry to time the legacy scan on')
+    ap.add_argument('--scan-lookups', type=int, default=50)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'build s':>8} {'idx p50 us':>11} {'idx p99 us':>11} {'verdict p50 us':>15} {'scan p50 us':>12}")
+    for n in args.sizes:
+        df = make_registry(n)
+        t0 = time.perf_counter()
+        reg = VehicleRegistry.from_dataframe(df)
+        build = time.perf_counter() - t0
+        idx = time_calls(reg.get, sample_plates(df, args.lookups))
+        verdict = time_calls(reg.verdict, sample_plates(df, args.lookups))
+        scan = '-'
+        if n <= args.scan_max:
+            scan = f"{np.percentile(time_calls(legacy_scan(df), sample_plates(df, args.scan_lookups)), 50):12.1f}"
+        print(f"{n:>10} {build:8.2f} {np.percentile(idx, 50):11.2f} {np.percentile(idx, 99):11.2f} {np.percentile(verdict, 50):15.2f} {scan:>12}")
+        del reg, df
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Registry startup time and resident memory: CSV load vs. the memory-mapped format.
+
+    python benchmarks/bench_registry_startup.py --sizes 100000 1000000 5000000
+
+Each measurement runs in a fresh interpreter: load the registry, do --lookups
+verdicts, then report wall time and RSS split into private (anonymous) memory
+and file-backed pages. File-backed pages of the mapped registry live in the
+page cache and are shared by every worker process on the host; the CSV path
+holds everything privately, in every process. The kernel maps cached file pages
+in large folios, so "shared" overstates what a few lookups touch; "private" is
+the per-process cost. Memory figures need Linux /proc.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'app'))
+sys.path.insert(0, HERE)
+
+CHILD = r"""
+import json, os, sys, time
+sys.path[:0] = [{app!r}, {bench!r}]
+t0 = time.perf_counter()
+import numpy, pandas
+from registry import VehicleRegistry
+import registry_store
+t_import = time.perf_counter() - t0
+
+def mem():
+    out = {{}}
+    try:
+        for line in open('/proc/self/status'):
+            k, _, v = line.partition(':')
+            if k in ('VmRSS', 'RssAnon', 'RssFile'): out[k] = int(v.split()[0]) / 1024
+    except OSError:
+        pass
+    return out
+
+before = mem()
+t0 = time.perf_counter()
+reg = VehicleRegistry.from_csv({csv!r}) if {mode!r} == 'csv' else registry_store.open_registry({mapped!r})
+t_load = time.perf_counter() - t0
+plates = {plates!r}
+t0 = time.perf_counter()
+for p in plates: reg.verdict(p)
+t_lookup = (time.perf_counter() - t0) / max(len(plates), 1)
+after = mem()
+print(json.dumps({{'import': t_import, 'load': t_load, 'lookup_us': t_lookup * 1e6,
+                  'rss': after.get('VmRSS', 0) - before.get('VmRSS', 0),
+                  'anon': after.get('RssAnon', 0) - before.get('RssAnon', 0),
+                  'file': after.get('RssFile', 0) - before.get('RssFile', 0)}}))
+"""
+
+
+def measure(mode, csv_path, mapped, plates):
+    code = CHILD.format(app=os.path.join(HERE, '..', 'app'), bench=HERE, csv=csv_path, mapped=mapped,
+                        mode=mode, plates=plates)
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    from registry_store import convert, version_dir
+    from synthetic import make_registry, sample_plates
+
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    ap.add_argument('--lookups', type=int, default=1000)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'format':>7} {'convert s':>10} {'load s':>8} {'verdict us':>11} "
+          f"{'RSS MB':>8} {'private MB':>11} {'shared MB':>10} {'disk MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            df = make_registry(n)
+            csv_path = os.path.join(tmp, f"registry_{n}.csv")
+            df.to_csv(csv_path, index=False)
+            plates = [str(p) for p in sample_plates(df, args.lookups)]
+            del df
+            t0 = time.perf_counter()
+            mapped = convert(csv_path)
+            live = version_dir(mapped)
+            t_convert = time.perf_counter() - t0
+            disk = {'csv': os.path.getsize(csv_path) / 1e6,
+                    'mapped': sum(os.path.getsize(os.path.join(live, f)) for f in os.listdir(live)) / 1e6}
+            for mode in ('csv', 'mapped'):
+                r = measure(mode, csv_path, mapped, plates)
+                conv = f"{t_convert:10.1f}" if mode == 'mapped' else f"{'-':>10}"
+                print(f"{n:>10} {mode:>7} {conv} {r['load']:8.2f} {r['lookup_us']:11.1f} "
+                      f"{r['rss']:8.0f} {r['anon']:11.0f} {r['file']:10.0f} {disk[mode]:8.0f}")
+
+
+if __name__ == '__main__':
+    main()
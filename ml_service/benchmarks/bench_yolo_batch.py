@@ -0,0 +1,73 @@
+"""YOLO frames/sec at different batch sizes, as used by the upload_scan video path.
+
+    python benchmarks/bench_yolo_batch.py --video sample.mp4 --frames 64
+    python benchmarks/bench_yolo_batch.py --images samples/ --full
+
+Frames come from every 5th frame of --video, from the images in --images, or are
+random noise when neither is given. --full also times the OCR/annotation step
+(detect_plates_batch) instead of YOLO alone.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+import detection  # noqa: E402
+
+
+def load_frames(args):
+    frames = []
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        count = 0
+        while len(frames) < args.frames:
+            ret, fr = cap.read()
+            if not ret: break
+            if count % 5 == 0: frames.append(fr)
+            count += 1
+        cap.release()
+    elif args.images:
+        names = sorted(n for n in os.listdir(args.images) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for n in names[:args.frames]:
+            fr = cv2.imread(os.path.join(args.images, n))
+            if fr is not None: frames.append(fr)
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(args.frames)]
+    if not frames: sys.exit("no frames loaded")
+    return frames
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--video')
+    ap.add_argument('--images')
+    ap.add_argument('--frames', type=int, default=64)
+    ap.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--full', action='store_true', help='include OCR and annotation')
+    args = ap.parse_args()
+
+    frames = load_frames(args)
+    # Model load and first-call setup are excluded from the timings
+    list(detection.detect_boxes_batch(frames[:1], 1))
+    if args.full: detection.get_ocr_engine()
+
+    print(f"{len(frames)} frames, {'YOLO + OCR' if args.full else 'YOLO only'}")
+    print(f"{'batch':>6} {'frames/s':>9} {'s/video':>8}")
+    for bs in args.batch_sizes:
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            if args.full: detection.detect_plates_batch(frames, batch_size=bs)
+            else: list(detection.detect_boxes_batch(frames, bs))
+            best = min(best, time.perf_counter() - t0)
+        print(f"{bs:>6} {len(frames) / best:9.2f} {best:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
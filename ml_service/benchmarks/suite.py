@@ -0,0 +1,279 @@
+"""End-to-end benchmark suite: detection, registry lookup, challan issue and PDF hot paths.
+
+    python benchmarks/suite.py --rows 1000000 --images samples/ --clips clips/ --save-baseline
+    python benchmarks/suite.py --rows 1000000 --images samples/ --clips clips/ --threshold 0.15
+
+Every stage reports latency percentiles and throughput for one hot path:
+
+    lookup          validate_vehicle_in_csv: VehicleRegistry.verdict on a synthetic registry of --rows
+    challan_issue   verdict + challans.insert_challan, as upload_scan does (mongomock unless --mongo-uri)
+    pdf_render      create_challan_pdf on a cold cache (ChallanPdfRenderer.render)
+    pdf_cached      create_challan_pdf for unchanged challans (ChallanPdfRenderer.get hits)
+    detect_image    detect_plate_from_image on each image in --images
+    scan_video      the upload_scan video loop (detection.scan_video) on each clip in --clips
+
+Everything runs offline. --synthetic-media renders plate images and a short clip
+into a temporary folder when no real samples are at hand; the detector may not
+find plates on them, but the path is timed all the same. Detection stages are
+skipped, with the reason, when there is no media or ultralytics/the model are
+missing. --mongo-uri uses a throwaway database on a local server, dropped afterwards.
+
+Results go to --out as JSON. --save-baseline stores them as the baseline for this
+machine (benchmarks/baselines/<host>.json); otherwise, when a baseline exists,
+each stage is compared to it and the run exits 1 if any stage's p50 latency rose,
+or its throughput fell, by more than --threshold. Stages whose parameters
+(rows, items) differ from the baseline's are not compared.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from bench_pdf_export import make_challans  # noqa: E402
+from challan_pdf import ChallanPdfRenderer  # noqa: E402
+from registry import VehicleRegistry  # noqa: E402
+from synthetic import make_registry, plate_numbers, sample_plates  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+STAGES = ('lookup', 'challan_issue', 'pdf_render', 'pdf_cached', 'detect_image', 'scan_video')
+MEDIA_EXTS = {'image': ('.jpg', '.jpeg', '.png'), 'video': ('.mp4', '.avi', '.mov', '.mkv')}
+
+
+class Skip(Exception):
+    pass
+
+
+def measure(fn, items, warmup=1):
+    """Per-call latencies (seconds) of fn over items, after `warmup` untimed calls."""
+    for x in items[:warmup]: fn(x)
+    out = np.empty(len(items))
+    for j, x in enumerate(items):
+        t0 = time.perf_counter()
+        fn(x)
+        out[j] = time.perf_counter() - t0
+    return out
+
+
+def summarize(times, params):
+    ms = times * 1000
+    return {'params': params, 'n': len(times),
+            'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)), 'mean_ms': float(ms.mean()),
+            'throughput': float(len(times) / max(times.sum(), 1e-12))}
+
+
+def list_media(folder, kind, flag):
+    if not folder: raise Skip(f"no {flag} folder")
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(MEDIA_EXTS[kind]))
+    if not names: raise Skip(f"no {kind} files in {folder}")
+    return [os.path.join(folder, f) for f in names]
+
+
+def render_plate(text, rng, size=(720, 1280)):
+    """A noisy road-like frame with one white number plate on it."""
+    h, w = size
+    img = cv2.GaussianBlur(rng.integers(40, 120, (h, w, 3), dtype=np.uint8), (15, 15), 0)
+    x, y = int(rng.integers(100, w - 500)), int(rng.integers(100, h - 200))
+    cv2.rectangle(img, (x, y), (x + 380, y + 90), (255, 255, 255), -1)
+    cv2.rectangle(img, (x, y), (x + 380, y + 90), (0, 0, 0), 3)
+    cv2.putText(img, text, (x + 14, y + 64), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (0, 0, 0), 4)
+    return img
+
+
+def make_media(folder, images=16, clip_seconds=4, fps=25, seed=0):
+    """Synthetic plate images and one short clip of a plate crossing the frame."""
+    rng = np.random.default_rng(seed)
+    img_dir, clip_dir = os.path.join(folder, 'images'), os.path.join(folder, 'clips')
+    os.makedirs(img_dir)
+    os.makedirs(clip_dir)
+    for text in plate_numbers(images):
+        cv2.imwrite(os.path.join(img_dir, f"{text}.jpg"), render_plate(text, rng))
+    out = cv2.VideoWriter(os.path.join(clip_dir, 'synthetic.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), fps, (1280, 720))
+    base = render_plate('', rng)
+    for k in range(clip_seconds * fps):
+        frame = base.copy()
+        x = 60 + k * 900 // (clip_seconds * fps)
+        cv2.rectangle(frame, (x, 500), (x + 380, 590), (255, 255, 255), -1)
+        cv2.putText(frame, 'MH12AB1234', (x + 14, 564), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (0, 0, 0), 4)
+        out.write(frame)
+    out.release()
+    return img_dir, clip_dir
+
+
+def load_detection():
+    try:
+        import detection
+        detection.get_yolo_model()
+        detection.get_ocr_engine()
+    except ImportError as e:
+        raise Skip(f"detection unavailable: {e}")
+    except Exception as e:
+        raise Skip(f"model failed to load: {type(e).__name__}: {e}")
+    return detection
+
+
+def mongo_collection(uri):
+    if uri:
+        import pymongo
+        client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=3000)
+        db = client['echallan_bench']
+        return db['challans'], lambda: client.drop_database('echallan_bench')
+    try:
+        import mongomock
+    except ImportError:
+        raise Skip("mongomock is not installed and no --mongo-uri given")
+    return mongomock.MongoClient()['echallan_bench']['challans'], lambda: None
+
+
+# --- Stages ---
+def stage_lookup(args, ctx):
+    keys = sample_plates(ctx['df'], args.lookups)
+    return summarize(measure(ctx['registry'].verdict, keys, warmup=100), {'rows': args.rows, 'items': len(keys)})
+
+
+def stage_challan_issue(args, ctx):
+    try:
+        from challans import insert_challan
+    except ImportError as e:
+        raise Skip(f"challans needs pymongo ({e})")
+    col, drop = mongo_collection(args.mongo_uri)
+    reg = ctx['registry']
+    now = datetime.datetime.now()
+
+    def issue(plate):
+        veh = reg.verdict(plate)
+        if veh and veh.get('violations'):
+            insert_challan(col, {
+                "plate_number": plate, "owner_name": veh['owner_name'],
+                "issue_timestamp": now, "violation_type": ", ".join(veh['violations']),
+                "fine_amount": float(veh['total_fine']), "status": "Pending",
+                "official_id": "BENCH", "official_name": "Bench", "proof_image_path": "/static/uploads/bench.jpg",
+                "location": "DELHI ZONE 04 - MANUAL SCAN"})
+    try:
+        # The unique challan_id index insert_challan relies on (schema.py)
+        col.create_index('challan_id', unique=True)
+        keys = sample_plates(ctx['df'], args.challans, seed=2)
+        return summarize(measure(issue, keys), {'rows': args.rows, 'items': len(keys),
+                                                'mongo': 'server' if args.mongo_uri else 'mongomock'})
+    finally:
+        drop()
+
+
+def stage_pdf_render(args, ctx):
+    renderer = ChallanPdfRenderer(ctx['app_dir'], cache_mb=0)
+    return summarize(measure(renderer.render, ctx['challans']), {'items': len(ctx['challans'])})
+
+
+def stage_pdf_cached(args, ctx):
+    renderer = ChallanPdfRenderer(ctx['app_dir'])
+    for d in ctx['challans']: renderer.get(d)
+    return summarize(measure(renderer.get, ctx['challans']), {'items': len(ctx['challans'])})
+
+
+def stage_detect_image(args, ctx):
+    paths = list_media(ctx['images'], 'image', '--images')
+    detection = load_detection()
+    frames = [f for f in (cv2.imread(p) for p in paths) if f is not None]
+    if not frames: raise Skip("no readable images")
+    return summarize(measure(detection.detect_plate_from_image, frames), {'items': len(frames)})
+
+
+def stage_scan_video(args, ctx):
+    paths = list_media(ctx['clips'], 'video', '--clips')
+    detection = load_detection()
+    r = summarize(measure(detection.scan_video, paths, warmup=0), {'items': len(paths)})
+    r['throughput_unit'] = 'clips/s'
+    return r
+
+
+def compare(results, baseline, threshold):
+    """[(stage, message)] for every stage that regressed past threshold."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get('stages', {}).get(name)
+        if not base or 'p50_ms' not in cur or 'p50_ms' not in base: continue
+        if base['params'] != cur['params']:
+            cur['baseline'] = 'params differ; not compared'
+            continue
+        slower = cur['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        fewer = 1 - cur['throughput'] / base['throughput'] if base['throughput'] else 0.0
+        cur['baseline'] = {'p50_change': round(slower, 3), 'throughput_change': round(-fewer, 3)}
+        if slower > threshold:
+            regressions.append((name, f"p50 {base['p50_ms']:.3f} -> {cur['p50_ms']:.3f} ms (+{slower:.0%})"))
+        if fewer > threshold:
+            regressions.append((name, f"throughput {base['throughput']:.1f} -> {cur['throughput']:.1f}/s (-{fewer:.0%})"))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    ap.add_argument('--rows', type=int, default=1_000_000, help='synthetic registry size')
+    ap.add_argument('--lookups', type=int, default=20_000)
+    ap.add_argument('--challans', type=int, default=2_000, help='challans issued in challan_issue')
+    ap.add_argument('--pdfs', type=int, default=100)
+    ap.add_argument('--images', help='folder of sample plate images')
+    ap.add_argument('--clips', help='folder of short video clips')
+    ap.add_argument('--synthetic-media', action='store_true', help='render sample images and a clip if none given')
+    ap.add_argument('--mongo-uri', help='local MongoDB to use instead of mongomock')
+    ap.add_argument('--out', default='benchmark_results.json')
+    ap.add_argument('--baseline', default=os.path.join(BASELINE_DIR, f"{platform.node() or 'local'}.json"))
+    ap.add_argument('--save-baseline', action='store_true')
+    ap.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown as a fraction (0.2 = 20%%)')
+    args = ap.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = {'app_dir': os.path.join(tmp, 'app'), 'images': args.images, 'clips': args.clips}
+        if args.synthetic_media and not (args.images and args.clips):
+            img_dir, clip_dir = make_media(os.path.join(tmp, 'media'))
+            ctx['images'], ctx['clips'] = args.images or img_dir, args.clips or clip_dir
+        if {'lookup', 'challan_issue'} & set(args.stages):
+            t0 = time.perf_counter()
+            ctx['df'] = make_registry(args.rows)
+            ctx['registry'] = VehicleRegistry.from_dataframe(ctx['df'])
+            print(f"registry of {args.rows} rows built in {time.perf_counter() - t0:.1f}s")
+        if {'pdf_render', 'pdf_cached'} & set(args.stages):
+            ctx['challans'] = make_challans(args.pdfs, ctx['app_dir'])
+
+        print(f"{'stage':>14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'per s':>9}")
+        for name in args.stages:
+            try:
+                r = results[name] = globals()[f"stage_{name}"](args, ctx)
+            except Skip as e:
+                results[name] = {'skipped': str(e)}
+                print(f"{name:>14} skipped: {e}")
+                continue
+            print(f"{name:>14} {r['n']:>6} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} "
+                  f"{r['mean_ms']:9.3f} {r['throughput']:9.1f}")
+
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'), 'host': platform.node(),
+              'python': platform.python_version(), 'threshold': args.threshold, 'stages': results}
+    regressions = []
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f: json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        print(f"compared with {args.baseline} ({baseline.get('created')}), threshold {args.threshold:.0%}")
+        for name, msg in regressions: print(f"REGRESSION {name}: {msg}")
+        if not regressions: print("no regressions")
+    else:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+    report['regressions'] = [{'stage': n, 'detail': m} for n, m in regressions]
+    with open(args.out, 'w') as f: json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Synthetic vehicle registries shaped like indian_vehicle_dataset.csv."""
+import datetime
+import string
+
+import numpy as np
+import pandas as pd
+
+STATES = np.array(['DL', 'MH', 'KA', 'UP', 'TN', 'GJ', 'RJ', 'WB', 'HR', 'PB'])
+LETTERS = np.array(list(string.ascii_uppercase))
+CLASSES = np.array(['Private Car', 'Motorcycle', 'Commercial Truck', 'Taxi', 'Goods Carrier', 'Transport Bus'])
+MAKES = np.array(['Maruti', 'Hyundai', 'Tata', 'Mahindra', 'Honda', 'Bajaj', 'Ashok Leyland'])
+MODELS = np.array(['Swift', 'Creta', 'Nexon', 'Bolero', 'City', 'Pulsar', 'Dost'])
+FUELS = np.array(['Petrol', 'Diesel', 'CNG'])
+EXPIRY_COLUMNS = ['Fitness_Expiry', 'Insurance_Expiry', 'PUC_Expiry', 'Permit_Expiry', 'Road_Tax_Expiry']
+
+
+def plate_numbers(n):
+    """Unique, realistic plates ("MH12AB1234") for row ids 0..n-1."""
+    i = np.arange(n, dtype=np.int64)
+    num = pd.Series(i % 10000).astype(str).str.zfill(4)
+    series = pd.Series(LETTERS[(i // 10000 // 26) % 26]) + pd.Series(LETTERS[(i // 10000) % 26])
+    district = pd.Series((i // 6760000) % 100 + 1).astype(str).str.zfill(2)
+    state = pd.Series(STATES[(i // 676000000) % len(STATES)])
+    return state + district + series + num
+
+
+def make_registry(n, seed=0, missing_rate=0.02):
+    """Build an n-row registry DataFrame with a mix of valid/expired/missing documents."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Registration_Number': plate_numbers(n),
+        'Owner_Name': pd.Series(rng.integers(0, 100000, n)).map('Owner {}'.format),
+        'Vehicle_Class': CLASSES[rng.integers(0, len(CLASSES), n)],
+        'Make': MAKES[rng.integers(0, len(MAKES), n)],
+        'Model': MODELS[rng.integers(0, len(MODELS), n)],
+        'Fuel_Type': FUELS[rng.integers(0, len(FUELS), n)],
+    })
+    df['Owner_Email'] = df['Registration_Number'].str.lower() + '@example.com'
+    today = np.datetime64(datetime.date.today(), 'D')
+    for col in EXPIRY_COLUMNS:
+        days = today + rng.integers(-400, 800, n).astype('timedelta64[D]')
+        dates = pd.Series(np.datetime_as_string(days, unit='D'), dtype=object)
+        dates[rng.random(n) < missing_rate] = np.nan
+        df[col] = dates
+    return df
+
+
+def sample_plates(df, k, seed=1, miss_rate=0.1):
+    """k lookup keys drawn from df, with a share of plates that are not registered."""
+    rng = np.random.default_rng(seed)
+    plates = df['Registration_Number'].to_numpy()[rng.integers(0, len(df), k)].tolist()
+    for j in np.flatnonzero(rng.random(k) < miss_rate):
+        plates[j] = 'ZZ99ZZ' + str(j % 10000).zfill(4)
+    return plates
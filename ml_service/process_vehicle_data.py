@@ -1,105 +1,149 @@
-import csv
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
-
-# --- Configuration ---
-INPUT_CSV = r"D:\indian_vehicle_dataset.csv"
-OUTPUT_XLSX = r"D:\indian_vehicle_dataset_non_ev.xlsx"
+"""Stream the raw vehicle CSV into the datasets the service uses, dropping electric vehicles.
+
+    python process_vehicle_data.py indian_vehicle_dataset.csv               # -> indian_vehicle_dataset_non_ev.xlsx
+    python process_vehicle_data.py raw.csv --csv app/indian_vehicle_dataset.csv --registry app/indian_vehicle_dataset.registry
+    python process_vehicle_data.py raw.csv --xlsx non_ev.xlsx --registry non_ev.registry --chunk-rows 50000
+
+The input (CSV, Parquet or XLSX) is read --chunk-rows rows at a time. EV rows
+(Electric Vehicle class, Electric fuel or a pure-EV make) are dropped, and every
+kept chunk goes straight to each requested output, so memory stays at one chunk
+whatever the input size:
+
+- --xlsx: a write-only workbook; the header and body formatting are two shared
+  named styles instead of Font/Alignment/Border objects per cell.
+- --csv: the filtered rows as plain CSV.
+- --registry: the memory-mapped columnar registry app.py loads (registry_store).
+  With --csv as well, the registry records that CSV as its source, so the app
+  accepts it as current for the CSV.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from clean_dataset import CHUNK_ROWS, ChunkWriter, read_chunks  # noqa: E402
+from registry_store import RegistryWriter  # noqa: E402
 
 # Pure EV manufacturers to remove
 EV_MAKES = {"Ather", "Ola", "Okinawa", "Hero Electric", "Pure EV", "Ampere", "Revolt"}
-
-# --- Read CSV and filter ---
-with open(INPUT_CSV, "r", encoding="utf-8") as f:
-    reader = csv.reader(f)
-    header = next(reader)
-
-    # Find column indices
-    vehicle_class_idx = header.index("Vehicle_Class")
-    fuel_type_idx = header.index("Fuel_Type")
-    make_idx = header.index("Make")
-    engine_capacity_idx = header.index("Engine_Capacity_CC")
-
-    filtered_rows = []
-    removed_count = 0
-
-    for row in reader:
-        vehicle_class = row[vehicle_class_idx].strip()
-        fuel_type = row[fuel_type_idx].strip()
-        make = row[make_idx].strip()
-
-        # Remove if: Electric Vehicle class, Electric fuel, or pure-EV manufacturer
-        is_ev = (
-            vehicle_class == "Electric Vehicle" or
-            fuel_type == "Electric" or
-            make in EV_MAKES
-        )
-
-        if is_ev:
-            removed_count += 1
-            continue
-
-        # Fix Engine_Capacity_CC: if 0 for non-EV, it's likely data error — keep as-is
-        filtered_rows.append(row)
-
-total_kept = len(filtered_rows)
-print(f"Original records: {removed_count + total_kept}")
-print(f"Removed (EV): {removed_count}")
-print(f"Kept (non-EV): {total_kept}")
-
-# --- Create formatted Excel workbook ---
-wb = Workbook()
-ws = wb.active
-ws.title = "Vehicle Data"
-
-# Styles
-header_font = Font(name="Calibri", bold=True, size=11, color="FFFFFF")
-header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
-header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-cell_font = Font(name="Calibri", size=10)
-cell_alignment = Alignment(vertical="center", wrap_text=False)
-thin_border = Border(
-    left=Side(style="thin"),
-    right=Side(style="thin"),
-    top=Side(style="thin"),
-    bottom=Side(style="thin"),
-)
-
-# Write header row
-for col_idx, col_name in enumerate(header, 1):
-    cell = ws.cell(row=1, column=col_idx, value=col_name)
-    cell.font = header_font
-    cell.fill = header_fill
-    cell.alignment = header_alignment
-    cell.border = thin_border
-
-# Write data rows
-for row_idx, row_data in enumerate(filtered_rows, 2):
-    for col_idx, value in enumerate(row_data, 1):
-        cell = ws.cell(row=row_idx, column=col_idx, value=value)
-        cell.font = cell_font
-        cell.alignment = cell_alignment
-        cell.border = thin_border
-
-# Auto-fit column widths (approximate)
-for col_idx in range(1, len(header) + 1):
-    col_letter = get_column_letter(col_idx)
-    max_length = len(str(header[col_idx - 1]))
-    # Sample first 100 data rows for width
-    for row_idx in range(2, min(102, total_kept + 2)):
-        cell_value = ws.cell(row=row_idx, column=col_idx).value
-        if cell_value:
-            max_length = max(max_length, len(str(cell_value)))
-    ws.column_dimensions[col_letter].width = min(max_length + 3, 35)
-
-# Freeze top row for easy scrolling
-ws.freeze_panes = "A2"
-
-# Add auto-filter
-ws.auto_filter.ref = f"A1:{get_column_letter(len(header))}1"
-
-# Save
-wb.save(OUTPUT_XLSX)
-print(f"\nExcel file saved: {OUTPUT_XLSX}")
-print("Features: formatted headers, auto-column-width, frozen header row, auto-filter enabled")
+FILTER_COLUMNS = ('Vehicle_Class', 'Fuel_Type', 'Make')
+# Data rows sampled for the XLSX column widths
+WIDTH_SAMPLE_ROWS = 100
+MAX_COLUMN_WIDTH = 35
+
+
+def ev_mask(df):
+    """Rows that are EVs: Electric Vehicle class, Electric fuel, or a pure-EV manufacturer."""
+    missing = [c for c in FILTER_COLUMNS if c not in df.columns]
+    if missing: raise ValueError(f"input has no {', '.join(missing)} column")
+    col = lambda c: df[c].fillna('').astype(str).str.strip()
+    return ((col('Vehicle_Class') == 'Electric Vehicle') | (col('Fuel_Type') == 'Electric')
+            | col('Make').isin(EV_MAKES)).to_numpy()
+
+
+class StyledXlsxWriter:
+    """Write-only workbook with a formatted header row, frozen panes and an auto-filter."""
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Vehicle Data")
+        thin = Side(style="thin")
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        self.wb.add_named_style(NamedStyle(
+            name="vehicle_header", font=Font(name="Calibri", bold=True, size=11, color="FFFFFF"),
+            fill=PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True), border=border))
+        self.wb.add_named_style(NamedStyle(
+            name="vehicle_cell", font=Font(name="Calibri", size=10),
+            alignment=Alignment(vertical="center", wrap_text=False), border=border))
+        self.cells = None
+
+    def _start(self, df):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+        # Column settings must precede the first row in write-only mode
+        sample = df.head(WIDTH_SAMPLE_ROWS)
+        for k, name in enumerate(df.columns, 1):
+            longest = sample[name].dropna().astype(str).str.len().max()
+            width = max(len(str(name)), 0 if pd.isna(longest) else int(longest))
+            self.ws.column_dimensions[get_column_letter(k)].width = min(width + 3, MAX_COLUMN_WIDTH)
+        self.ws.freeze_panes = "A2"
+        self.ws.auto_filter.ref = f"A1:{get_column_letter(len(df.columns))}1"
+        header = []
+        for name in df.columns:
+            cell = WriteOnlyCell(self.ws, value=name)
+            cell.style = "vehicle_header"
+            header.append(cell)
+        self.ws.append(header)
+        # Rows are serialized on append, so one styled cell per column is reused for every row
+        self.cells = []
+        for _ in df.columns:
+            cell = WriteOnlyCell(self.ws)
+            cell.style = "vehicle_cell"
+            self.cells.append(cell)
+
+    def write(self, df):
+        if self.cells is None: self._start(df)
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            for cell, value in zip(self.cells, row): cell.value = value
+            self.ws.append(self.cells)
+
+    def close(self):
+        if self.cells is None: return
+        self.wb.save(self.path)
+
+
+def process(src, xlsx=None, csv=None, registry=None, chunk_rows=CHUNK_ROWS):
+    """Filter `src` into each given output; returns (rows read, EV rows removed)."""
+    writers = []
+    if xlsx: writers.append(StyledXlsxWriter(xlsx))
+    if csv: writers.append(ChunkWriter(csv))
+    reg = RegistryWriter(registry) if registry else None
+    total = removed = 0
+    for df in read_chunks(src, chunk_rows):
+        df.columns = [str(c).strip() for c in df.columns]
+        ev = ev_mask(df)
+        total += len(df)
+        removed += int(ev.sum())
+        kept = df[~ev]
+        for w in writers: w.write(kept)
+        if reg: reg.write(kept)
+    for w in writers: w.close()
+    if reg: reg.close(source=csv)
+    return total, removed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Filter EVs out of the vehicle dataset and write XLSX/CSV/registry outputs")
+    ap.add_argument('src', help=".csv, .parquet or .xlsx")
+    ap.add_argument('--xlsx', help="formatted workbook (the default output: <src>_non_ev.xlsx)")
+    ap.add_argument('--csv', help="filtered rows as CSV")
+    ap.add_argument('--registry', help="directory for the memory-mapped registry format")
+    ap.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = ap.parse_args(argv)
+    if not (args.xlsx or args.csv or args.registry):
+        args.xlsx = os.path.splitext(args.src)[0] + '_non_ev.xlsx'
+
+    t0 = time.perf_counter()
+    try:
+        total, removed = process(args.src, args.xlsx, args.csv, args.registry, args.chunk_rows)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"process_vehicle_data: {e}", file=sys.stderr)
+        return 1
+    print(f"Original records: {total}")
+    print(f"Removed (EV): {removed}")
+    print(f"Kept (non-EV): {total - removed}")
+    for label, path in (('Excel file', args.xlsx), ('CSV', args.csv), ('Registry', args.registry)):
+        if path: print(f"{label} saved: {path}")
+    print(f"Done in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
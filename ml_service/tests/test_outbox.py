@@ -0,0 +1,160 @@
+import datetime
+import socket
+import time
+from email.message import EmailMessage
+
+import mongomock
+import pytest
+
+from outbox import FAILED, PENDING, SENDING, SENT, Outbox, SmtpSettings
+
+aiosmtpd = pytest.importorskip('aiosmtpd.controller')
+
+
+class Inbox:
+    """aiosmtpd handler that keeps what it receives and rejects the first `fail` messages."""
+
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail:
+            self.fail -= 1
+            return '451 Try again later'
+        self.received.append(envelope)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def build_message(doc):
+    msg = EmailMessage()
+    msg['From'] = 'echallan@example.com'
+    msg['To'] = doc['recipient']
+    msg['Subject'] = f"E-Challan {doc['challan_id']}"
+    msg.set_content(f"Plate {doc['payload'].get('plate')}")
+    return msg
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(inbox):
+        controller = aiosmtpd.Controller(inbox, hostname='127.0.0.1', port=free_port())
+        controller.start()
+        servers.append(controller)
+        return SmtpSettings('127.0.0.1', controller.port, timeout=5)
+
+    yield start
+    for controller in servers: controller.stop()
+
+
+@pytest.fixture
+def outbox_for():
+    boxes = []
+
+    def make(smtp, **kwargs):
+        db = mongomock.MongoClient().db
+        kwargs = dict(dict(workers=1, retry_base=0.05, poll_seconds=0.02), **kwargs)
+        box = Outbox(db.email_outbox, db.challans, build_message, smtp, **kwargs)
+        boxes.append(box)
+        return box
+
+    yield make
+    for box in boxes: box.stop()
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_sends_queued_messages(smtp_server, outbox_for):
+    inbox = Inbox()
+    box = outbox_for(smtp_server(inbox))
+    for k in range(3):
+        box.challans_col.insert_one({'challan_id': f"C{k}"})
+        box.enqueue(f"owner{k}@example.com", f"C{k}", plate=f"MH12AB000{k}")
+    wait_for(lambda: box.col.count_documents({'status': SENT}) == 3)
+    assert sorted(e.rcpt_tos[0] for e in inbox.received) == [f"owner{k}@example.com" for k in range(3)]
+    assert box.pending_count() == 0
+    assert {c['email_status'] for c in box.challans_col.find()} == {'Sent'}
+
+
+def test_retries_with_backoff(smtp_server, outbox_for):
+    inbox = Inbox(fail=2)
+    box = outbox_for(smtp_server(inbox))
+    box.challans_col.insert_one({'challan_id': 'C1'})
+    t0 = datetime.datetime.now()
+    box.enqueue('owner@example.com', 'C1', plate='MH12AB0001')
+    wait_for(lambda: box.col.count_documents({'status': SENT}) == 1)
+    doc = box.col.find_one()
+    assert doc['attempts'] == 3 and '451' in doc['last_error']
+    # Two failures wait about retry_base, then twice that (with +-20% jitter)
+    assert (doc['sent_at'] - t0).total_seconds() >= 0.05 * 3 * 0.8
+    assert len(inbox.received) == 1
+    assert box.challans_col.find_one()['email_status'] == 'Sent'
+
+
+def test_gives_up_after_max_attempts(smtp_server, outbox_for):
+    box = outbox_for(smtp_server(Inbox(fail=100)), max_attempts=2)
+    box.challans_col.insert_one({'challan_id': 'C1'})
+    box.enqueue('owner@example.com', 'C1')
+    wait_for(lambda: box.col.count_documents({'status': FAILED}) == 1)
+    assert box.col.find_one()['attempts'] == 2
+    assert box.challans_col.find_one()['email_status'] == 'Failed'
+
+
+def test_recovers_a_dead_workers_claim_while_running(smtp_server, outbox_for):
+    inbox = Inbox()
+    box = outbox_for(smtp_server(inbox), stale_after=0.3)
+    box.start()
+    # A message another worker claimed just now and then died sending; nothing restarts the outbox
+    now = datetime.datetime.now()
+    box.col.insert_one({'recipient': 'owner@example.com', 'challan_id': 'C1', 'payload': {}, 'status': SENDING,
+                        'attempts': 0, 'next_attempt_at': now, 'created_at': now,
+                        'claimed_by': 'outbox-dead', 'claimed_at': now})
+    time.sleep(0.1)
+    assert box.col.find_one()['status'] == SENDING  # not stale yet
+    wait_for(lambda: box.col.find_one()['status'] == SENT)
+    assert len(inbox.received) == 1
+
+
+def test_recover_stale_leaves_fresh_claims(outbox_for):
+    box = outbox_for(SmtpSettings('127.0.0.1', free_port()), stale_after=60)
+    now = datetime.datetime.now()
+    box.col.insert_many([{'status': SENDING, 'claimed_at': now - datetime.timedelta(seconds=120)},
+                         {'status': SENDING, 'claimed_at': now}])
+    assert box.recover_stale() == 1
+    assert sorted(d['status'] for d in box.col.find()) == [PENDING, SENDING]
+
+
+def test_worker_survives_a_mongo_error(smtp_server, outbox_for, monkeypatch):
+    inbox = Inbox()
+    box = outbox_for(smtp_server(inbox))
+    claim = box._claim_batch
+    failures = []
+
+    def flaky(worker):
+        if not failures:
+            failures.append(worker)
+            raise ConnectionError("Mongo went away")
+        return claim(worker)
+
+    monkeypatch.setattr(box, '_claim_batch', flaky)
+    box.start()
+    wait_for(lambda: failures)
+    for k in range(2):
+        box.challans_col.insert_one({'challan_id': f"C{k}"})
+        box.enqueue(f"owner{k}@example.com", f"C{k}")
+    wait_for(lambda: box.col.count_documents({'status': SENT}) == 2)
+    assert len(inbox.received) == 2
+    assert all(t.is_alive() for t in box._threads)
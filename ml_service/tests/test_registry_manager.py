@@ -0,0 +1,167 @@
+import datetime
+import os
+import threading
+
+import pandas as pd
+
+import registry_store
+from registry_manager import RegistryManager
+
+PLATES = [f"MH12AB{i:04d}" for i in range(500)]
+
+
+def write_registry(csv_path, owner):
+    pd.DataFrame({
+        'Registration_Number': PLATES,
+        'Owner_Name': owner,
+        'Vehicle_Class': 'Private Car',
+        'Make': 'Maruti',
+        'Model': 'Swift',
+        'Fuel_Type': 'Petrol',
+        'Insurance_Expiry': '2030-01-01',
+        'PUC_Expiry': '2030-01-01',
+    }).to_csv(csv_path, index=False)
+    return registry_store.convert(csv_path)
+
+
+def versions(mapped):
+    return sorted(n for n in os.listdir(mapped) if n.startswith('v'))
+
+
+def test_reload_while_looking_up(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    mapped = write_registry(csv_path, 'owner 0')
+    manager = RegistryManager(csv_path, mapped, delta_dir=None, poll_seconds=0)
+    manager.load()
+    published = {'owner 0'}
+    errors, misses, seen = [], [], set()
+    stop = threading.Event()
+
+    def lookups(offset):
+        k = offset
+        while not stop.is_set():
+            try:
+                out = manager.current.verdict(PLATES[k % len(PLATES)])
+            except Exception as e:  # a lookup on a collected version would fail here
+                errors.append(e)
+                return
+            if out is None: misses.append(k)
+            else: seen.add(out['owner_name'])
+            k += 7
+
+    threads = [threading.Thread(target=lookups, args=(i,)) for i in range(4)]
+    for t in threads: t.start()
+    try:
+        for v in range(1, 6):
+            published.add(f"owner {v}")
+            write_registry(csv_path, f"owner {v}")
+            assert not manager.check()  # not settled yet
+            assert manager.check()
+            assert manager.current.verdict(PLATES[0])['owner_name'] == f"owner {v}"
+    finally:
+        stop.set()
+        for t in threads: t.join()
+
+    assert not errors and not misses
+    assert seen <= published
+    assert manager.version == 6
+    assert versions(mapped) == [os.path.basename(manager.current.source)]
+
+
+def test_keeps_the_version_it_serves(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    mapped = write_registry(csv_path, 'owner 0')
+    manager = RegistryManager(csv_path, mapped, delta_dir=None, poll_seconds=0)
+    manager.load()
+    serving = manager.current.source
+    # Republished but not yet swapped in: the version being served must survive a poll
+    write_registry(csv_path, 'owner 1')
+    manager.check()
+    assert os.path.basename(serving) in versions(mapped)
+    assert manager.current.verdict(PLATES[0])['owner_name'] == 'owner 0'
+    manager.check()
+    assert versions(mapped) == [os.path.basename(manager.current.source)]
+
+
+def test_deltas_apply_over_snapshot(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    mapped = write_registry(csv_path, 'owner 0')
+    deltas = tmp_path / 'deltas'
+    deltas.mkdir()
+    manager = RegistryManager(csv_path, mapped, delta_dir=str(deltas), poll_seconds=0)
+    manager.load()
+    pd.DataFrame({'Registration_Number': [PLATES[3], 'KA01ZZ0001'], 'Owner_Name': ['new owner', 'added']}) \
+        .to_csv(deltas / '001.csv', index=False)
+    manager.check()
+    assert manager.check()
+    assert manager.current.verdict(PLATES[3])['owner_name'] == 'new owner'
+    assert manager.current.verdict(PLATES[4])['owner_name'] == 'owner 0'
+    assert manager.current.verdict('KA01ZZ0001')['owner_name'] == 'added'
+    assert len(manager.current) == len(PLATES) + 1
+
+
+def test_deltas_survive_a_reconversion(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    mapped = write_registry(csv_path, 'owner 0')
+    deltas = tmp_path / 'deltas'
+    deltas.mkdir()
+    pd.DataFrame({'Registration_Number': [PLATES[3]], 'Insurance_Expiry': ['2031-06-30']}) \
+        .to_csv(deltas / '001.csv', index=False)
+    manager = RegistryManager(csv_path, mapped, delta_dir=str(deltas), poll_seconds=0)
+    manager.load()
+    assert manager.current.get(PLATES[3])['Insurance_Expiry'] == '2031-06-30'
+    # The unchanged CSV touched and converted again: newer than the delta, yet it does not include it
+    os.utime(csv_path)
+    registry_store.convert(csv_path)
+    manager.check()
+    assert manager.check()
+    assert manager.current.get(PLATES[3])['Insurance_Expiry'] == '2031-06-30'
+    assert manager.status()['deltas'] == ['001.csv']
+
+
+def test_skips_exactly_the_folded_deltas(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    mapped = write_registry(csv_path, 'owner 0')
+    deltas = tmp_path / 'deltas'
+    deltas.mkdir()
+    for name, owner in (('001.csv', 'folded owner'), ('002.csv', 'later owner')):
+        pd.DataFrame({'Registration_Number': [PLATES[int(name[2])]], 'Owner_Name': [owner]}) \
+            .to_csv(deltas / name, index=False)
+    # 001 merged into the CSV by hand, with a value the delta no longer holds
+    df = pd.read_csv(csv_path, dtype=str)
+    df.loc[1, 'Owner_Name'] = 'merged owner'
+    df.to_csv(csv_path, index=False)
+    registry_store.convert(csv_path, deltas=[str(deltas / '001.csv')])
+    manager = RegistryManager(csv_path, mapped, delta_dir=str(deltas), poll_seconds=0)
+    manager.load()
+    assert manager.status()['deltas'] == ['002.csv']
+    assert manager.current.verdict(PLATES[1])['owner_name'] == 'merged owner'
+    assert manager.current.verdict(PLATES[2])['owner_name'] == 'later owner'
+    # Editing the folded file makes it a delta again
+    pd.DataFrame({'Registration_Number': [PLATES[1]], 'Owner_Name': ['corrected owner']}) \
+        .to_csv(deltas / '001.csv', index=False)
+    manager.check()
+    assert manager.check()
+    assert manager.current.verdict(PLATES[1])['owner_name'] == 'corrected owner'
+
+
+def test_next_day_compliance_is_prepared_before_midnight(tmp_path):
+    csv_path = str(tmp_path / 'registry.csv')
+    pd.DataFrame({'Registration_Number': PLATES[:2], 'Insurance_Expiry': ['2030-01-01', '2030-01-01']}) \
+        .to_csv(csv_path, index=False)
+    manager = RegistryManager(csv_path, delta_dir=None, poll_seconds=0)
+    manager.load()
+    reg = manager.current
+    today = datetime.date.today()
+    assert not manager.prepare_next_day(datetime.datetime.combine(today, datetime.time(12)))
+    assert reg._upcoming is None
+    assert manager.prepare_next_day(datetime.datetime.combine(today, datetime.time(23, 55)))
+    assert reg._upcoming.as_of == today + datetime.timedelta(days=1)
+
+    # The date turning: the first lookup swaps in the prepared day instead of recomputing
+    reg.refresh_compliance(today - datetime.timedelta(days=1))
+    reg.prepare_compliance(today)
+    prepared = reg._upcoming
+    reg.compute_compliance = None  # a recompute would fail
+    assert reg.verdict(PLATES[0])['insurance_status'] == 'Valid'
+    assert reg._compliance is prepared
@@ -0,0 +1,118 @@
+import datetime
+import threading
+import time
+
+import mongomock
+import pytest
+
+import scan_jobs
+from scan_jobs import DONE, QUEUED, RUNNING, ScanJobManager
+
+
+class Socket:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+class Runner:
+    """Scan runner that records the jobs it ran and can hold one until released."""
+
+    def __init__(self):
+        self.ran = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, job, progress):
+        self.ran.append(job['job_id'])
+        self.release.wait(10)
+        progress(1.0)
+        return {'plates': []}
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def col():
+    return mongomock.MongoClient().db.scan_jobs
+
+
+def manager(col, runner, **kwargs):
+    return ScanJobManager(col, Socket(), runner, **dict(dict(heartbeat_seconds=0.05, stale_seconds=0.5), **kwargs))
+
+
+def video(tmp_path, name='clip.mp4'):
+    path = tmp_path / name
+    path.write_bytes(b'')
+    return str(path)
+
+
+def insert_job(col, job_id, status, heartbeat_at, file_path):
+    now = datetime.datetime.now()
+    col.insert_one({'job_id': job_id, 'status': status, 'file_path': file_path, 'progress': 0.3, 'detections': [],
+                    'created_at': now, 'owner': 'other-host:1:x', 'heartbeat_at': heartbeat_at})
+
+
+def test_runs_a_submitted_job(col, tmp_path):
+    runner = Runner()
+    jobs = manager(col, runner)
+    job_id = jobs.submit(video(tmp_path))
+    wait_for(lambda: jobs.get(job_id)['status'] == DONE)
+    assert runner.ran == [job_id]
+
+
+def test_leaves_jobs_of_a_live_sibling_alone(col, tmp_path):
+    runner_a, runner_b = Runner(), Runner()
+    runner_a.release.clear()
+    a = manager(col, runner_a)
+    job_id = a.submit(video(tmp_path))
+    wait_for(lambda: runner_a.ran)
+    # A second process starting up while the first is mid-scan
+    b = manager(col, runner_b)
+    b.start()
+    time.sleep(1.0)  # twice the stale time: a's heartbeat keeps the job its own
+    assert col.find_one({'job_id': job_id})['status'] == RUNNING
+    assert runner_b.ran == []
+    runner_a.release.set()
+    wait_for(lambda: a.get(job_id)['status'] == DONE)
+    assert runner_a.ran == [job_id] and runner_b.ran == []
+
+
+def test_takes_over_jobs_of_a_dead_process(col, tmp_path):
+    old = datetime.datetime.now() - datetime.timedelta(minutes=5)
+    insert_job(col, 'dead-running', RUNNING, old, video(tmp_path, 'a.mp4'))
+    insert_job(col, 'dead-queued', QUEUED, old, video(tmp_path, 'b.mp4'))
+    insert_job(col, 'live-running', RUNNING, datetime.datetime.now() + datetime.timedelta(minutes=5),
+               video(tmp_path, 'c.mp4'))
+    runner = Runner()
+    jobs = manager(col, runner)
+    jobs.start()
+    wait_for(lambda: col.count_documents({'status': DONE}) == 2)
+    assert sorted(runner.ran) == ['dead-queued', 'dead-running']
+    assert col.find_one({'job_id': 'live-running'})['status'] == RUNNING
+
+
+def test_worker_survives_a_mongo_error(col, tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_jobs, 'ERROR_BACKOFF_MAX', 0.05)
+    runner = Runner()
+    jobs = manager(col, runner)
+    claim = col.find_one_and_update
+    failures = []
+
+    def flaky(*args, **kwargs):
+        if not failures:
+            failures.append(1)
+            raise ConnectionError("Mongo went away")
+        return claim(*args, **kwargs)
+
+    monkeypatch.setattr(col, 'find_one_and_update', flaky)
+    first = jobs.submit(video(tmp_path, 'a.mp4'))
+    # The failed claim leaves the job unheld; it goes stale and is taken over, by this same manager
+    wait_for(lambda: jobs.get(first)['status'] == DONE)
+    second = jobs.submit(video(tmp_path, 'b.mp4'))
+    wait_for(lambda: jobs.get(second)['status'] == DONE)
+    assert failures and runner.ran == [first, second]
@@ -0,0 +1,138 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+from mongomock import DuplicateKeyError  # noqa: E402  (pymongo's, when pymongo is installed)
+
+import schema  # noqa: E402
+from schema import (META_COLLECTION, QUERY_PLANS, SCHEMA_VERSION, apply_schema, check_plans,  # noqa: E402
+                    current_version, warn_unindexed)
+
+EXPECTED = {
+    'challans': {'_id_', 'challan_id_unique', 'issued_desc', 'plate_status_issued_id'},
+    'captures': {'_id_', 'timestamp_desc'},
+    'scan_jobs': {'_id_', 'job_id_unique', 'status_created'},
+    'email_outbox': {'_id_', 'status_next_attempt'},
+}
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().echallan_test
+
+
+def indexes(db):
+    return {name: set(db[name].index_information()) for name in EXPECTED}
+
+
+class Explaining:
+    """mongomock has no explain command; this answers it from the collection's indexes.
+
+    An index serves a query when its leading keys are the equality fields (in any
+    order) followed by the sort, in either direction. That is what the server's
+    planner needs for the single-field filters and keyset sorts in QUERY_PLANS.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def command(self, name, cmd, verbosity=None):
+        assert name == 'explain'
+        if 'update' in cmd:
+            col, filter, sort = cmd['update'], cmd['updates'][0]['q'], {}
+        else:
+            col, filter, sort = cmd['find'], cmd['filter'], cmd.get('sort', {})
+        eq = {k for k, v in filter.items() if not isinstance(v, dict)}
+        want = list(sort.items())
+        flipped = [(k, -d) for k, d in want]
+        for index_name, info in self.db[col].index_information().items():
+            keys = list(info['key'])
+            if set(k for k, _ in keys[:len(eq)]) == eq and keys[len(eq):len(eq) + len(want)] in (want, flipped):
+                plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': index_name}}
+                break
+        else:
+            plan = {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}} if sort else {'stage': 'COLLSCAN'}
+        return {'queryPlanner': {'winningPlan': plan}}
+
+
+def test_fresh_database_reaches_latest_version(db):
+    log = []
+    assert apply_schema(db, log=log.append) == SCHEMA_VERSION == 3
+    assert len(log) == 3
+    assert current_version(db) == 3
+    # Migration 3's superseded index is never built on the way
+    assert indexes(db) == EXPECTED
+
+
+def test_rerun_is_a_no_op(db):
+    apply_schema(db, log=lambda _: None)
+    log = []
+    assert apply_schema(db, log=log.append) == 3
+    assert not log
+    assert indexes(db) == EXPECTED
+
+
+def test_reapply_restores_dropped_index_without_the_superseded_one(db):
+    apply_schema(db, log=lambda _: None)
+    db.challans.drop_index('issued_desc')
+    assert apply_schema(db, reapply=True, log=lambda _: None) == 3
+    assert indexes(db) == EXPECTED
+
+
+def test_upgrade_from_v1_drops_superseded_index(db, monkeypatch):
+    monkeypatch.setattr(schema, 'MIGRATIONS', schema.MIGRATIONS[:1])
+    monkeypatch.setattr(schema, 'SUPERSEDED', set())
+    apply_schema(db, log=lambda _: None)
+    assert 'plate_status_issued' in db.challans.index_information()
+    monkeypatch.undo()
+
+    log = []
+    assert apply_schema(db, log=log.append) == 3
+    assert [line.split(':')[0] for line in log] == ["Schema migrated to v2", "Schema migrated to v3"]
+    assert indexes(db) == EXPECTED
+
+
+def test_unique_index_fails_on_duplicates_and_keeps_version(db):
+    db.challans.insert_many([{'challan_id': 'ECH-0000AA'}, {'challan_id': 'ECH-0000AA'}])
+    with pytest.raises(DuplicateKeyError):
+        apply_schema(db, log=lambda _: None)
+    assert current_version(db) == 0
+    assert db[META_COLLECTION].count_documents({}) == 0
+
+    # Once the duplicate is resolved the migration goes through
+    db.challans.delete_one({'challan_id': 'ECH-0000AA'})
+    assert apply_schema(db, log=lambda _: None) == 3
+    with pytest.raises(DuplicateKeyError):
+        db.challans.insert_one({'challan_id': 'ECH-0000AA'})
+
+
+def test_hot_queries_use_an_index_after_migrating(db):
+    apply_schema(db, log=lambda _: None)
+    plans = check_plans(Explaining(db))
+    assert set(plans) == set(QUERY_PLANS)
+    assert all(ok for ok, _ in plans.values()), plans
+
+
+def test_plans_fail_without_the_indexes_and_warn_at_startup(db, monkeypatch):
+    # v1 only: vehicle search sorts on _id after issue_timestamp, which only v3's index covers
+    monkeypatch.setattr(schema, 'MIGRATIONS', schema.MIGRATIONS[:1])
+    monkeypatch.setattr(schema, 'SUPERSEDED', set())
+    apply_schema(db, log=lambda _: None)
+    monkeypatch.undo()
+    db.challans.drop_index('issued_desc')
+
+    plans = check_plans(Explaining(db))
+    assert {route for route, (ok, _) in plans.items() if not ok} == {
+        'search_challans_by_vehicle', 'dashboard', 'dashboard_stats'}
+    assert plans['dashboard'][1] == ['SORT', 'COLLSCAN']
+
+    log = []
+    assert set(warn_unindexed(Explaining(db), log=log.append)) == {
+        'search_challans_by_vehicle', 'dashboard', 'dashboard_stats'}
+    assert len(log) == 3 and all(line.startswith('WARNING: ') for line in log)
+
+
+def test_startup_check_survives_a_server_without_explain(db):
+    # mongomock itself rejects the explain command
+    log = []
+    assert warn_unindexed(db, log=log.append) == []
+    assert log[0].startswith("Query plan check skipped")
@@ -189,7 +189,13 @@ const AdminDashboard = () => {
                 method: 'POST',
                 body: formData
             });
-            const data = await res.json();
+            let data = await res.json();
+            // Videos are scanned in the background; poll the job until it finishes
+            while (data.job_id && data.status !== 'done' && data.status !== 'failed') {
+                await new Promise(resolve => setTimeout(resolve, 1500));
+                const poll = await fetch(`http://localhost:5000/api/scan_jobs/${data.job_id}`);
+                data = await poll.json();
+            }
             if (data.success) {
                 setScanResult(data);
                 fetchStats();
@@ -537,7 +543,7 @@ const AdminDashboard = () => {
                             </div>
                             <div className="metric-card">
                                 <span className="m-label">Total Recorded Cases (30D)</span>
-                                <div className="m-value">{stats.recentChallans.length}</div>
+                                <div className="m-value">{stats.recentCount ?? stats.recentChallans.length}</div>
                             </div>
                         </div>
 